@@ -0,0 +1,120 @@
+"""
+Benchmark: búsqueda del inventario con LIKE '%q%' sobre Producto.busqueda vs prefijos de
+palabra sobre el índice (termino, producto) de TerminoBusqueda (utils/busqueda.py).
+
+Genera `productos` productos (por defecto 500.000) con nombre, categoría y marca dentro de
+una transacción que se revierte al final, y mide para cada consulta lo que pide la lista
+del inventario: el total (paginación) y la primera página de 50 ordenada por relevancia.
+
+Uso:
+    python benchmarks/bench_busqueda.py [productos]
+"""
+import os
+import sys
+import random
+import time
+from pathlib import Path
+
+import django
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'miweb.settings')
+django.setup()
+
+from django.db import transaction
+from django.db.models import Case, When, Value, IntegerField
+
+from dataeasy.models import Producto, Categoria, Marca
+from dataeasy.utils.busqueda import buscar_productos, normalizar_texto, texto_busqueda, indexar_terminos
+
+PREFIJO = "__bench_busqueda_"
+PALABRAS = (
+    "café arroz azúcar aceite harina leche yogur queso jamón pan galletas té chocolate fideos "
+    "atún porotos lentejas sal pimienta orégano jugo bebida agua vino cerveza detergente jabón "
+    "shampoo pasta cloro esponja servilleta toalla pañal cereal avena miel mermelada mantequilla"
+).split()
+VARIANTES = "orgánico light integral natural clásico premium familiar extra suave intenso".split()
+QUERIES = ("cafe", "caf org", "choco", "leche descremada", "premium 500", "zzz")
+
+
+class _Rollback(Exception):
+    pass
+
+
+def anterior(productos, query):
+    """ La búsqueda previa: subcadena en toda la columna (LIKE '%q%', recorre la tabla). """
+    q = normalizar_texto(query)
+    return productos.filter(busqueda__contains=q).annotate(
+        relevancia=Case(
+            When(nombre_normalizado=q, then=Value(0)),
+            When(nombre_normalizado__startswith=q, then=Value(1)),
+            When(nombre_normalizado__contains=q, then=Value(2)),
+            default=Value(3),
+            output_field=IntegerField(),
+        )
+    ).order_by("relevancia", "nombre_producto", "id")
+
+
+def sembrar(n_productos):
+    Categoria.objects.bulk_create([Categoria(nombre_categoria=f"{p} {PREFIJO}") for p in PALABRAS[:20]])
+    Marca.objects.bulk_create([Marca(nombre_marca=f"{PREFIJO}marca{i}") for i in range(200)])
+    # MySQL no devuelve los ids del bulk_create: se vuelven a leer
+    categorias = list(Categoria.objects.filter(nombre_categoria__endswith=PREFIJO))
+    marcas = list(Marca.objects.filter(nombre_marca__startswith=PREFIJO))
+
+    lote = []
+    for i in range(n_productos):
+        categoria, marca = random.choice(categorias), random.choice(marcas)
+        nombre = f"{random.choice(PALABRAS).capitalize()} {random.choice(VARIANTES)} {random.randint(1, 999)}g {i}"
+        lote.append(Producto(
+            nombre_producto=nombre,
+            categoria=categoria,
+            marca=marca,
+            nombre_normalizado=normalizar_texto(nombre),
+            busqueda=texto_busqueda(nombre, categoria.nombre_categoria, marca.nombre_marca),
+        ))
+        if len(lote) == 20000:
+            _guardar(lote)
+            lote = []
+    _guardar(lote)
+
+
+def _guardar(lote):
+    Producto.objects.bulk_create(lote)
+    nombres = [p.nombre_producto for p in lote]
+    ids = dict(Producto.objects.filter(nombre_producto__in=nombres).values_list("nombre_producto", "id"))
+    indexar_terminos((ids[p.nombre_producto], p.busqueda) for p in lote)
+
+
+def medir(funcion, repeticiones=3):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        resultado = funcion()
+    return resultado, (time.perf_counter() - inicio) * 1000 / repeticiones
+
+
+def main(n_productos=500_000):
+    try:
+        with transaction.atomic():
+            inicio = time.perf_counter()
+            sembrar(n_productos)
+            print(f"{n_productos} productos sembrados en {time.perf_counter() - inicio:.1f} s")
+
+            print(f"{'consulta':<18} {'anterior':>12} {'nuevo':>12} {'total ant.':>11} {'total nuevo':>12}")
+            for query in QUERIES:
+                tiempos, totales = [], []
+                for buscar in (anterior, buscar_productos):
+                    def pagina():
+                        qs = buscar(Producto.objects.all(), query)
+                        return qs.count(), list(qs.values_list("id", flat=True)[:50])
+                    (total, _), ms = medir(pagina)
+                    tiempos.append(ms)
+                    totales.append(total)
+                print(f"{query:<18} {tiempos[0]:9.1f} ms {tiempos[1]:9.1f} ms {totales[0]:>11} {totales[1]:>12}")
+            raise _Rollback
+    except _Rollback:
+        pass
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,81 @@
+"""
+Benchmark: motor de carga masiva de carga_datos (utils/importacion.py).
+
+Genera un catálogo de `filas` productos (por defecto 100.000) como DataFrame y lo importa
+tres veces dentro de una transacción que se revierte al final:
+
+1. catálogo nuevo: todos los productos se crean (bulk_create) con su movimiento de entrada
+2. re-carga: todos existen, cambia el stock de la mitad (bulk_update + movimientos de ajuste)
+3. sin cambios: el mismo catálogo otra vez; las huellas coinciden y no se escribe nada
+
+Para cada pasada muestra el tiempo, filas/s y la cantidad de consultas SQL.
+
+Uso:
+    python benchmarks/bench_carga_datos.py [filas] [categorias] [marcas]
+"""
+import os
+import sys
+import random
+import time
+from pathlib import Path
+
+import django
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'miweb.settings')
+django.setup()
+
+import pandas as pd
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from dataeasy.utils.importacion import limpiar_dataframe, importar_dataframe
+
+
+class _Rollback(Exception):
+    pass
+
+
+def generar_catalogo(filas, n_categorias, n_marcas):
+    return pd.DataFrame({
+        "Nombre Producto": [f"__bench_carga_{i}" for i in range(filas)],
+        "Categoría": [f"__bench_cat_{random.randrange(n_categorias)}" for _ in range(filas)],
+        "Marca": [f"__bench_marca_{random.randrange(n_marcas)}" for _ in range(filas)],
+        "Stock Actual": [random.randint(0, 500) for _ in range(filas)],
+        "Stock Minimo": [random.randint(1, 20) for _ in range(filas)],
+    })
+
+
+def importar(df, titulo):
+    with CaptureQueriesContext(connection) as consultas:
+        inicio = time.perf_counter()
+        limpio, _ = limpiar_dataframe(df)
+        limpieza = time.perf_counter() - inicio
+        resultado = importar_dataframe(limpio)
+        total = time.perf_counter() - inicio
+
+    print(
+        f"{titulo:<14} {total:8.2f} s  (limpieza {limpieza:.2f} s)  "
+        f"{len(df) / total:10,.0f} filas/s  {len(consultas):6} consultas  "
+        f"nuevos={resultado.nuevos} actualizados={resultado.actualizados} "
+        f"sin_cambios={resultado.sin_cambios} movimientos={resultado.movimientos}"
+    )
+
+
+def main(filas=100_000, n_categorias=50, n_marcas=200):
+    df = generar_catalogo(filas, n_categorias, n_marcas)
+    try:
+        with transaction.atomic():
+            importar(df, "catálogo nuevo")
+
+            cambia = df.sample(frac=0.5).index
+            df.loc[cambia, "Stock Actual"] += 7
+            importar(df, "re-carga")
+            importar(df, "sin cambios")
+            raise _Rollback
+    except _Rollback:
+        pass
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:4]))
@@ -0,0 +1,112 @@
+"""
+Benchmark: escalado de la carga masiva en paralelo con 1/2/4/8 procesos.
+
+Genera un catálogo .csv de `filas` productos (nombres con tildes y repetidos, filas
+inválidas) y mide la fase de CPU de la carga: lectura por lotes + particionar + limpieza,
+huellas y textos de búsqueda plegados en el ProcessPoolExecutor (preparar_en_paralelo).
+
+- sin pool: preparar_lote en el propio proceso (mismo trabajo, sin copiar DataFrames)
+- N procesos: particiones por hash del nombre en N procesos 'spawn'
+
+Todas las variantes leen lotes de LOTE_LECTURA * 8 filas, así la cantidad de lotes
+(y de rondas de escritura) es la misma y solo cambia el reparto.
+
+Con "completo" como segundo argumento mide además la carga entera (importar_archivo)
+con cada cantidad de procesos, dentro de una transacción que se revierte. La escritura
+es una sola y secuencial, así que ahí la ganancia se limita a la parte de CPU.
+
+El speedup depende de los núcleos libres (os.cpu_count()): con 1 núcleo solo se ve el
+costo de repartir los lotes.
+
+Uso:
+    python benchmarks/bench_carga_paralela.py [filas] [completo]
+"""
+import io
+import os
+import sys
+import random
+import time
+from pathlib import Path
+
+import django
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'miweb.settings')
+django.setup()
+
+from django.db import transaction
+
+from dataeasy.utils.importacion import (
+    LOTE_LECTURA, leer_por_lotes, preparar_lote, preparar_en_paralelo, importar_archivo,
+)
+
+PROCESOS = (1, 2, 4, 8)
+
+# Todas las variantes leen lotes del mismo tamaño: solo cambia cómo se reparten
+LOTE = LOTE_LECTURA * max(PROCESOS)
+
+
+class _Rollback(Exception):
+    pass
+
+
+def generar_csv(filas):
+    lineas = ["Nombre Producto;Categoría;Marca;Stock Actual;Stock Mínimo;Descripción"]
+    for i in range(filas):
+        j = random.randrange(filas * 3 // 4)  # ~25% de productos repetidos
+        stock = random.randint(0, 500) if i % 100 else "sin dato"
+        lineas.append(
+            f"  __bench_par Café Ñandú Orgánico {j} ;Categoría Ñ {j % 50};Marca Ü {j % 200};"
+            f"{stock};{random.randint(1, 20)};Descripción con acentos {i}"
+        )
+    return ("\n".join(lineas) + "\n").encode("utf-8")
+
+
+def sin_pool(datos):
+    for lote in leer_por_lotes(io.BytesIO(datos), "catalogo.csv", LOTE):
+        preparar_lote(lote, True)
+
+
+def con_pool(datos, procesos):
+    lotes = leer_por_lotes(io.BytesIO(datos), "catalogo.csv", LOTE)
+    for _ in preparar_en_paralelo(lotes, procesos):
+        pass
+
+
+def completo(datos, procesos):
+    try:
+        with transaction.atomic():
+            importar_archivo(io.BytesIO(datos), "catalogo.csv", tam_lote=LOTE // procesos, procesos=procesos)
+            raise _Rollback
+    except _Rollback:
+        pass
+
+
+def cronometrar(funcion, *args):
+    inicio = time.perf_counter()
+    funcion(*args)
+    return time.perf_counter() - inicio
+
+
+def main(filas=500_000, modo=""):
+    datos = generar_csv(filas)
+    print(f"{filas} filas, {len(datos) / 2**20:.1f} MB, {os.cpu_count()} núcleos")
+
+    print("preparación (CPU)")
+    base = cronometrar(sin_pool, datos)
+    print(f"  {'sin pool':<12} {base:7.2f} s  {filas / base:10,.0f} filas/s")
+    for procesos in PROCESOS:
+        segundos = cronometrar(con_pool, datos, procesos)
+        print(f"  {f'{procesos} procesos':<12} {segundos:7.2f} s  {filas / segundos:10,.0f} filas/s  x{base / segundos:.2f}")
+
+    if modo == "completo":
+        print("carga completa")
+        base = cronometrar(completo, datos, 1)
+        print(f"  {'sin pool':<12} {base:7.2f} s  {filas / base:10,.0f} filas/s")
+        for procesos in PROCESOS[1:]:
+            segundos = cronometrar(completo, datos, procesos)
+            print(f"  {f'{procesos} procesos':<12} {segundos:7.2f} s  {filas / segundos:10,.0f} filas/s  x{base / segundos:.2f}")
+
+
+if __name__ == "__main__":
+    main(*(int(a) if a.isdigit() else a for a in sys.argv[1:3]))
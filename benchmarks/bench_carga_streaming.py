@@ -0,0 +1,90 @@
+"""
+Benchmark: memoria pico de la carga masiva, archivo completo vs streaming por lotes.
+
+Escribe un catálogo de `filas` productos como .csv y .xlsx en un directorio temporal y
+lo importa de dos formas, cada una dentro de una transacción que se revierte:
+
+- completo:  pd.read_csv / pd.read_excel del archivo entero + importar_dataframe
+- streaming: importar_archivo (csv por trozos / openpyxl read_only, lotes de LOTE_LECTURA)
+
+La memoria pico se mide con tracemalloc (incluye los buffers de pandas/NumPy).
+Correr con DEBUG=False: con DEBUG Django guarda el SQL de cada consulta y la memoria crece.
+
+Uso:
+    python benchmarks/bench_carga_streaming.py [filas]
+"""
+import os
+import sys
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import django
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'miweb.settings')
+django.setup()
+
+import pandas as pd
+from django.db import transaction
+
+from dataeasy.utils.importacion import limpiar_dataframe, importar_dataframe, importar_archivo
+
+
+class _Rollback(Exception):
+    pass
+
+
+def escribir_catalogo(directorio, filas):
+    df = pd.DataFrame({
+        "Nombre Producto": [f"__bench_stream_{i}" for i in range(filas)],
+        "Categoría": [f"__bench_cat_{random.randrange(50)}" for _ in range(filas)],
+        "Marca": [f"__bench_marca_{random.randrange(200)}" for _ in range(filas)],
+        "Stock Actual": [random.randint(0, 500) for _ in range(filas)],
+        "Descripcion": ["x" * 80] * filas,
+    })
+    rutas = {"csv": Path(directorio) / "catalogo.csv", "xlsx": Path(directorio) / "catalogo.xlsx"}
+    df.to_csv(rutas["csv"], index=False)
+    df.to_excel(rutas["xlsx"], index=False)
+    return rutas
+
+
+def completo(ruta):
+    df = pd.read_csv(ruta) if ruta.suffix == ".csv" else pd.read_excel(ruta)
+    return importar_dataframe(limpiar_dataframe(df)[0])
+
+
+def streaming(ruta):
+    with open(ruta, "rb") as archivo:
+        return importar_archivo(archivo, ruta.name)
+
+
+def medir(funcion, ruta):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    try:
+        with transaction.atomic():
+            resultado = funcion(ruta)
+            raise _Rollback
+    except _Rollback:
+        pass
+    segundos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultado, segundos, pico / 2**20
+
+
+def main(filas=100_000):
+    with tempfile.TemporaryDirectory() as directorio:
+        rutas = escribir_catalogo(directorio, filas)
+        for formato, ruta in rutas.items():
+            print(f"{formato} ({ruta.stat().st_size / 2**20:.1f} MB, {filas} filas)")
+            for nombre, funcion in (("completo", completo), ("streaming", streaming)):
+                resultado, segundos, pico = medir(funcion, ruta)
+                print(f"  {nombre:<10} {segundos:7.2f} s   pico {pico:7.1f} MB   nuevos={resultado.nuevos}")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:2]))
@@ -0,0 +1,93 @@
+"""
+Benchmark: gráficos de movimientos con el resumen diario (ORM) vs el almacén columnar (NumPy).
+
+Genera `filas` movimientos (por defecto 5.000.000) dentro de una transacción que se
+revierte al final, reconstruye el resumen diario, y para cada consulta compara el
+tiempo de ambos motores y que el JSON sea idéntico.
+
+Uso:
+    python benchmarks/bench_columnar.py [filas] [productos]
+"""
+import os
+import sys
+import random
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import django
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'miweb.settings')
+django.setup()
+
+from django.db import transaction
+
+from dataeasy.models import Producto, MovimientoInventario
+from dataeasy.utils import resumen
+from dataeasy.utils.columnar import AlmacenMovimientos
+
+
+class _Rollback(Exception):
+    pass
+
+
+def sembrar(filas, n_productos):
+    productos = Producto.objects.bulk_create([
+        Producto(nombre_producto=f"__bench_columnar_{i}") for i in range(n_productos)
+    ])
+    base = datetime(2020, 1, 1)
+    lote = []
+    for _ in range(filas):
+        lote.append(MovimientoInventario(
+            producto=random.choice(productos),
+            tipo_movimiento=random.choice(['entrada', 'salida']),
+            cantidad=random.randint(1, 15),
+            fecha_movimiento=base + timedelta(minutes=random.randint(0, 60 * 24 * 365 * 5)),
+        ))
+        if len(lote) == 50000:
+            MovimientoInventario.objects.bulk_create(lote)
+            lote = []
+    MovimientoInventario.objects.bulk_create(lote)
+    resumen.reconstruir_resumen_diario()
+    return [p.id for p in random.sample(productos, min(200, n_productos))]
+
+
+def medir(funcion, repeticiones=5):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        resultado = funcion()
+    return resultado, (time.perf_counter() - inicio) * 1000 / repeticiones
+
+
+def main(filas=5_000_000, n_productos=2000):
+    try:
+        with transaction.atomic():
+            inicio = time.perf_counter()
+            ids = sembrar(filas, n_productos)
+            print(f"Sembradas {filas} filas en {time.perf_counter() - inicio:.1f} s")
+
+            almacen = AlmacenMovimientos()
+            inicio = time.perf_counter()
+            almacen.refrescar()
+            print(f"Carga del almacén columnar: {time.perf_counter() - inicio:.1f} s\n")
+
+            desde, hasta = date(2021, 1, 1), date(2024, 12, 31)
+            casos = [
+                (f"serie {rango}", lambda m, r=rango: m.serie_movimientos(desde, hasta, r))
+                for rango in ("dia", "semana", "mes")
+            ] + [("totales 200 productos", lambda m: m.totales_por_producto(ids, desde, hasta))]
+
+            for nombre, consulta in casos:
+                esperado, ms_orm = medir(lambda: consulta(resumen))
+                obtenido, ms_col = medir(lambda: consulta(almacen))
+                igual = "OK" if esperado == obtenido else "DISTINTO"
+                print(f"{nombre:<24} ORM {ms_orm:9.1f} ms   columnar {ms_col:8.1f} ms   JSON {igual}")
+
+            raise _Rollback
+    except _Rollback:
+        pass
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,108 @@
+"""
+Benchmark: exportar_excel anterior (lista de dicts -> DataFrame -> to_excel en memoria)
+contra la exportación en streaming (utils/exportacion.py).
+
+Crea `filas` productos de prueba dentro de una transacción que se revierte al final y
+exporta la cuarta parte y el total con cada método. Para cada uno muestra el tiempo hasta
+el primer byte, el tiempo total, el tamaño del archivo y la memoria pico (tracemalloc;
+los tiempos incluyen su costo, que castiga más al método anterior).
+Con el método anterior el primer byte sale recién cuando el archivo está completo.
+
+Correr con DEBUG=False: con DEBUG Django guarda el SQL de cada consulta.
+
+Uso:
+    python benchmarks/bench_exportar_excel.py [filas]
+"""
+import io
+import os
+import sys
+import random
+import time
+import tracemalloc
+from pathlib import Path
+
+import django
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'miweb.settings')
+django.setup()
+
+import pandas as pd
+from django.db import transaction
+
+from dataeasy.models import Producto
+from dataeasy.utils.exportacion import COLUMNAS_PRODUCTOS, filas_productos, xlsx_en_streaming
+
+PREFIJO = "__bench_export_"
+
+
+class _Rollback(Exception):
+    pass
+
+
+def crear_productos(filas):
+    Producto.objects.bulk_create([
+        Producto(
+            nombre_producto=f"{PREFIJO}{i:07d}",
+            descripcion="Descripción de prueba " * 3,
+            stock_actual=random.randint(0, 500),
+            stock_minimo=random.randint(1, 20),
+        )
+        for i in range(filas)
+    ], batch_size=5000)
+
+
+def anterior(productos):
+    """ Lo que hacía la vista: tres copias completas en memoria antes de responder. """
+    data = [{
+        "nombre_producto": p.nombre_producto,
+        "descripcion": p.descripcion or "",
+        "categoria": p.categoria.nombre_categoria if p.categoria else "",
+        "marca": p.marca.nombre_marca if p.marca else "",
+        "stock_actual": p.stock_actual,
+        "stock_minimo": p.stock_minimo,
+    } for p in productos.select_related("categoria", "marca")]
+    salida = io.BytesIO()
+    pd.DataFrame(data).to_excel(salida, index=False)
+    yield salida.getvalue()
+
+
+def streaming(productos):
+    return xlsx_en_streaming(COLUMNAS_PRODUCTOS, filas_productos(productos))
+
+
+def medir(metodo, productos):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    primer_byte, total = None, 0
+    for trozo in metodo(productos):
+        if primer_byte is None and trozo:
+            primer_byte = time.perf_counter() - inicio
+        total += len(trozo)
+    segundos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return primer_byte, segundos, total, pico / 2**20
+
+
+def main(filas=100_000):
+    try:
+        with transaction.atomic():
+            crear_productos(filas)
+            for cantidad in (filas // 4, filas):
+                productos = Producto.objects.filter(nombre_producto__lt=f"{PREFIJO}{cantidad:07d}",
+                                                    nombre_producto__startswith=PREFIJO)
+                print(f"{cantidad} productos")
+                for nombre, metodo in (("anterior", anterior), ("streaming", streaming)):
+                    primer_byte, segundos, total, pico = medir(metodo, productos)
+                    print(
+                        f"  {nombre:<10} primer byte {primer_byte * 1000:8.1f} ms   total {segundos:6.2f} s   "
+                        f"{total / 2**20:6.1f} MB   pico {pico:7.1f} MB"
+                    )
+            raise _Rollback
+    except _Rollback:
+        pass
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:2]))
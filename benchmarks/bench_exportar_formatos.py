@@ -0,0 +1,89 @@
+"""
+Benchmark: exportación del libro de movimientos en cada formato (xlsx, csv, ndjson, parquet).
+
+Crea `filas` movimientos de prueba (sobre 1.000 productos) dentro de una transacción que
+se revierte al final y los exporta con cada formato disponible, recorriendo el queryset
+como lo hace la vista. Muestra tiempo, filas/s y tamaño del archivo, y el tiempo que
+tarda pandas en volver a leerlo (lo que paga un proceso de BI que lo consume).
+
+Uso:
+    python benchmarks/bench_exportar_formatos.py [filas]
+"""
+import io
+import os
+import sys
+import random
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import django
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'miweb.settings')
+django.setup()
+
+import pandas as pd
+from django.db import transaction
+
+from dataeasy.models import Producto, MovimientoInventario
+from dataeasy.utils.exportacion import FORMATOS, COLUMNAS_MOVIMIENTOS, formatos_disponibles, filas_movimientos
+
+LECTORES = {
+    "xlsx": lambda datos: pd.read_excel(io.BytesIO(datos)),
+    "csv": lambda datos: pd.read_csv(io.BytesIO(datos)),
+    "ndjson": lambda datos: pd.read_json(io.BytesIO(datos), lines=True),
+    "parquet": lambda datos: pd.read_parquet(io.BytesIO(datos)),
+}
+
+
+class _Rollback(Exception):
+    pass
+
+
+def crear_movimientos(filas):
+    Producto.objects.bulk_create(
+        [Producto(nombre_producto=f"__bench_formatos_{i}") for i in range(1000)], batch_size=1000
+    )
+    ids = list(Producto.objects.filter(nombre_producto__startswith="__bench_formatos_").values_list("id", flat=True))
+    inicio = datetime(2030, 1, 1)
+    MovimientoInventario.objects.bulk_create([
+        MovimientoInventario(
+            producto_id=random.choice(ids),
+            tipo_movimiento="entrada" if i % 3 else "salida",
+            cantidad=random.randint(1, 50),
+            fecha_movimiento=inicio + timedelta(seconds=i),
+        )
+        for i in range(filas)
+    ], batch_size=5000)
+
+
+def main(filas=200_000):
+    try:
+        with transaction.atomic():
+            crear_movimientos(filas)
+            movimientos = MovimientoInventario.objects.filter(
+                fecha_movimiento__gte=datetime(2030, 1, 1)
+            ).order_by("fecha_movimiento", "id")
+
+            print(f"{filas} movimientos")
+            for formato in formatos_disponibles():
+                inicio = time.perf_counter()
+                datos = b"".join(FORMATOS[formato].generar(COLUMNAS_MOVIMIENTOS, filas_movimientos(movimientos)))
+                segundos = time.perf_counter() - inicio
+
+                inicio = time.perf_counter()
+                LECTORES[formato](datos)
+                lectura = time.perf_counter() - inicio
+
+                print(
+                    f"  {formato:<8} {segundos:6.2f} s  {filas / segundos:10,.0f} filas/s  "
+                    f"{len(datos) / 2**20:6.1f} MB   lectura pandas {lectura:6.2f} s"
+                )
+            raise _Rollback
+    except _Rollback:
+        pass
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:2]))
@@ -0,0 +1,73 @@
+"""
+Benchmark: filas/segundo al registrar movimientos.
+
+Compara MovimientoInventario.objects.create (signal por fila) contra
+MovimientoInventario.objects.bulk_record (bulk_create + UPDATE agrupado).
+Todo corre dentro de una transacción que se revierte al final.
+
+Uso:
+    python benchmarks/bench_movimientos.py [filas] [productos]
+"""
+import os
+import sys
+import random
+import time
+from pathlib import Path
+
+import django
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'miweb.settings')
+django.setup()
+
+from django.db import transaction
+
+from dataeasy.models import Producto, MovimientoInventario
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _movimientos(productos, filas):
+    return [
+        MovimientoInventario(
+            producto=random.choice(productos),
+            tipo_movimiento=random.choice(['entrada', 'salida']),
+            cantidad=random.randint(1, 15),
+        )
+        for _ in range(filas)
+    ]
+
+
+def medir(nombre, filas, funcion):
+    inicio = time.perf_counter()
+    funcion()
+    segundos = time.perf_counter() - inicio
+    print(f"{nombre:<12} {filas:>8} filas  {segundos:8.3f} s  {filas / segundos:12.0f} filas/s")
+
+
+def main(filas=5000, n_productos=50):
+    try:
+        with transaction.atomic():
+            productos = Producto.objects.bulk_create([
+                Producto(nombre_producto=f"__bench_mov_{i}") for i in range(n_productos)
+            ])
+
+            movs = _movimientos(productos, filas)
+            medir("create()", filas, lambda: [
+                MovimientoInventario.objects.create(
+                    producto=m.producto, tipo_movimiento=m.tipo_movimiento, cantidad=m.cantidad
+                ) for m in movs
+            ])
+
+            movs = _movimientos(productos, filas)
+            medir("bulk_record", filas, lambda: MovimientoInventario.objects.bulk_record(movs))
+
+            raise _Rollback
+    except _Rollback:
+        pass
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,158 @@
+"""
+Benchmark: facturas por segundo con checkouts concurrentes y control de sobreventa.
+
+Compara el registro anterior de registrar_factura (get() por item dos veces, factura creada
+antes de validar, detalles uno a uno, sin transacción) contra registrar_salida
+(utils/facturacion.py: SELECT ... FOR UPDATE ordenado por id, validación en memoria,
+inserciones en bloque y un UPDATE de stock, todo en una transacción).
+
+`hilos` clientes registran `facturas` facturas cada uno sobre pocos productos con poco
+stock, así compiten por las mismas filas. Al final se verifica que ningún producto quedó
+con stock negativo y que el stock descontado coincide con las salidas registradas.
+
+Cada hilo usa su propia conexión, así que no puede revertirse todo en una transacción:
+los productos de prueba (PREFIJO) y sus facturas se borran al terminar.
+
+En SQLite los escritores se serializan y FOR UPDATE no existe; el benchmark abre las
+transacciones en modo IMMEDIATE para que el bloqueo de la base haga ese papel. La cifra
+representativa es la de MySQL/InnoDB, donde solo esperan las facturas que comparten productos.
+
+Uso:
+    python benchmarks/bench_registrar_factura.py [hilos] [facturas] [productos]
+"""
+import os
+import sys
+import random
+import threading
+import time
+from pathlib import Path
+
+import django
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'miweb.settings')
+django.setup()
+
+from django.db import connection, connections
+from django.db.models import Sum
+from django.utils import timezone
+
+from dataeasy.models import Producto, MovimientoInventario, Factura, DetalleFactura
+from dataeasy.utils.facturacion import registrar_salida, ErrorFactura
+
+PREFIJO = "__bench_factura_"
+STOCK_INICIAL = 200
+
+
+class _SinStock(Exception):
+    pass
+
+
+def anterior(items):
+    """ Lo que hacía la vista: lecturas y escrituras sueltas, sin transacción ni bloqueos. """
+    factura = Factura.objects.create(cliente_nombre="Bench", cliente_apellido="Anterior", cliente_rut="11111111-1")
+    for item in items:
+        producto = Producto.objects.get(id=item["id"])
+        if producto.stock_actual < int(item["cantidad"]):
+            factura.delete()
+            raise _SinStock
+    movimientos = []
+    for item in items:
+        producto = Producto.objects.get(id=item["id"])
+        cantidad = int(item["cantidad"])
+        DetalleFactura.objects.create(factura=factura, producto=producto, cantidad=cantidad, tipo_movimiento='salida')
+        movimientos.append(MovimientoInventario(
+            producto=producto, tipo_movimiento='salida', cantidad=cantidad, fecha_movimiento=timezone.now()
+        ))
+    MovimientoInventario.objects.bulk_record(movimientos)
+
+
+def nuevo(items):
+    try:
+        registrar_salida("Bench", "Nuevo", "11111111-1", items)
+    except ErrorFactura:
+        raise _SinStock
+
+
+def cliente(metodo, ids, facturas, resultado, candado):
+    ok = sin_stock = errores = 0
+    for _ in range(facturas):
+        items = [{"id": pid, "cantidad": random.randint(1, 5)} for pid in random.sample(ids, random.randint(1, 4))]
+        try:
+            metodo(items)
+            ok += 1
+        except _SinStock:
+            sin_stock += 1
+        except Exception:  # p. ej. "database is locked" en SQLite
+            errores += 1
+    connections.close_all()
+    with candado:
+        resultado["ok"] += ok
+        resultado["sin_stock"] += sin_stock
+        resultado["errores"] += errores
+
+
+def crear_productos(n_productos):
+    productos = Producto.objects.bulk_create([
+        Producto(nombre_producto=f"{PREFIJO}{i}", stock_minimo=1) for i in range(n_productos)
+    ])
+    MovimientoInventario.objects.bulk_record(
+        MovimientoInventario(producto=p, tipo_movimiento="entrada", cantidad=STOCK_INICIAL) for p in productos
+    )
+    return [p.id for p in productos]
+
+
+def borrar_datos():
+    Factura.objects.filter(cliente_nombre="Bench").delete()
+    Producto.objects.filter(nombre_producto__startswith=PREFIJO).delete()
+
+
+def verificar(ids):
+    productos = Producto.objects.filter(id__in=ids)
+    negativos = productos.filter(stock_actual__lt=0).count()
+    stock = productos.aggregate(total=Sum("stock_actual"))["total"]
+    salidas = MovimientoInventario.objects.filter(
+        producto_id__in=ids, tipo_movimiento="salida"
+    ).aggregate(total=Sum("cantidad"))["total"] or 0
+    return negativos, STOCK_INICIAL * len(ids) - salidas - stock
+
+
+def correr(nombre, metodo, hilos, facturas, n_productos):
+    borrar_datos()
+    ids = crear_productos(n_productos)
+
+    resultado, candado = {"ok": 0, "sin_stock": 0, "errores": 0}, threading.Lock()
+    clientes = [
+        threading.Thread(target=cliente, args=(metodo, ids, facturas, resultado, candado))
+        for _ in range(hilos)
+    ]
+    inicio = time.perf_counter()
+    for c in clientes:
+        c.start()
+    for c in clientes:
+        c.join()
+    segundos = time.perf_counter() - inicio
+
+    negativos, descuadre = verificar(ids)
+    total = hilos * facturas
+    print(
+        f"{nombre:<10} {total / segundos:8.1f} facturas/s  ok {resultado['ok']:>5}  "
+        f"sin stock {resultado['sin_stock']:>5}  errores {resultado['errores']:>4}  "
+        f"stock negativo {negativos:>3}  descuadre {descuadre:>4}"
+    )
+    borrar_datos()
+
+
+def main(hilos=8, facturas=200, n_productos=20):
+    if connection.vendor == "sqlite":
+        # Sin FOR UPDATE: la transacción toma el bloqueo de escritura al empezar
+        connections.settings["default"].setdefault("OPTIONS", {})["transaction_mode"] = "IMMEDIATE"
+        connections.close_all()
+
+    print(f"{hilos} hilos x {facturas} facturas, {n_productos} productos con stock {STOCK_INICIAL} ({connection.vendor})")
+    for nombre, metodo in (("anterior", anterior), ("nuevo", nuevo)):
+        correr(nombre, metodo, hilos, facturas, n_productos)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:4]])
@@ -0,0 +1,83 @@
+"""
+Comparación de carga: endpoints de gráficos por el handler WSGI vs el handler ASGI.
+
+- WSGI: `hilos` workers síncronos (como gunicorn --threads) atendiendo `peticiones` en total.
+- ASGI: un solo event loop atendiendo todas las peticiones a la vez (como uvicorn con 1 worker).
+
+Corre en el mismo proceso con django.test.Client / AsyncClient, con la sesión de un
+usuario existente. Para medir un despliegue real usar wrk/hey contra
+`gunicorn miweb.wsgi` y `uvicorn miweb.asgi:application`.
+
+Uso:
+    python benchmarks/carga_wsgi_asgi.py <usuario> [peticiones] [hilos]
+"""
+import os
+import sys
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import django
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'miweb.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+from django.test import AsyncClient, Client
+
+from dataeasy.models import Producto
+
+
+def urls():
+    ids = ",".join(str(i) for i in Producto.objects.values_list("id", flat=True)[:50])
+    return [
+        "/api/chart-data/?rango=dia",
+        "/api/chart-data/?rango=mes",
+        f"/api/chart-productos/?ids={ids}",
+        "/api/dashboard-kpis/",
+    ]
+
+
+def wsgi(usuario, lista, hilos):
+    client = Client()
+    client.force_login(usuario)
+
+    def pedir(url):
+        assert client.get(url).status_code == 200
+
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        list(pool.map(pedir, lista))
+
+
+async def asgi(usuario, lista):
+    client = AsyncClient()
+    await client.aforce_login(usuario)
+
+    async def pedir(url):
+        respuesta = await client.get(url)
+        assert respuesta.status_code == 200
+
+    await asyncio.gather(*(pedir(url) for url in lista))
+
+
+def main(username, peticiones=400, hilos=4):
+    usuario = User.objects.get(username=username)
+    base = urls()
+    lista = [base[i % len(base)] for i in range(peticiones)]
+
+    for nombre, correr in (
+        (f"WSGI ({hilos} hilos)", lambda: wsgi(usuario, lista, hilos)),
+        ("ASGI (1 event loop)", lambda: asyncio.run(asgi(usuario, lista))),
+    ):
+        inicio = time.perf_counter()
+        correr()
+        segundos = time.perf_counter() - inicio
+        print(f"{nombre:<22} {peticiones} peticiones  {segundos:7.2f} s  {peticiones / segundos:8.1f} req/s")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    main(sys.argv[1], *[int(a) for a in sys.argv[2:4]])
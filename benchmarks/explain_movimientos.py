@@ -0,0 +1,96 @@
+"""
+Plan de ejecución (EXPLAIN) y tiempos de las consultas de rango de fechas sobre el libro de movimientos.
+
+Genera `filas` movimientos de prueba (por defecto 1.000.000) dentro de una
+transacción que se revierte al final, y para cada forma de consulta imprime
+el EXPLAIN del motor (MySQL o SQLite) y el tiempo de ejecución.
+Compara el filtro antiguo (fecha_movimiento__date__range, DATE() sobre la
+columna) con el semiabierto de utils/fechas.py.
+
+Uso:
+    python benchmarks/explain_movimientos.py [filas]
+"""
+import os
+import sys
+import random
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import django
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'miweb.settings')
+django.setup()
+
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+
+from dataeasy.models import Producto, MovimientoInventario
+from dataeasy.utils.fechas import filtro_rango_fechas
+
+
+class _Rollback(Exception):
+    pass
+
+
+def sembrar(filas, n_productos=500):
+    productos = Producto.objects.bulk_create([
+        Producto(nombre_producto=f"__bench_explain_{i}") for i in range(n_productos)
+    ])
+    base = datetime(2020, 1, 1)
+    lote = []
+    for _ in range(filas):
+        lote.append(MovimientoInventario(
+            producto=random.choice(productos),
+            tipo_movimiento=random.choice(['entrada', 'salida']),
+            cantidad=random.randint(1, 15),
+            fecha_movimiento=base + timedelta(minutes=random.randint(0, 60 * 24 * 365 * 5)),
+        ))
+        if len(lote) == 20000:
+            MovimientoInventario.objects.bulk_create(lote)
+            lote = []
+    MovimientoInventario.objects.bulk_create(lote)
+    return [p.id for p in random.sample(productos, 20)]
+
+
+def consultas(ids):
+    inicio, fin = date(2023, 1, 1), date(2023, 3, 31)
+    antiguo = {'fecha_movimiento__date__range': [inicio, fin]}
+    nuevo = filtro_rango_fechas(inicio, fin)
+
+    for etiqueta, filtro in (("DATE() range", antiguo), ("semiabierto", nuevo)):
+        yield f"chart_data_api [{etiqueta}]", (
+            MovimientoInventario.objects.filter(**filtro)
+            .annotate(periodo=TruncMonth('fecha_movimiento'))
+            .values('periodo', 'tipo_movimiento').annotate(total=Sum('cantidad')).order_by('periodo')
+        )
+        yield f"chart_productos_api [{etiqueta}]", (
+            MovimientoInventario.objects.filter(producto_id__in=ids, **filtro)
+            .values('producto_id', 'tipo_movimiento').annotate(total=Sum('cantidad')).order_by()
+        )
+
+
+def main(filas=1_000_000):
+    try:
+        with transaction.atomic():
+            inicio = time.perf_counter()
+            ids = sembrar(filas)
+            print(f"Sembradas {filas} filas en {time.perf_counter() - inicio:.1f} s\n")
+
+            for nombre, qs in consultas(ids):
+                inicio = time.perf_counter()
+                list(qs)
+                ms = (time.perf_counter() - inicio) * 1000
+                print(f"=== {nombre}: {ms:.1f} ms")
+                print(qs.explain())
+                print()
+
+            raise _Rollback
+    except _Rollback:
+        pass
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Categoria, Marca, Producto, MovimientoInventario
+from .models import Categoria, Marca, Producto, MovimientoInventario, CierreStock, TrabajoImportacion
 
 @admin.register(Categoria)
 class CategoriaAdmin(admin.ModelAdmin):
@@ -40,4 +40,17 @@ class MovimientoInventarioAdmin(admin.ModelAdmin):
     list_display = ('producto', 'tipo_movimiento', 'cantidad', 'fecha_movimiento')
     list_filter = ('tipo_movimiento', 'fecha_movimiento')
     date_hierarchy = 'fecha_movimiento'
-    autocomplete_fields = ['producto'] # Optimiza la búsqueda de productos
\ No newline at end of file
+    autocomplete_fields = ['producto'] # Optimiza la búsqueda de productos
+
+@admin.register(CierreStock)
+class CierreStockAdmin(admin.ModelAdmin):
+    list_display = ('producto', 'fecha', 'saldo')
+    list_filter = ('fecha',)
+    date_hierarchy = 'fecha'
+    autocomplete_fields = ['producto']
+
+@admin.register(TrabajoImportacion)
+class TrabajoImportacionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'nombre_archivo', 'usuario', 'estado', 'filas_procesadas', 'filas_fallidas', 'creado', 'terminado')
+    list_filter = ('estado',)
+    readonly_fields = [f.name for f in TrabajoImportacion._meta.fields]
@@ -6,4 +6,6 @@ class DataeasyConfig(AppConfig):
 
     def ready(self):
         # Importa los signals para que se conecten cuando arranque Django
-        import dataeasy.signals
\ No newline at end of file
+        import dataeasy.signals
+        # Verificaciones propias (manage.py check): caché compartida entre procesos
+        import dataeasy.checks
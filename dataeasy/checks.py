@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+
+LOCMEM = "django.core.cache.backends.locmem.LocMemCache"
+
+
+def _cache_local(nivel, id):
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    if backend != LOCMEM:
+        return []
+    return [nivel(
+        "La caché 'default' es LocMemCache: las invalidaciones no llegan a otros procesos.",
+        hint=(
+            "Configura una caché compartida (CACHE_BACKEND=django.core.cache.backends.redis.RedisCache, "
+            "memcached o la de base de datos), o DummyCache para desactivar la caché."
+        ),
+        id=id,
+    )]
+
+
+@register(Tags.caches)
+def cache_compartida(app_configs, **kwargs):
+    """
+    La caché versionada (utils/cache.py) y el índice de autocompletado se invalidan subiendo
+    una versión en la caché `default`. Con LocMemCache cada proceso tiene la suya: lo que
+    escriben importar_catalogo, procesar_importaciones, reconcile_stock o un segundo worker
+    no invalida lo que ven los demás, y los dashboards quedan viejos hasta el TIMEOUT.
+    En desarrollo es un aviso; `manage.py check --deploy` lo rechaza (ver abajo).
+    """
+    return _cache_local(Warning, "dataeasy.W001")
+
+
+@register(Tags.caches, deploy=True)
+def cache_compartida_despliegue(app_configs, **kwargs):
+    return _cache_local(Error, "dataeasy.E001")
@@ -1,16 +1,18 @@
 # dataeasy/context_processors.py
-from .models import Producto
-from django.db.models import F
+from django.utils.functional import SimpleLazyObject
+
+from .utils.alertas import resumen_alertas
+
 
 def alertas_sidebar(request):
     if request.user.is_authenticated:
-        # Productos Sin Stock y Bajo Stock
-        alertas = Producto.objects.filter(
-            stock_actual__lte=F("stock_minimo")
-        ).order_by('stock_actual')
-        
+        # Perezoso: solo se consulta la caché de alertas si la plantilla usa estas variables
+        # (las respuestas JSON, PDF o páginas sin sidebar no pagan nada)
+        resumen = SimpleLazyObject(resumen_alertas)
+
         return {
-            'sidebar_alertas': alertas,
-            'hay_alertas_sidebar': alertas.exists()
+            'sidebar_alertas': SimpleLazyObject(lambda: resumen["top"]),
+            'total_alertas_sidebar': SimpleLazyObject(lambda: resumen["total"]),
+            'hay_alertas_sidebar': SimpleLazyObject(lambda: resumen["total"] > 0),
         }
-    return {}
\ No newline at end of file
+    return {}
@@ -0,0 +1,31 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dataeasy.utils.historico import construir_cierres
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye los cierres de stock (saldo por producto a fin de cada mes) "
+        "que usa stock_as_of para responder sin recorrer todo el historial. "
+        "Programarlo al comenzar cada mes (p. ej. cron el día 1): los movimientos solo "
+        "corrigen cierres existentes, el del mes recién terminado lo crea este comando."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hasta",
+            help="Solo crea cierres de meses terminados antes de esta fecha (YYYY-MM-DD). Por defecto, hoy.",
+        )
+
+    def handle(self, *args, **options):
+        hasta = None
+        if options["hasta"]:
+            try:
+                hasta = datetime.strptime(options["hasta"], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("--hasta debe tener formato YYYY-MM-DD")
+
+        creados = construir_cierres(hasta=hasta)
+        self.stdout.write(self.style.SUCCESS(f"✅ {creados} cierres de stock creados."))
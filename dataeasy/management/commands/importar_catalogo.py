@@ -0,0 +1,67 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dataeasy.utils.importacion import (
+    EXTENSIONES, LOTE_LECTURA, ErrorImportacion, importar_archivo, procesos_importacion,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa un catálogo .xlsx/.xls/.csv desde disco con el mismo motor que carga_datos. "
+        "Pensado para archivos de proveedor muy grandes: la limpieza se reparte en "
+        "--procesos procesos por particiones del nombre de producto."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo", help="Ruta del archivo a importar.")
+        parser.add_argument(
+            "--procesos",
+            type=int,
+            default=None,
+            help="Procesos de limpieza en paralelo (por defecto DATAEASY_IMPORTACION_PROCESOS).",
+        )
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=LOTE_LECTURA,
+            help=f"Filas leídas por lote y proceso (por defecto {LOTE_LECTURA}).",
+        )
+        parser.add_argument(
+            "--por-lotes",
+            action="store_true",
+            help="Confirma cada lote por separado en vez de todo el archivo en una transacción.",
+        )
+
+    def handle(self, *args, **options):
+        ruta = Path(options["archivo"])
+        if not ruta.is_file():
+            raise CommandError(f"No existe el archivo {ruta}")
+        if ruta.suffix.lower() not in EXTENSIONES:
+            raise CommandError(f"Formato no soportado. Usa {', '.join(EXTENSIONES)}.")
+
+        procesos = options["procesos"] or procesos_importacion()
+        self.stdout.write(f"Importando {ruta.name} con {procesos} proceso(s)...")
+
+        inicio = time.perf_counter()
+        with ruta.open("rb") as archivo:
+            try:
+                resultado = importar_archivo(
+                    archivo, ruta.name,
+                    tam_lote=options["lote"],
+                    atomico=not options["por_lotes"],
+                    procesos=procesos,
+                    al_avanzar=lambda r: self.stdout.write(f"  {r.filas} filas leídas", ending="\r"),
+                )
+            except ErrorImportacion as e:
+                raise CommandError(str(e))
+        segundos = time.perf_counter() - inicio
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado.procesados} productos procesados en {segundos:.1f} s "
+            f"({resultado.nuevos} nuevos, {resultado.actualizados} actualizados, "
+            f"{resultado.sin_cambios} sin cambios, {resultado.movimientos} movimientos, "
+            f"{resultado.descartados} filas descartadas)."
+        ))
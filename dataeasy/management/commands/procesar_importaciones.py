@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from dataeasy.models import TrabajoImportacion
+from dataeasy.utils.trabajos import procesar_trabajo, retomar_interrumpidos
+
+
+class Command(BaseCommand):
+    help = (
+        "Procesa las cargas masivas pendientes (TrabajoImportacion). "
+        "Es el worker cuando DATAEASY_IMPORTACION='comando', y sirve para retomar "
+        "trabajos que quedaron pendientes tras reiniciar el servidor, o a medias: los que "
+        "siguen 'procesando' sin avance en --retomar-tras minutos vuelven a la cola."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--continuo",
+            action="store_true",
+            help="No termina: sigue esperando trabajos nuevos.",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=2.0,
+            help="Segundos entre revisiones de la cola en modo continuo (por defecto 2).",
+        )
+        parser.add_argument(
+            "--retomar-tras",
+            type=float,
+            default=30.0,
+            help=(
+                "Minutos sin avance tras los cuales un trabajo 'procesando' se da por "
+                "interrumpido y se reprocesa (por defecto 30; el avance se registra tras cada lote)."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            retomados = retomar_interrumpidos(options["retomar_tras"])
+            if retomados:
+                self.stdout.write(self.style.WARNING(f"{retomados} trabajo(s) interrumpido(s) vuelven a la cola."))
+
+            pendientes = list(
+                TrabajoImportacion.objects
+                .filter(estado=TrabajoImportacion.PENDIENTE)
+                .order_by("creado")
+                .values_list("id", flat=True)
+            )
+
+            for trabajo_id in pendientes:
+                if procesar_trabajo(trabajo_id):
+                    trabajo = TrabajoImportacion.objects.get(pk=trabajo_id)
+                    estilo = self.style.SUCCESS if trabajo.estado == TrabajoImportacion.COMPLETADO else self.style.ERROR
+                    self.stdout.write(estilo(f"[{trabajo_id}] {trabajo.nombre_archivo}: {trabajo.mensaje}"))
+
+            if not options["continuo"]:
+                break
+            time.sleep(options["intervalo"])
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+
+from dataeasy.models import Producto, MovimientoInventario
+from dataeasy.utils.stock import saldo_movimiento, recalcular_stock
+from dataeasy.utils.cache import invalidar_inventario
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara Producto.stock_actual con el libro de movimientos "
+        "(entradas - salidas) en una sola pasada agrupada y reporta las diferencias."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--corregir",
+            action="store_true",
+            help="Reescribe el stock de los productos con diferencias.",
+        )
+
+    def handle(self, *args, **options):
+        # 1 consulta: SUM(+entradas/-salidas) GROUP BY producto
+        saldos = dict(
+            MovimientoInventario.objects
+            .values_list("producto_id")
+            .annotate(saldo=Sum(saldo_movimiento()))
+            .order_by()
+        )
+
+        diferencias = []
+        productos = Producto.objects.values_list("id", "nombre_producto", "stock_actual").order_by("id")
+        for producto_id, nombre, stock_actual in productos.iterator(chunk_size=2000):
+            esperado = saldos.get(producto_id, 0)
+            if stock_actual != esperado:
+                diferencias.append((producto_id, nombre, stock_actual, esperado))
+
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS("✅ Stock cuadrado: no hay diferencias."))
+            return
+
+        for producto_id, nombre, stock_actual, esperado in diferencias:
+            self.stdout.write(
+                f"⚠ [{producto_id}] {nombre}: stock_actual={stock_actual} "
+                f"libro={esperado} (diferencia {stock_actual - esperado:+d})"
+            )
+
+        self.stdout.write(self.style.WARNING(f"{len(diferencias)} productos con diferencias."))
+
+        if options["corregir"]:
+            corregidos = recalcular_stock([d[0] for d in diferencias])
+            # El UPDATE masivo no pasa por signals: se descartan alertas y contadores cacheados
+            invalidar_inventario()
+            self.stdout.write(self.style.SUCCESS(f"🔧 {corregidos} productos corregidos."))
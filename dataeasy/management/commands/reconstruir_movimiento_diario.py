@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from dataeasy.utils.resumen import reconstruir_resumen_diario
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el resumen diario de movimientos (MovimientoDiario) desde el libro completo."
+
+    def handle(self, *args, **options):
+        creados = reconstruir_resumen_diario()
+        self.stdout.write(self.style.SUCCESS(f"✅ {creados} filas de resumen diario creadas."))
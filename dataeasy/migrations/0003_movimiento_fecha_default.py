@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:16
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dataeasy', '0002_detallefactura_tipo_movimiento'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='movimientoinventario',
+            name='fecha_movimiento',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
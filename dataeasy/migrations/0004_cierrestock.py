@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dataeasy', '0003_movimiento_fecha_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CierreStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('saldo', models.IntegerField(default=0)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cierres', to='dataeasy.producto')),
+            ],
+            options={
+                'verbose_name': 'Cierre de stock',
+                'verbose_name_plural': 'Cierres de stock',
+                'indexes': [models.Index(fields=['fecha', 'producto'], name='cierre_fecha_producto_idx')],
+                'constraints': [models.UniqueConstraint(fields=('producto', 'fecha'), name='cierre_producto_fecha_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dataeasy', '0004_cierrestock'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movimientoinventario',
+            index=models.Index(fields=['producto', 'tipo_movimiento', 'fecha_movimiento', 'cantidad'], name='mov_prod_tipo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientoinventario',
+            index=models.Index(fields=['fecha_movimiento', 'tipo_movimiento', 'cantidad'], name='mov_fecha_tipo_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Case, F, Sum, Value, When
+from django.db.models.functions import TruncDate
+
+
+def poblar_resumen(apps, schema_editor):
+    """
+    Mismo SUM agrupado que utils.resumen.reconstruir_resumen_diario: sin esto los gráficos
+    pierden la historia previa y editar o borrar un movimiento antiguo restaría sobre 0.
+    """
+    MovimientoInventario = apps.get_model('dataeasy', 'MovimientoInventario')
+    MovimientoDiario = apps.get_model('dataeasy', 'MovimientoDiario')
+    filas = (
+        MovimientoInventario.objects
+        .annotate(dia=TruncDate('fecha_movimiento'))
+        .values_list('producto_id', 'dia')
+        .annotate(
+            entradas=Sum(Case(When(tipo_movimiento='entrada', then=F('cantidad')), default=Value(0))),
+            salidas=Sum(Case(When(tipo_movimiento='salida', then=F('cantidad')), default=Value(0))),
+        )
+        .order_by()
+    )
+    lote = []
+    for producto_id, dia, entradas, salidas in filas.iterator(chunk_size=5000):
+        lote.append(MovimientoDiario(producto_id=producto_id, dia=dia, entradas=entradas, salidas=salidas))
+        if len(lote) >= 5000:
+            MovimientoDiario.objects.bulk_create(lote)
+            lote = []
+    MovimientoDiario.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dataeasy', '0005_movimiento_indices'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('entradas', models.PositiveIntegerField(default=0)),
+                ('salidas', models.PositiveIntegerField(default=0)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumen_diario', to='dataeasy.producto')),
+            ],
+            options={
+                'verbose_name': 'Movimiento diario',
+                'verbose_name_plural': 'Movimientos diarios',
+                'indexes': [models.Index(fields=['dia', 'entradas', 'salidas'], name='mov_diario_dia_idx')],
+                'constraints': [models.UniqueConstraint(fields=('producto', 'dia'), name='mov_diario_producto_dia_unico')],
+            },
+        ),
+        migrations.RunPython(poblar_resumen, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:26
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+def _normalizar(texto):
+    s = unicodedata.normalize("NFKD", str(texto or ""))
+    s = "".join(c for c in s if not unicodedata.combining(c))
+    return " ".join(s.casefold().split())
+
+
+def poblar_busqueda(apps, schema_editor):
+    Producto = apps.get_model('dataeasy', 'Producto')
+    lote = []
+    filas = Producto.objects.values_list('id', 'nombre_producto', 'categoria__nombre_categoria', 'marca__nombre_marca')
+    for producto_id, nombre, categoria, marca in filas.iterator(chunk_size=2000):
+        lote.append(Producto(
+            id=producto_id,
+            nombre_normalizado=_normalizar(nombre),
+            busqueda=" ".join(_normalizar(t) for t in (nombre, categoria, marca) if t),
+        ))
+        if len(lote) >= 2000:
+            Producto.objects.bulk_update(lote, ['nombre_normalizado', 'busqueda'])
+            lote = []
+    Producto.objects.bulk_update(lote, ['nombre_normalizado', 'busqueda'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dataeasy', '0006_movimientodiario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='busqueda',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=310),
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='nombre_normalizado',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(poblar_busqueda, migrations.RunPython.noop),
+    ]
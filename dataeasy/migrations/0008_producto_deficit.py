@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:32
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dataeasy', '0007_producto_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='deficit',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('stock_minimo'), '-', models.F('stock_actual')), output_field=models.IntegerField()),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dataeasy', '0008_producto_deficit'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoImportacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('archivo', models.FileField(blank=True, null=True, upload_to='importaciones/')),
+                ('nombre_archivo', models.CharField(max_length=255)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('completado', 'Completado'), ('error', 'Error')], db_index=True, default='pendiente', max_length=12)),
+                ('mensaje', models.TextField(blank=True, default='')),
+                ('total_filas', models.PositiveIntegerField(blank=True, null=True)),
+                ('filas_procesadas', models.PositiveIntegerField(default=0)),
+                ('filas_fallidas', models.PositiveIntegerField(default=0)),
+                ('nuevos', models.PositiveIntegerField(default=0)),
+                ('actualizados', models.PositiveIntegerField(default=0)),
+                ('sin_cambios', models.PositiveIntegerField(default=0)),
+                ('movimientos', models.PositiveIntegerField(default=0)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('iniciado', models.DateTimeField(blank=True, null=True)),
+                ('terminado', models.DateTimeField(blank=True, null=True)),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Trabajo de importación',
+                'verbose_name_plural': 'Trabajos de importación',
+                'ordering': ['-creado'],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dataeasy', '0009_trabajoimportacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='huella_importacion',
+            field=models.CharField(blank=True, default='', editable=False, max_length=16),
+        ),
+        migrations.AddField(
+            model_name='trabajoimportacion',
+            name='estado_inventario',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='trabajoimportacion',
+            name='hash_archivo',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+    ]
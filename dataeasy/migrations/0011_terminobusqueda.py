@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def poblar_terminos(apps, schema_editor):
+    Producto = apps.get_model('dataeasy', 'Producto')
+    TerminoBusqueda = apps.get_model('dataeasy', 'TerminoBusqueda')
+    lote = []
+    for producto_id, busqueda in Producto.objects.values_list('id', 'busqueda').iterator(chunk_size=2000):
+        lote.extend(TerminoBusqueda(producto_id=producto_id, termino=t[:100]) for t in set(busqueda.split()))
+        if len(lote) >= 2000:
+            TerminoBusqueda.objects.bulk_create(lote)
+            lote = []
+    TerminoBusqueda.objects.bulk_create(lote)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dataeasy', '0010_huella_importacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TerminoBusqueda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termino', models.CharField(max_length=100)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terminos', to='dataeasy.producto')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['termino', 'producto'], name='termino_producto_idx')],
+            },
+        ),
+        migrations.RunPython(poblar_terminos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dataeasy', '0011_terminobusqueda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trabajoimportacion',
+            name='ultimo_avance',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dataeasy', '0012_trabajo_ultimo_avance'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='producto',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+from django.db.models import F
+
+
+def copiar_iniciado(apps, schema_editor):
+    """
+    Trabajos reclamados antes de 0012 (sin latido): su último avance conocido es el
+    inicio. Así retomar_interrumpidos solo mira ultimo_avance.
+    """
+    TrabajoImportacion = apps.get_model('dataeasy', 'TrabajoImportacion')
+    TrabajoImportacion.objects.filter(
+        ultimo_avance__isnull=True, iniciado__isnull=False
+    ).update(ultimo_avance=F('iniciado'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dataeasy', '0013_producto_fecha_actualizacion_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(copiar_iniciado, migrations.RunPython.noop),
+    ]
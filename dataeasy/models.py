@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.db.models import Sum
@@ -20,6 +21,31 @@ class Marca(models.Model):
         return self.nombre_marca
 
 # --- Modelo 3: Producto ---
+
+# Condición de alerta de stock (stock_actual <= stock_minimo) sobre la columna indexada `deficit`.
+# Para agregados condicionales: Count("id", filter=ALERTA_STOCK)
+ALERTA_STOCK = models.Q(deficit__gte=0)
+
+
+class ProductoQuerySet(models.QuerySet):
+
+    def en_alerta(self):
+        """
+        Productos con stock por debajo (o igual) del mínimo: deficit >= 0.
+        Es un rango sobre la columna indexada `deficit`, no una comparación entre dos columnas.
+        Todas las consultas de alertas (sidebar, inventario, dashboard, exportación) pasan por aquí.
+        """
+        return self.filter(ALERTA_STOCK)
+
+    def sin_stock(self):
+        """ Productos en alerta sin unidades (incluye stock negativo). """
+        return self.en_alerta().filter(stock_actual__lte=0)
+
+    def stock_bajo(self):
+        """ Productos en alerta que aún tienen unidades. """
+        return self.en_alerta().filter(stock_actual__gt=0)
+
+
 class Producto(models.Model):
     nombre_producto = models.CharField(max_length=100, unique=True)
     descripcion = models.TextField(blank=True, null=True)
@@ -30,7 +56,27 @@ class Producto(models.Model):
     stock_actual = models.IntegerField(default=0)
     stock_minimo = models.IntegerField(default=5)
 
-    fecha_actualizacion = models.DateTimeField(auto_now=True)
+    # Indexada: su MAX es parte del sello de inventario (utils/cache.py)
+    fecha_actualizacion = models.DateTimeField(auto_now=True, db_index=True)
+
+    # Unidades que faltan para llegar al mínimo (>= 0 = en alerta). Columna generada y
+    # persistida por la BD: se mantiene sola con cualquier UPDATE de stock, incluidos los F().
+    deficit = models.GeneratedField(
+        expression=models.F("stock_minimo") - models.F("stock_actual"),
+        output_field=models.IntegerField(),
+        db_persist=True,
+        db_index=True,
+    )
+
+    # Búsqueda: texto plegado (sin tildes, minúsculas) mantenido por signals, ver utils/busqueda.py
+    nombre_normalizado = models.CharField(max_length=100, blank=True, default="", db_index=True, editable=False)
+    busqueda = models.CharField(max_length=310, blank=True, default="", db_index=True, editable=False)
+
+    # Huella de la última fila importada desde Excel/CSV (ver utils/importacion.py). Se borra
+    # al editar el producto a mano, así la próxima carga vuelve a compararlo campo a campo.
+    huella_importacion = models.CharField(max_length=16, blank=True, default="", editable=False)
+
+    objects = ProductoQuerySet.as_manager()
 
     def __str__(self):
         return self.nombre_producto
@@ -40,7 +86,44 @@ class Producto(models.Model):
         """ True si el stock está por debajo (o igual) del mínimo. """
         return self.stock_actual <= self.stock_minimo
 
+
+class TerminoBusqueda(models.Model):
+    """
+    Una palabra de Producto.busqueda por fila. Buscar "caf" es un rango sobre el índice
+    (termino, producto) en vez de recorrer todos los productos con LIKE '%caf%'.
+    Se mantiene junto con `busqueda` (ver utils/busqueda.py).
+    """
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name="terminos")
+    termino = models.CharField(max_length=100)
+
+    class Meta:
+        indexes = [models.Index(fields=["termino", "producto"], name="termino_producto_idx")]
+
 # --- Modelo 4: MovimientoInventario ---
+class MovimientoInventarioManager(models.Manager):
+
+    def bulk_record(self, movimientos, batch_size=1000):
+        """
+        Inserta muchos movimientos de una vez y actualiza el stock de los productos tocados.
+
+        - bulk_create en una sola transacción (no dispara post_save por fila)
+        - luego UN update agrupado del stock para los productos involucrados
+
+        Es la vía que deben usar todas las cargas masivas (Excel, facturas, scripts).
+        """
+        # Import local: utils.stock importa los modelos
+        from .utils.stock import contribucion_de, aplicar_contribuciones
+
+        movimientos = list(movimientos)
+        if not movimientos:
+            return []
+
+        with transaction.atomic():
+            creados = self.bulk_create(movimientos, batch_size=batch_size)
+            aplicar_contribuciones(contribucion_de(m) for m in creados)
+
+        return creados
+
 class MovimientoInventario(models.Model):
     producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name="movimientos")
 
@@ -51,7 +134,18 @@ class MovimientoInventario(models.Model):
 
     tipo_movimiento = models.CharField(max_length=10, choices=TIPO_MOVIMIENTO_CHOICES)
     cantidad = models.PositiveIntegerField()
-    fecha_movimiento = models.DateTimeField(auto_now_add=True)
+    # default (y no auto_now_add) para poder registrar movimientos con fecha histórica
+    fecha_movimiento = models.DateTimeField(default=timezone.now, editable=False)
+
+    objects = MovimientoInventarioManager()
+
+    class Meta:
+        indexes = [
+            # Totales por producto/tipo en un rango (stock, comparativo de productos)
+            models.Index(fields=["producto", "tipo_movimiento", "fecha_movimiento", "cantidad"], name="mov_prod_tipo_fecha_idx"),
+            # Series de tiempo de todo el inventario (chart_data_api, estadísticas)
+            models.Index(fields=["fecha_movimiento", "tipo_movimiento", "cantidad"], name="mov_fecha_tipo_idx"),
+        ]
 
     def __str__(self):
         return f"{self.tipo_movimiento.capitalize()} - {self.producto.nombre_producto}"
@@ -119,4 +213,125 @@ class DetalleFactura(models.Model):
     marca = models.CharField(max_length=255, null=True, blank=True)
     tipo_movimiento = models.CharField(max_length=50, default='salida')
     def __str__(self):
-        return f"{self.producto.nombre_producto} (x{self.cantidad})"
\ No newline at end of file
+        return f"{self.producto.nombre_producto} (x{self.cantidad})"
+
+# ============================
+# MODELOS DE HISTÓRICO
+# ============================
+class CierreStock(models.Model):
+    """
+    Checkpoint del libro de stock: saldo de un producto al cierre de una fecha
+    (incluye todos los movimientos de ese día). Lo construye el comando
+    construir_cierres_stock y se mantiene al día con cada movimiento retroactivo.
+    """
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name="cierres")
+    fecha = models.DateField()
+    saldo = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Cierre de stock"
+        verbose_name_plural = "Cierres de stock"
+        constraints = [
+            models.UniqueConstraint(fields=["producto", "fecha"], name="cierre_producto_fecha_unico"),
+        ]
+        indexes = [
+            models.Index(fields=["fecha", "producto"], name="cierre_fecha_producto_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.producto.nombre_producto} al {self.fecha}: {self.saldo}"
+
+
+class MovimientoDiario(models.Model):
+    """
+    Resumen diario del libro: total de entradas y salidas de un producto en un día.
+    Se mantiene con cada movimiento y alimenta los gráficos de series de tiempo.
+    """
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name="resumen_diario")
+    dia = models.DateField()
+    entradas = models.PositiveIntegerField(default=0)
+    salidas = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Movimiento diario"
+        verbose_name_plural = "Movimientos diarios"
+        constraints = [
+            models.UniqueConstraint(fields=["producto", "dia"], name="mov_diario_producto_dia_unico"),
+        ]
+        indexes = [
+            models.Index(fields=["dia", "entradas", "salidas"], name="mov_diario_dia_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.producto.nombre_producto} {self.dia}: +{self.entradas} / -{self.salidas}"
+
+
+# ============================
+# CARGAS MASIVAS EN SEGUNDO PLANO
+# ============================
+class TrabajoImportacion(models.Model):
+    """
+    Carga masiva (ImportJob) encolada desde carga_datos: guarda el archivo subido y el
+    avance, que el worker actualiza tras cada lote y la interfaz consulta por JSON.
+    """
+    PENDIENTE = "pendiente"
+    PROCESANDO = "procesando"
+    COMPLETADO = "completado"
+    ERROR = "error"
+    ESTADO_CHOICES = [
+        (PENDIENTE, "Pendiente"),
+        (PROCESANDO, "Procesando"),
+        (COMPLETADO, "Completado"),
+        (ERROR, "Error"),
+    ]
+
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    archivo = models.FileField(upload_to="importaciones/", null=True, blank=True)
+    nombre_archivo = models.CharField(max_length=255)
+    estado = models.CharField(max_length=12, choices=ESTADO_CHOICES, default=PENDIENTE, db_index=True)
+    mensaje = models.TextField(blank=True, default="")
+
+    # Avance (filas del archivo) y resultado acumulado de los lotes aplicados
+    total_filas = models.PositiveIntegerField(null=True, blank=True)
+    filas_procesadas = models.PositiveIntegerField(default=0)
+    filas_fallidas = models.PositiveIntegerField(default=0)
+    nuevos = models.PositiveIntegerField(default=0)
+    actualizados = models.PositiveIntegerField(default=0)
+    sin_cambios = models.PositiveIntegerField(default=0)
+    movimientos = models.PositiveIntegerField(default=0)
+
+    # Para no repetir un archivo ya importado: hash del contenido y estado del inventario
+    # al terminar (si ninguno cambió, volver a cargarlo no tendría efecto)
+    hash_archivo = models.CharField(max_length=64, blank=True, default="", db_index=True)
+    estado_inventario = models.CharField(max_length=100, blank=True, default="")
+
+    creado = models.DateTimeField(auto_now_add=True)
+    iniciado = models.DateTimeField(null=True, blank=True)
+    terminado = models.DateTimeField(null=True, blank=True)
+    # Se renueva al reclamarlo y tras cada lote: un PROCESANDO sin avance reciente quedó
+    # interrumpido (ver retomar_interrumpidos en utils/trabajos.py)
+    ultimo_avance = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Trabajo de importación"
+        verbose_name_plural = "Trabajos de importación"
+        ordering = ["-creado"]
+
+    def __str__(self):
+        return f"Importación #{self.id} {self.nombre_archivo} ({self.estado})"
+
+    @property
+    def filas_por_segundo(self):
+        """ Velocidad media desde que empezó (hasta ahora o hasta que terminó). """
+        if not self.iniciado or not self.filas_procesadas:
+            return None
+        segundos = ((self.terminado or timezone.now()) - self.iniciado).total_seconds()
+        return self.filas_procesadas / segundos if segundos > 0 else None
+
+    @property
+    def eta_segundos(self):
+        """ Segundos estimados para terminar, si se conoce el total de filas. """
+        velocidad = self.filas_por_segundo
+        if self.estado != self.PROCESANDO or not velocidad or self.total_filas is None:
+            return None
+        return max(self.total_filas - self.filas_procesadas, 0) / velocidad
@@ -1,18 +1,28 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
 from django.dispatch import receiver
+from django.db import transaction
 from django.db.models import Sum
-from .models import MovimientoInventario, Producto
+from .models import MovimientoInventario, Producto, Categoria, Marca
+from .utils.stock import Contribucion, contribucion_de, aplicar_contribuciones, movimientos_aplicados
+from .utils.historico import actualizar_cierres
+from .utils.resumen import actualizar_resumen_diario
+from .utils.cache import invalidar_inventario
+from .utils.columnar import registrar_mutacion
+from .utils.busqueda import preparar_busqueda, actualizar_busqueda, indexar_terminos
+from .utils.autocompletar import invalidar_catalogo
 
 def actualizar_stock_producto(producto_id):
     """
     Recalcula el stock de un producto sumando entradas y restando salidas.
-    
+
     LÓGICA:
     - Suma todas las ENTRADAS (compras/devoluciones)
     - Resta todas las SALIDAS (ventas)
     - stock_actual = total_entradas - total_salidas
-    
+
     Nota: La validación de stock insuficiente se hace en la vista ANTES de crear movimientos.
+    Nota 2: Los signals ya no lo usan en modo incremental (ver utils/stock.py);
+            queda como herramienta de recálculo puntual.
     """
     # Obtener total de todas las entradas (compras, devoluciones, etc.)
     total_entradas = MovimientoInventario.objects.filter(
@@ -28,23 +38,175 @@ def actualizar_stock_producto(producto_id):
 
     # Calcular stock: entradas - salidas
     stock_calculado = total_entradas - total_salidas
-    
+
     # Actualizar el stock del producto
     # Usamos update() para evitar disparar signals infinitamente
     Producto.objects.filter(id=producto_id).update(stock_actual=stock_calculado)
 
+@receiver(pre_save, sender=MovimientoInventario)
+def capturar_movimiento_anterior(sender, instance, **kwargs):
+    """
+    Signal que se dispara ANTES de guardar un MovimientoInventario.
+    Si es una edición, guarda los valores que tenía en la BD para poder
+    deshacer solo su aporte (una búsqueda por PK, no todo el historial).
+    """
+    instance._contribucion_anterior = None
+    if instance.pk is None:
+        return
+
+    anterior = MovimientoInventario.objects.filter(pk=instance.pk).values(
+        'producto_id', 'tipo_movimiento', 'cantidad', 'fecha_movimiento'
+    ).first()
+    if anterior:
+        instance._contribucion_anterior = Contribucion(**anterior)
+
 @receiver(post_save, sender=MovimientoInventario)
 def gestionar_movimiento_guardado(sender, instance, **kwargs):
     """
     Signal que se dispara DESPUÉS de crear o editar un MovimientoInventario.
-    Recalcula el stock del producto afectado automáticamente.
+    Aplica al stock solo la diferencia: resta el aporte anterior (si era
+    una edición) y suma el nuevo.
     """
-    actualizar_stock_producto(instance.producto.id)
+    contribuciones = []
+    anterior = getattr(instance, '_contribucion_anterior', None)
+    if anterior:
+        contribuciones.append(anterior._replace(cantidad=-anterior.cantidad))
+    contribuciones.append(contribucion_de(instance))
+
+    aplicar_contribuciones(contribuciones)
 
 @receiver(post_delete, sender=MovimientoInventario)
 def gestionar_movimiento_eliminado(sender, instance, **kwargs):
     """
     Signal que se dispara DESPUÉS de eliminar un MovimientoInventario.
-    Recalcula el stock del producto afectado automáticamente.
+    Deshace su aporte al stock del producto afectado.
+
+    Si el borrado viene en cascada desde el producto, su stock, resumen diario y
+    cierres se borran con él: recrear esas filas para restarles fallaría (o
+    apuntaría a un producto que ya no existe). Solo se avisa al almacén columnar.
+    """
+    contribucion = contribucion_de(instance, cantidad=-instance.cantidad)
+    origen = kwargs.get("origin")
+    if isinstance(origen, Producto) or getattr(origen, "model", None) is Producto:
+        registrar_mutacion([contribucion])
+        return
+
+    aplicar_contribuciones([contribucion])
+
+@receiver(movimientos_aplicados)
+def mantener_cierres_stock(sender, contribuciones, **kwargs):
+    """
+    Corrige los cierres de stock (checkpoints) afectados por movimientos retroactivos.
+    """
+    actualizar_cierres(contribuciones)
+
+@receiver(movimientos_aplicados)
+def mantener_resumen_diario(sender, contribuciones, **kwargs):
+    """
+    Suma/resta las contribuciones en el resumen diario (MovimientoDiario) de los gráficos.
+    """
+    actualizar_resumen_diario(contribuciones)
+
+@receiver(movimientos_aplicados)
+def marcar_almacen_columnar(sender, contribuciones, **kwargs):
+    """
+    Ediciones y borrados de movimientos obligan a recargar el almacén columnar
+    (las filas nuevas las detecta solo, por id).
+    """
+    registrar_mutacion(contribuciones)
+
+@receiver(movimientos_aplicados)
+@receiver([post_save, post_delete], sender=Producto)
+@receiver([post_save, post_delete], sender=Categoria)
+@receiver([post_save, post_delete], sender=Marca)
+def invalidar_cache_inventario(sender, **kwargs):
+    """
+    Cualquier cambio de productos, categorías, marcas o movimientos sube la versión
+    de inventario: los dashboards, contadores y alertas cacheados se recalculan en la
+    próxima visita. Se vuelve a subir al confirmar la transacción: lo que otro request
+    haya cacheado mientras tanto (aún sin ver el COMMIT) queda en la versión anterior.
+    """
+    invalidar_inventario()
+    transaction.on_commit(invalidar_inventario)
+
+@receiver(pre_save, sender=Producto)
+def preparar_busqueda_producto(sender, instance, **kwargs):
+    """
+    Mantiene las columnas de búsqueda (nombre/categoría/marca plegados) del producto.
+    """
+    preparar_busqueda(instance)
+
+@receiver(post_save, sender=Producto)
+def indexar_terminos_producto(sender, instance, update_fields=None, **kwargs):
+    """
+    Reescribe las palabras de búsqueda (TerminoBusqueda) del producto guardado.
+    """
+    if update_fields is not None and "busqueda" not in update_fields:
+        return
+    indexar_terminos([(instance.pk, instance.busqueda)])
+
+@receiver(pre_save, sender=Producto)
+def olvidar_huella_importacion(sender, instance, **kwargs):
+    """
+    Un producto guardado a mano ya no coincide necesariamente con la última fila importada:
+    sin huella, la próxima carga lo compara campo a campo (la carga masiva no pasa por save()).
+    """
+    instance.huella_importacion = ""
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_save, sender=Marca)
+def actualizar_busqueda_por_nombre(sender, instance, created, **kwargs):
+    """
+    Al renombrar una categoría o marca se reescribe la búsqueda de sus productos.
+    """
+    if created:
+        return
+    campo = "categoria" if sender is Categoria else "marca"
+    actualizar_busqueda(Producto.objects.filter(**{campo: instance}))
+
+@receiver(pre_delete, sender=Categoria)
+@receiver(pre_delete, sender=Marca)
+def recordar_productos_afectados(sender, instance, **kwargs):
+    campo = "categoria" if sender is Categoria else "marca"
+    instance._productos_afectados = list(Producto.objects.filter(**{campo: instance}).values_list("id", flat=True))
+
+@receiver(post_delete, sender=Categoria)
+@receiver(post_delete, sender=Marca)
+def actualizar_busqueda_tras_borrado(sender, instance, **kwargs):
+    """
+    Tras borrar una categoría/marca (SET_NULL en sus productos) se quita su nombre de la búsqueda.
+    """
+    ids = getattr(instance, "_productos_afectados", [])
+    if ids:
+        actualizar_busqueda(Producto.objects.filter(id__in=ids))
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_save, sender=Marca)
+def olvidar_huellas_por_nombre(sender, instance, created, **kwargs):
+    """
+    Renombrar una categoría/marca cambia lo que la huella de importación de sus productos
+    daba por cargado: se borran para que la próxima carga los vuelva a comparar.
+    """
+    if created:
+        return
+    campo = "categoria" if sender is Categoria else "marca"
+    Producto.objects.filter(**{campo: instance}).exclude(huella_importacion="").update(huella_importacion="")
+
+@receiver(post_delete, sender=Categoria)
+@receiver(post_delete, sender=Marca)
+def olvidar_huellas_tras_borrado(sender, instance, **kwargs):
+    """
+    Lo mismo al borrar una categoría/marca: sus productos quedan sin ella (SET_NULL).
+    """
+    ids = getattr(instance, "_productos_afectados", [])
+    if ids:
+        Producto.objects.filter(id__in=ids).exclude(huella_importacion="").update(huella_importacion="")
+
+@receiver([post_save, post_delete], sender=Producto)
+@receiver([post_save, post_delete], sender=Categoria)
+@receiver([post_save, post_delete], sender=Marca)
+def invalidar_indice_autocompletado(sender, **kwargs):
+    """
+    Altas, ediciones y bajas del catálogo obligan a reconstruir el índice de autocompletado.
     """
-    actualizar_stock_producto(instance.producto.id)
\ No newline at end of file
+    invalidar_catalogo()
@@ -1,3 +1,1433 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+import threading
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from importlib import import_module
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.http import FileResponse
+from django.shortcuts import get_object_or_404
+from django.db import connection
+from django.db.models import Sum
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+
+from .models import (
+    Producto, Categoria, Marca, MovimientoInventario, MovimientoDiario, CierreStock, TerminoBusqueda,
+    TrabajoImportacion, Factura, DetalleFactura, ALERTA_STOCK,
+)
+from .utils.busqueda import buscar_productos, actualizar_busqueda
+from .checks import cache_compartida, cache_compartida_despliegue
+from .context_processors import alertas_sidebar
+from .utils.alertas import resumen_alertas
+from .utils.autocompletar import IndicePrefijos
+from .utils.artefactos import podar_artefactos
+from .utils.cache import version_inventario
+from .utils.exportacion import COLUMNAS_PRODUCTOS, XLSX_CONTENT_TYPE, Columna, xlsx_en_streaming
+from .utils.facturacion import registrar_salida, ErrorFactura
+from .utils.fechas import filtro_rango_fechas
+from .utils.historico import construir_cierres, stock_as_of
+from .utils.importacion import (
+    importar_archivo, importar_dataframe, leer_por_lotes, limpiar_dataframe, particionar, preparar_en_paralelo,
+    preparar_lote,
+)
+from .utils.paginacion import codificar_cursor
+from .utils import resumen
+from .utils.columnar import AlmacenMovimientos, registrar_mutacion
+from .utils.resumen import reconstruir_resumen_diario
+from .utils.stock import recalcular_stock
+from .utils.trabajos import procesar_trabajo, retomar_interrumpidos
+
+
+class LibroStockTests(TestCase):
+    """ El stock mantenido con deltas coincide siempre con recalcularlo desde el libro. """
+
+    def setUp(self):
+        cache.clear()
+        self.productos = [Producto.objects.create(nombre_producto=f"Producto {i}") for i in range(6)]
+
+    def stock(self):
+        return dict(Producto.objects.values_list("id", "stock_actual"))
+
+    def assertStockCuadra(self):
+        mantenido = self.stock()
+        recalcular_stock()
+        self.assertEqual(mantenido, self.stock())
+
+    def test_alta_de_movimientos(self):
+        a, b = self.productos[:2]
+        MovimientoInventario.objects.create(producto=a, tipo_movimiento="entrada", cantidad=10)
+        MovimientoInventario.objects.create(producto=a, tipo_movimiento="salida", cantidad=4)
+        MovimientoInventario.objects.create(producto=b, tipo_movimiento="entrada", cantidad=7)
+        self.assertEqual(self.stock()[a.id], 6)
+        self.assertStockCuadra()
+
+    def test_edicion_de_movimiento(self):
+        a, b = self.productos[:2]
+        movimiento = MovimientoInventario.objects.create(producto=a, tipo_movimiento="entrada", cantidad=10)
+
+        movimiento.cantidad = 3
+        movimiento.save()
+        self.assertEqual(self.stock()[a.id], 3)
+
+        movimiento.tipo_movimiento = "salida"
+        movimiento.save()
+        self.assertEqual(self.stock()[a.id], -3)
+
+        movimiento.producto = b
+        movimiento.save()
+        self.assertEqual((self.stock()[a.id], self.stock()[b.id]), (0, -3))
+        self.assertStockCuadra()
+
+    def test_borrado_de_movimiento(self):
+        a = self.productos[0]
+        MovimientoInventario.objects.create(producto=a, tipo_movimiento="entrada", cantidad=10)
+        salida = MovimientoInventario.objects.create(producto=a, tipo_movimiento="salida", cantidad=4)
+        salida.delete()
+        self.assertEqual(self.stock()[a.id], 10)
+        self.assertStockCuadra()
+
+    def test_bulk_record_deltas_distintos(self):
+        # Deltas distintos por producto -> UPDATE con CASE
+        MovimientoInventario.objects.bulk_record([
+            MovimientoInventario(producto=p, tipo_movimiento=tipo, cantidad=i + 1)
+            for i, p in enumerate(self.productos)
+            for tipo in ("entrada", "entrada", "salida")
+        ])
+        self.assertEqual(self.stock()[self.productos[2].id], 3)
+        self.assertStockCuadra()
+
+    def test_bulk_record_deltas_repetidos(self):
+        # El mismo delta en todos -> UPDATE ... WHERE id IN (...) por valor
+        MovimientoInventario.objects.bulk_record([
+            MovimientoInventario(producto=p, tipo_movimiento="entrada", cantidad=7) for p in self.productos
+        ])
+        self.assertEqual(set(self.stock().values()), {7})
+        self.assertStockCuadra()
+
+    @override_settings(DATAEASY_MODO_STOCK="recalculo")
+    def test_modo_recalculo(self):
+        a = self.productos[0]
+        MovimientoInventario.objects.create(producto=a, tipo_movimiento="entrada", cantidad=10)
+        MovimientoInventario.objects.bulk_record([
+            MovimientoInventario(producto=a, tipo_movimiento="salida", cantidad=2),
+        ])
+        self.assertEqual(self.stock()[a.id], 8)
+        self.assertStockCuadra()
+
+    def test_importacion_ajusta_por_el_libro(self):
+        a, b = self.productos[:2]
+        MovimientoInventario.objects.create(producto=a, tipo_movimiento="entrada", cantidad=10)
+        df, _ = limpiar_dataframe(pd.DataFrame({
+            "nombre_producto": [a.nombre_producto, b.nombre_producto, "Producto nuevo"],
+            "categoria": ["Varios"] * 3,
+            "marca": [None] * 3,
+            "stock_actual": [4, 7, 2],
+        }))
+
+        version = version_inventario()
+        resultado = importar_dataframe(df)
+        self.assertEqual((resultado.nuevos, resultado.actualizados, resultado.movimientos), (1, 2, 3))
+        self.assertNotEqual(version_inventario(), version)
+        stock = self.stock()
+        self.assertEqual((stock[a.id], stock[b.id]), (4, 7))
+        self.assertStockCuadra()
+
+        # La misma carga otra vez no escribe movimientos
+        self.assertEqual(importar_dataframe(df).sin_cambios, 3)
+        self.assertEqual(MovimientoInventario.objects.count(), 4)
+
+
+class CierresStockTests(TestCase):
+    """ Los cierres mantenidos con cada movimiento retroactivo coinciden con reconstruirlos. """
+
+    HASTA = date(2025, 7, 1)  # cierres de enero a junio de 2025
+
+    def setUp(self):
+        cache.clear()
+        random.seed(3)
+        self.productos = [Producto.objects.create(nombre_producto=f"Producto {i}") for i in range(8)]
+        MovimientoInventario.objects.bulk_record([
+            MovimientoInventario(producto=p, tipo_movimiento="entrada", cantidad=50, fecha_movimiento=datetime(2025, 1, 10))
+            for p in self.productos[:6]
+        ])
+        construir_cierres(self.HASTA)
+
+    def cierres(self):
+        return {(p, f): s for p, f, s in CierreStock.objects.values_list("producto_id", "fecha", "saldo") if s}
+
+    def assertCierresCuadran(self):
+        mantenidos = self.cierres()
+        construir_cierres(self.HASTA)
+        self.assertEqual(mantenidos, self.cierres())
+
+    def movimientos_retroactivos(self, filas):
+        return [
+            MovimientoInventario(
+                producto=random.choice(self.productos),
+                tipo_movimiento=random.choice(["entrada", "salida"]),
+                cantidad=random.randint(1, 9),
+                fecha_movimiento=datetime(2025, 1, 1) + timedelta(days=random.randrange(240), hours=random.randrange(24)),
+            )
+            for _ in range(filas)
+        ]
+
+    def test_bulk_record_retroactivo(self):
+        # Incluye productos sin cierres (sin historial al construirlos) y fechas posteriores al último cierre
+        MovimientoInventario.objects.bulk_record(self.movimientos_retroactivos(300))
+        self.assertCierresCuadran()
+
+    def test_edicion_y_borrado_retroactivos(self):
+        movimientos = MovimientoInventario.objects.bulk_record(self.movimientos_retroactivos(20))
+        movimientos[0].fecha_movimiento = datetime(2025, 2, 3)
+        movimientos[0].save()
+        movimientos[1].cantidad += 5
+        movimientos[1].save()
+        movimientos[2].delete()
+        self.assertCierresCuadran()
+
+    def test_consultas_constantes(self):
+        with CaptureQueriesContext(connection) as consultas:
+            MovimientoInventario.objects.bulk_record(self.movimientos_retroactivos(500))
+        cierres = [c for c in consultas.captured_queries if "cierrestock" in c["sql"]]
+        self.assertLessEqual(len(cierres), 3)  # existentes + INSERT de los que faltan + UPDATE
+
+    def test_movimientos_del_mes_en_curso_no_consultan_cierres(self):
+        with CaptureQueriesContext(connection) as consultas:
+            MovimientoInventario.objects.bulk_record([
+                MovimientoInventario(producto=p, tipo_movimiento="entrada", cantidad=3) for p in self.productos
+            ])
+        self.assertFalse([c for c in consultas.captured_queries if "cierrestock" in c["sql"]])
+
+    def test_producto_sin_cierres_queda_sin_huecos(self):
+        # Un +5 y un -5 en meses distintos: el cierre intermedio y los siguientes deben existir
+        # para que el siguiente movimiento retroactivo corrija hasta el último cierre
+        nuevo = self.productos[7]
+        MovimientoInventario.objects.bulk_record([
+            MovimientoInventario(producto=nuevo, tipo_movimiento="entrada", cantidad=5, fecha_movimiento=datetime(2025, 2, 1)),
+            MovimientoInventario(producto=nuevo, tipo_movimiento="salida", cantidad=5, fecha_movimiento=datetime(2025, 4, 1)),
+        ])
+        MovimientoInventario.objects.create(
+            producto=nuevo, tipo_movimiento="entrada", cantidad=2, fecha_movimiento=datetime(2025, 1, 20)
+        )
+        self.assertEqual(stock_as_of(date(2025, 6, 30), [nuevo.id])[nuevo.id], 2)
+        self.assertCierresCuadran()
+
+    def test_stock_as_of(self):
+        a = self.productos[0]
+        MovimientoInventario.objects.bulk_record([
+            MovimientoInventario(producto=a, tipo_movimiento="salida", cantidad=5, fecha_movimiento=datetime(2025, 3, 15)),
+            MovimientoInventario(producto=a, tipo_movimiento="salida", cantidad=2, fecha_movimiento=datetime(2025, 8, 1)),
+        ])
+        self.assertEqual(stock_as_of(date(2025, 3, 14), [a.id])[a.id], 50)
+        self.assertEqual(stock_as_of(date(2025, 4, 30), [a.id])[a.id], 45)
+        self.assertEqual(stock_as_of(date(2025, 8, 1), [a.id])[a.id], 43)
+
+
+class ResumenDiarioTests(TestCase):
+    """ El resumen diario mantenido con cada movimiento coincide con reconstruirlo del libro. """
+
+    def setUp(self):
+        cache.clear()
+        random.seed(5)
+        self.productos = [Producto.objects.create(nombre_producto=f"Producto {i}") for i in range(10)]
+
+    def resumen(self):
+        return {
+            (p, d): (e, s)
+            for p, d, e, s in MovimientoDiario.objects.values_list("producto_id", "dia", "entradas", "salidas")
+            if e or s
+        }
+
+    def assertResumenCuadra(self):
+        mantenido = self.resumen()
+        reconstruir_resumen_diario()
+        self.assertEqual(mantenido, self.resumen())
+
+    def movimientos(self, filas, dias):
+        return [
+            MovimientoInventario(
+                producto=random.choice(self.productos),
+                tipo_movimiento=random.choice(["entrada", "salida"]),
+                cantidad=random.randint(1, 15),
+                fecha_movimiento=datetime(2025, 1, 1) + timedelta(days=random.randrange(dias), hours=random.randrange(24)),
+            )
+            for _ in range(filas)
+        ]
+
+    def test_bulk_record_varios_dias(self):
+        MovimientoInventario.objects.bulk_record(self.movimientos(600, 120))
+        self.assertResumenCuadra()
+
+    def test_bulk_record_mismo_delta(self):
+        # Carga masiva: el mismo delta para todos los productos en un día (UPDATE por valor)
+        MovimientoInventario.objects.bulk_record([
+            MovimientoInventario(producto=p, tipo_movimiento="entrada", cantidad=7, fecha_movimiento=datetime(2025, 5, 1))
+            for p in self.productos
+        ])
+        self.assertEqual(set(self.resumen().values()), {(7, 0)})
+        self.assertResumenCuadra()
+
+    def test_edicion_y_borrado(self):
+        movimientos = MovimientoInventario.objects.bulk_record(self.movimientos(30, 20))
+        movimientos[0].fecha_movimiento += timedelta(days=3)
+        movimientos[0].save()
+        movimientos[1].tipo_movimiento = "salida" if movimientos[1].tipo_movimiento == "entrada" else "entrada"
+        movimientos[1].save()
+        movimientos[2].delete()
+        self.assertResumenCuadra()
+
+    def test_consultas_por_lote_y_no_por_dia(self):
+        with CaptureQueriesContext(connection) as consultas:
+            MovimientoInventario.objects.bulk_record(self.movimientos(3000, 600))
+        # Un UPDATE por lote de pares (producto, día), no uno por día (~600)
+        updates = [c for c in consultas.captured_queries if c["sql"].startswith('UPDATE "dataeasy_movimientodiario"')]
+        self.assertLessEqual(len(updates), 3000 // 500)
+        self.assertResumenCuadra()
+
+    def test_movimientos_anteriores_al_resumen(self):
+        """ Base actualizada: 0006 rellena el resumen y borrar un movimiento antiguo no resta sobre 0. """
+        movimientos = MovimientoInventario.objects.bulk_record(self.movimientos(40, 10))
+        MovimientoDiario.objects.all().delete()  # el libro es anterior a la tabla de resumen
+
+        migracion = import_module("dataeasy.migrations.0006_movimientodiario")
+        migracion.poblar_resumen(django_apps, None)
+        self.assertResumenCuadra()
+
+        movimientos[0].delete()
+        movimientos[1].cantidad += 2
+        movimientos[1].save()
+        self.assertResumenCuadra()
+
+
+class AlmacenColumnarTests(TestCase):
+    """ El almacén columnar responde lo mismo que el resumen diario. """
+
+    DESDE, HASTA = date(2025, 1, 1), date(2025, 12, 31)
+
+    def setUp(self):
+        cache.clear()
+        random.seed(9)
+        self.productos = [Producto.objects.create(nombre_producto=f"Producto {i}") for i in range(5)]
+        self.ids = [p.id for p in self.productos]
+        self.registrar(200)
+
+    def registrar(self, filas):
+        MovimientoInventario.objects.bulk_record([
+            MovimientoInventario(
+                producto=random.choice(self.productos),
+                tipo_movimiento=random.choice(["entrada", "salida"]),
+                cantidad=random.randint(1, 9),
+                fecha_movimiento=datetime(2025, 1, 1) + timedelta(days=random.randrange(300)),
+            )
+            for _ in range(filas)
+        ])
+
+    def assertIgualAlResumen(self, almacen):
+        for rango in ("dia", "semana", "mes"):
+            self.assertEqual(
+                almacen.serie_movimientos(self.DESDE, self.HASTA, rango),
+                resumen.serie_movimientos(self.DESDE, self.HASTA, rango),
+            )
+        self.assertEqual(
+            almacen.totales_por_producto(self.ids, self.DESDE, self.HASTA),
+            resumen.totales_por_producto(self.ids, self.DESDE, self.HASTA),
+        )
+        self.assertEqual(
+            almacen.series_por_producto(self.ids, self.DESDE, self.HASTA),
+            resumen.series_por_producto(self.ids, self.DESDE, self.HASTA),
+        )
+
+    def test_igual_al_resumen_tras_filas_nuevas_y_borrados(self):
+        almacen = AlmacenMovimientos()
+        self.assertIgualAlResumen(almacen)
+        self.registrar(50)
+        self.assertIgualAlResumen(almacen)
+        MovimientoInventario.objects.order_by("id").first().delete()
+        self.assertIgualAlResumen(almacen)
+
+    def test_fila_confirmada_con_id_menor(self):
+        """ Un id menor que la marca de agua (commit tardío) entra por la ventana de refresco. """
+        almacen = AlmacenMovimientos()
+        ultimo = MovimientoInventario.objects.order_by("-id").first().id
+        MovimientoInventario.objects.create(
+            id=ultimo + 10, producto=self.productos[0], tipo_movimiento="entrada", cantidad=4,
+            fecha_movimiento=datetime(2025, 6, 1),
+        )
+        self.assertIgualAlResumen(almacen)
+        MovimientoInventario.objects.create(
+            id=ultimo + 5, producto=self.productos[1], tipo_movimiento="entrada", cantidad=6,
+            fecha_movimiento=datetime(2025, 6, 2),
+        )
+        self.assertIgualAlResumen(almacen)
+
+    def test_consultas_concurrentes_con_recargas(self):
+        almacen = AlmacenMovimientos()
+        esperado = almacen.totales_por_producto(self.ids, self.DESDE, self.HASTA)
+        errores, resultados = [], []
+
+        def consultar():
+            try:
+                for _ in range(30):
+                    resultados.append(almacen.totales_por_producto(self.ids, self.DESDE, self.HASTA))
+                    almacen.series_por_producto(self.ids, self.DESDE, self.HASTA)
+            except Exception as e:
+                errores.append(e)
+
+        def recargar():
+            for _ in range(30):
+                registrar_mutacion([mock.Mock(cantidad=-1)])  # fuerza recarga completa
+
+        # Los hilos no pueden usar la transacción de la prueba: el almacén relee filas ya leídas
+        partes = almacen._leer(0)
+        with mock.patch.object(almacen, "_leer", return_value=partes):
+            hilos = [threading.Thread(target=consultar) for _ in range(3)] + [threading.Thread(target=recargar)]
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+
+        self.assertEqual(errores, [])
+        self.assertTrue(all(r == esperado for r in resultados))
+
+
+class InvalidacionCacheTests(TestCase):
+    """ Toda escritura del inventario (incluido el libro de movimientos) sube la versión. """
+
+    def setUp(self):
+        cache.clear()
+        self.producto = Producto.objects.create(nombre_producto="Tornillo")
+
+    def test_movimiento_sube_version(self):
+        antes = version_inventario()
+        MovimientoInventario.objects.create(producto=self.producto, tipo_movimiento="entrada", cantidad=5)
+        self.assertNotEqual(version_inventario(), antes)
+
+    def test_bulk_record_sube_version(self):
+        antes = version_inventario()
+        MovimientoInventario.objects.bulk_record([
+            MovimientoInventario(producto=self.producto, tipo_movimiento="entrada", cantidad=3),
+        ])
+        self.assertNotEqual(version_inventario(), antes)
+
+    def test_borrar_movimiento_sube_version(self):
+        movimiento = MovimientoInventario.objects.create(producto=self.producto, tipo_movimiento="entrada", cantidad=5)
+        antes = version_inventario()
+        movimiento.delete()
+        self.assertNotEqual(version_inventario(), antes)
+
+    def test_receptores_conectados_una_vez(self):
+        with mock.patch("dataeasy.signals.invalidar_inventario") as invalidar:
+            self.producto.save()
+        invalidar.assert_called_once()
+
+        with mock.patch("dataeasy.signals.invalidar_inventario") as invalidar:
+            MovimientoInventario.objects.bulk_record([
+                MovimientoInventario(producto=self.producto, tipo_movimiento="entrada", cantidad=1),
+            ])
+        invalidar.assert_called_once()
+
+    def test_renombrar_categoria_olvida_huellas(self):
+        categoria = Categoria.objects.create(nombre_categoria="Ferretería")
+        Producto.objects.filter(id=self.producto.id).update(categoria=categoria, huella_importacion="abc")
+        categoria.nombre_categoria = "Herramientas"
+        categoria.save()
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.huella_importacion, "")
+
+
+class ArtefactosExportacionTests(TestCase):
+    """ Exportaciones guardadas en disco: ETag/304, FileResponse tras la primera y poda. """
+
+    def setUp(self):
+        cache.clear()
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        ajustes = override_settings(DATAEASY_EXPORTACIONES_DIR=self.directorio)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.client.force_login(User.objects.create_user("contador", password="x"))
+        self.producto = Producto.objects.create(nombre_producto="Lija")
+        MovimientoInventario.objects.create(producto=self.producto, tipo_movimiento="entrada", cantidad=3)
+        self.url = reverse("exportar_inventario") + "?formato=csv"
+
+    def descargar(self, **cabeceras):
+        respuesta = self.client.get(self.url, **cabeceras)
+        contenido = b"".join(respuesta.streaming_content) if respuesta.streaming else respuesta.content
+        return respuesta, contenido
+
+    def test_primera_en_streaming_luego_desde_disco_y_304(self):
+        primera, contenido = self.descargar()
+        self.assertEqual(primera.status_code, 200)
+        self.assertNotIsInstance(primera, FileResponse)
+        self.assertIn(b"Lija,,,,3,5", contenido)
+        self.assertEqual(len(os.listdir(self.directorio)), 1)
+
+        segunda, repetido = self.descargar()
+        self.assertIsInstance(segunda, FileResponse)
+        self.assertEqual((segunda["ETag"], repetido), (primera["ETag"], contenido))
+
+        condicional = self.client.get(self.url, HTTP_IF_NONE_MATCH=primera["ETag"])
+        self.assertEqual(condicional.status_code, 304)
+        self.assertEqual(condicional["ETag"], primera["ETag"])
+
+    def test_escritura_de_otro_proceso_cambia_el_etag(self):
+        # Sin signals ni invalidación de caché, como una carga hecha por otro proceso
+        with mock.patch("dataeasy.utils.artefactos.version_inventario", return_value=1):
+            etag = self.descargar()[0]["ETag"]
+            MovimientoInventario.objects.bulk_create([
+                MovimientoInventario(producto=self.producto, tipo_movimiento="entrada", cantidad=4),
+            ])
+            Producto.objects.filter(id=self.producto.id).update(stock_actual=7)
+
+            condicional = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(condicional.status_code, 200)
+            self.assertNotEqual(condicional["ETag"], etag)
+            self.assertIn(b"Lija,,,,7,5", b"".join(condicional.streaming_content))
+
+    def archivo(self, nombre, kb, horas):
+        ruta = os.path.join(self.directorio, nombre)
+        with open(ruta, "wb") as archivo:
+            archivo.write(b"x" * kb * 1024)
+        hace = time.time() - horas * 3600
+        os.utime(ruta, (hace, hace))
+        return nombre
+
+    def test_poda_por_antiguedad_y_por_tamano(self):
+        viejo = self.archivo("viejo.csv", 1, 30)
+        temporal_viejo = self.archivo(".tmp-cortado", 1, 30)
+        temporal = self.archivo(".tmp-en-curso", 400, 0)
+        usados = [self.archivo(f"uso-{h}.csv", 400, h) for h in (5, 3, 1)]
+
+        # 1 MB: de los tres de 400 KB cae el de uso más antiguo; el temporal en curso no cuenta
+        self.assertEqual(podar_artefactos(max_mb=1, max_horas=24), 3)
+        self.assertEqual(sorted(os.listdir(self.directorio)), sorted([temporal] + usados[1:]))
+        self.assertNotIn(viejo, os.listdir(self.directorio))
+        self.assertNotIn(temporal_viejo, os.listdir(self.directorio))
+
+
+class FormatosExportacionTests(TestCase):
+    """ Inventario y libro de movimientos en CSV, NDJSON y Parquet, leídos de vuelta. """
+
+    def setUp(self):
+        cache.clear()
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        ajustes = override_settings(DATAEASY_EXPORTACIONES_DIR=directorio)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.client.force_login(User.objects.create_user("contador", password="x"))
+        ferreteria = Categoria.objects.create(nombre_categoria="Ferretería")
+        self.clavo = Producto.objects.create(nombre_producto="Clavo, 2\"", categoria=ferreteria, stock_minimo=5)
+        self.tuerca = Producto.objects.create(nombre_producto="Tuerca ñ", descripcion="M8", stock_minimo=1)
+        MovimientoInventario.objects.bulk_record([
+            MovimientoInventario(producto=self.tuerca, tipo_movimiento="entrada", cantidad=9,
+                                 fecha_movimiento=datetime(2025, 2, 28, 23, 59, 59)),
+            MovimientoInventario(producto=self.clavo, tipo_movimiento="entrada", cantidad=3,
+                                 fecha_movimiento=datetime(2025, 3, 1)),
+            MovimientoInventario(producto=self.tuerca, tipo_movimiento="salida", cantidad=2,
+                                 fecha_movimiento=datetime(2025, 3, 10, 12)),
+            MovimientoInventario(producto=self.clavo, tipo_movimiento="salida", cantidad=1,
+                                 fecha_movimiento=datetime(2025, 3, 31, 23, 59, 59)),
+            MovimientoInventario(producto=self.tuerca, tipo_movimiento="entrada", cantidad=4,
+                                 fecha_movimiento=datetime(2025, 4, 1)),
+        ])
+
+    def descargar(self, nombre_url, **params):
+        respuesta = self.client.get(reverse(nombre_url), params)
+        self.assertEqual(respuesta.status_code, 200)
+        return b"".join(respuesta.streaming_content) if respuesta.streaming else respuesta.content
+
+    def inventario(self, formato, **params):
+        contenido = self.descargar("exportar_inventario", formato=formato, **params)
+        if formato == "csv":
+            return pd.read_csv(io.BytesIO(contenido), keep_default_na=False).to_dict("records")
+        if formato == "ndjson":
+            return [json.loads(linea) for linea in contenido.decode("utf-8").splitlines()]
+        return pd.read_parquet(io.BytesIO(contenido)).to_dict("records")
+
+    def test_inventario_en_cada_formato(self):
+        esperado = [
+            {"nombre_producto": 'Clavo, 2"', "descripcion": "", "categoria": "Ferretería", "marca": "",
+             "stock_actual": 2, "stock_minimo": 5},
+            {"nombre_producto": "Tuerca ñ", "descripcion": "M8", "categoria": "", "marca": "",
+             "stock_actual": 11, "stock_minimo": 1},
+        ]
+        for formato in ("csv", "ndjson", "parquet"):
+            with self.subTest(formato=formato):
+                self.assertEqual(self.inventario(formato), esperado)
+                self.assertEqual(self.inventario(formato, solo_alertas=1), esperado[:1])
+
+    def test_formato_desconocido(self):
+        respuesta = self.client.get(reverse("exportar_inventario"), {"formato": "xls"})
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_nombre_anterior_de_la_url(self):
+        self.assertEqual(reverse("exportar_excel"), reverse("exportar_inventario"))
+        respuesta = self.client.get(reverse("exportar_excel"))
+        self.assertEqual(respuesta["Content-Type"], XLSX_CONTENT_TYPE)
+
+    def movimientos(self, **params):
+        contenido = self.descargar("exportar_movimientos", formato="csv", **params)
+        filas = pd.read_csv(io.BytesIO(contenido)).to_dict("records")
+        return [(f["fecha_movimiento"], f["nombre_producto"], f["tipo_movimiento"], f["cantidad"]) for f in filas]
+
+    def test_movimientos_por_rango_de_fechas(self):
+        # Ambas fechas inclusive: del 1 de marzo 00:00 al 31 de marzo 23:59:59
+        self.assertEqual(self.movimientos(fecha_inicio="2025-03-01", fecha_fin="2025-03-31"), [
+            ("2025-03-01T00:00:00", 'Clavo, 2"', "entrada", 3),
+            ("2025-03-10T12:00:00", "Tuerca ñ", "salida", 2),
+            ("2025-03-31T23:59:59", 'Clavo, 2"', "salida", 1),
+        ])
+        self.assertEqual(
+            [m[0] for m in self.movimientos(fecha_inicio="2025-02-01", fecha_fin="2025-04-01", producto=self.tuerca.id,
+                                            tipo="entrada")],
+            ["2025-02-28T23:59:59", "2025-04-01T00:00:00"],
+        )
+        self.assertEqual(len(self.movimientos(fecha_inicio="2025-02-28", fecha_fin="2025-02-28")), 1)
+
+    def test_movimientos_en_ndjson_y_parquet(self):
+        params = {"fecha_inicio": "2025-03-10", "fecha_fin": "2025-03-10"}
+        linea = self.descargar("exportar_movimientos", formato="ndjson", **params).decode("utf-8")
+        self.assertEqual(json.loads(linea)["fecha_movimiento"], "2025-03-10T12:00:00")
+        df = pd.read_parquet(io.BytesIO(self.descargar("exportar_movimientos", formato="parquet", **params)))
+        self.assertEqual(df["fecha_movimiento"].tolist(), [pd.Timestamp(2025, 3, 10, 12)])
+        self.assertEqual(df["producto_id"].tolist(), [self.tuerca.id])
+
+
+class XlsxEnStreamingTests(TestCase):
+    """ El .xlsx escrito a mano se vuelve a leer con openpyxl y pandas celda por celda. """
+
+    def leer(self, columnas, filas):
+        contenido = b"".join(xlsx_en_streaming(columnas, filas))
+        libro = load_workbook(io.BytesIO(contenido))
+        return [list(fila) for fila in libro.active.iter_rows(values_only=True)], contenido
+
+    def test_ida_y_vuelta(self):
+        columnas = [
+            Columna("texto", "texto"), Columna("entero", "entero"), Columna("decimal", "texto"),
+            Columna("fecha", "fecha"), Columna("dia", "fecha"), Columna("vacio", "texto"),
+        ]
+        filas = [
+            ("Ñandú «café» 日本 🙂", 7, 1.5, datetime(2024, 2, 29, 13, 45, 10), date(1999, 12, 31), None),
+            ("<b>Tom & Jerry's</b> \"40\" ]]>", -3, Decimal("2.25"), datetime(2000, 1, 1), date(2024, 1, 1), ""),
+            ("  espacios  \n salto", 0, 0.0, datetime(2024, 1, 1, 23, 59, 59), date(1900, 3, 1), None),
+            ("control\x01\x0b fuera", 2 ** 40, -0.125, None, None, None),
+        ]
+        leidas, contenido = self.leer(columnas, filas)
+
+        self.assertEqual(leidas[0], [c.nombre for c in columnas])
+        self.assertEqual(leidas[1], ["Ñandú «café» 日本 🙂", 7, 1.5, datetime(2024, 2, 29, 13, 45, 10),
+                                     datetime(1999, 12, 31), None])
+        self.assertEqual(leidas[2][:5], ["<b>Tom & Jerry's</b> \"40\" ]]>", -3, 2.25, datetime(2000, 1, 1),
+                                         datetime(2024, 1, 1)])
+        self.assertEqual(leidas[3][:4], ["  espacios  \n salto", 0, 0, datetime(2024, 1, 1, 23, 59, 59)])
+        self.assertEqual(leidas[4], ["control fuera", 2 ** 40, -0.125, None, None, None])
+
+        df = pd.read_excel(io.BytesIO(contenido))
+        self.assertEqual(list(df.columns), [c.nombre for c in columnas])
+        self.assertEqual(df["entero"].tolist(), [7, -3, 0, 2 ** 40])
+        self.assertTrue(df["vacio"].isna().all())
+
+    def test_mas_de_26_columnas_y_varios_trozos(self):
+        columnas = [Columna(f"c{i}", "entero") for i in range(60)]
+        filas = [tuple(n * 100 + i for i in range(60)) for n in range(25)]
+        with mock.patch("dataeasy.utils.exportacion.FILAS_POR_TROZO", 7):
+            contenido = b"".join(xlsx_en_streaming(columnas, iter(filas)))
+
+        libro = load_workbook(io.BytesIO(contenido))
+        hoja = libro.active
+        self.assertEqual(hoja.title, "Datos")
+        self.assertEqual((hoja.max_row, hoja.max_column), (26, 60))
+        self.assertEqual(hoja["Z1"].value, "c25")
+        self.assertEqual(hoja["AA1"].value, "c26")
+        self.assertEqual(hoja["BH26"].value, 2459)
+        self.assertEqual([list(f) for f in hoja.iter_rows(min_row=2, values_only=True)], [list(f) for f in filas])
+
+    def test_sin_filas(self):
+        leidas, _ = self.leer(COLUMNAS_PRODUCTOS, [])
+        self.assertEqual(leidas, [[c.nombre for c in COLUMNAS_PRODUCTOS]])
+
+
+class AlertasSidebarTests(TestCase):
+    """ Sidebar de alertas: conteo + top por déficit, perezoso y al día tras cada escritura. """
+
+    def setUp(self):
+        cache.clear()
+        self.agotado = Producto.objects.create(nombre_producto="Agotado", stock_minimo=5)
+        self.bajo = Producto.objects.create(nombre_producto="Bajo", stock_minimo=10)
+        self.normal = Producto.objects.create(nombre_producto="Normal", stock_minimo=5)
+        MovimientoInventario.objects.bulk_record([
+            MovimientoInventario(producto=self.bajo, tipo_movimiento="entrada", cantidad=2),
+            MovimientoInventario(producto=self.normal, tipo_movimiento="entrada", cantidad=20),
+        ])
+
+    def top(self):
+        return [p["nombre_producto"] for p in resumen_alertas()["top"]]
+
+    def mover(self, producto, tipo, cantidad):
+        with self.captureOnCommitCallbacks(execute=True):
+            MovimientoInventario.objects.create(producto=producto, tipo_movimiento=tipo, cantidad=cantidad)
+
+    def test_perezoso_y_cacheado(self):
+        request = RequestFactory().get("/")
+        request.user = User.objects.create_user("bodeguero", password="x")
+
+        with CaptureQueriesContext(connection) as consultas:
+            contexto = alertas_sidebar(request)
+        self.assertEqual(len(consultas), 0)
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertTrue(contexto["hay_alertas_sidebar"])
+            self.assertEqual(contexto["total_alertas_sidebar"], 2)
+            self.assertEqual([p["nombre_producto"] for p in contexto["sidebar_alertas"]], ["Bajo", "Agotado"])
+        self.assertEqual(len(consultas), 2)  # COUNT + top
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(alertas_sidebar(request)["total_alertas_sidebar"], 2)
+        self.assertEqual(len(consultas), 0)
+
+    def test_entran_y_salen_con_cada_escritura(self):
+        self.assertEqual(self.top(), ["Bajo", "Agotado"])
+
+        self.mover(self.normal, "salida", 17)  # 3 <= 5
+        self.assertEqual(self.top(), ["Bajo", "Agotado", "Normal"])
+
+        self.mover(self.agotado, "entrada", 30)
+        self.assertEqual(self.top(), ["Bajo", "Normal"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bajo.delete()
+        self.assertEqual(resumen_alertas(), {"total": 1, "top": [mock.ANY]})
+
+        self.normal.refresh_from_db()
+        self.normal.stock_minimo = 1  # cambio de mínimo por el formulario
+        with self.captureOnCommitCallbacks(execute=True):
+            self.normal.save()
+        self.assertEqual(self.top(), [])
+
+    def test_top_acotado(self):
+        Producto.objects.bulk_create([Producto(nombre_producto=f"Vacío {i}", stock_minimo=1) for i in range(30)])
+        MovimientoInventario.objects.create(producto=self.normal, tipo_movimiento="entrada", cantidad=1)
+        resumen = resumen_alertas()
+        self.assertEqual(resumen["total"], 32)
+        self.assertEqual(len(resumen["top"]), 20)
+
+
+class ClasificacionAlertasTests(TestCase):
+    """ en_alerta / sin_stock / stock_bajo (columna deficit) coinciden con en_alerta_stock en los bordes. """
+
+    BORDES = [(5, 5), (6, 5), (4, 5), (1, 5), (0, 5), (-3, 5), (0, 0), (1, 0), (-1, 0), (0, 1)]
+
+    def setUp(self):
+        cache.clear()
+        Producto.objects.bulk_create([
+            Producto(nombre_producto=f"Stock {stock} mín {minimo}", stock_actual=stock, stock_minimo=minimo)
+            for stock, minimo in self.BORDES
+        ])
+
+    def test_consultas_y_propiedad_coinciden(self):
+        productos = list(Producto.objects.all())
+        esperado = {
+            "en_alerta": {p.id for p in productos if p.en_alerta_stock},
+            "sin_stock": {p.id for p in productos if p.en_alerta_stock and p.stock_actual <= 0},
+            "stock_bajo": {p.id for p in productos if p.en_alerta_stock and p.stock_actual > 0},
+        }
+        for consulta, ids in esperado.items():
+            with self.subTest(consulta=consulta):
+                self.assertEqual(set(getattr(Producto.objects, consulta)().values_list("id", flat=True)), ids)
+        self.assertEqual(len(esperado["en_alerta"]), 8)
+        self.assertEqual(Producto.objects.filter(ALERTA_STOCK).count(), 8)
+
+        nombres = set(Producto.objects.sin_stock().values_list("nombre_producto", flat=True))
+        self.assertEqual(nombres, {"Stock 0 mín 5", "Stock -3 mín 5", "Stock 0 mín 0", "Stock -1 mín 0", "Stock 0 mín 1"})
+
+    def test_etiquetas_del_inventario(self):
+        self.client.force_login(User.objects.create_user("bodega", password="x"))
+        respuesta = self.client.get(reverse("inventario_lista"), {"solo_alertas": 1})
+        self.assertContains(respuesta, '<span class="badge bg-danger">Sin stock</span>', count=5)
+        self.assertContains(respuesta, '<span class="badge bg-warning text-dark">Stock bajo</span>', count=3)
+
+
+class CacheCompartidaCheckTests(TestCase):
+
+    def cache(self, backend):
+        return {"default": {"BACKEND": backend}}
+
+    def test_locmem_avisa_y_falla_en_despliegue(self):
+        with override_settings(CACHES=self.cache("django.core.cache.backends.locmem.LocMemCache")):
+            self.assertEqual([e.id for e in cache_compartida(None)], ["dataeasy.W001"])
+            self.assertEqual([e.id for e in cache_compartida_despliegue(None)], ["dataeasy.E001"])
+        for backend in ("django.core.cache.backends.redis.RedisCache", "django.core.cache.backends.dummy.DummyCache"):
+            with override_settings(CACHES=self.cache(backend)):
+                self.assertEqual(cache_compartida(None) + cache_compartida_despliegue(None), [])
+
+
+class RegistrarSalidaTests(TestCase):
+    """ registrar_salida descuenta el stock por el libro, o no escribe nada si falta stock. """
+
+    RUT = "11111111-1"
+
+    def setUp(self):
+        cache.clear()
+        self.a = Producto.objects.create(nombre_producto="Cable")
+        self.b = Producto.objects.create(nombre_producto="Enchufe")
+        MovimientoInventario.objects.bulk_record([
+            MovimientoInventario(producto=self.a, tipo_movimiento="entrada", cantidad=10),
+            MovimientoInventario(producto=self.b, tipo_movimiento="entrada", cantidad=4),
+        ])
+
+    def stock(self):
+        return dict(Producto.objects.values_list("nombre_producto", "stock_actual"))
+
+    def test_descuenta_stock_y_sube_version(self):
+        version = version_inventario()
+        factura = registrar_salida("Ana", "Rojas", self.RUT, [
+            {"id": self.a.id, "cantidad": 3}, {"id": self.b.id, "cantidad": "4"}, {"id": self.a.id, "cantidad": 2},
+        ])
+        self.assertEqual(self.stock(), {"Cable": 5, "Enchufe": 0})
+        self.assertNotEqual(version_inventario(), version)
+        self.assertEqual(factura.detalles.count(), 3)
+        self.assertEqual(MovimientoInventario.objects.filter(tipo_movimiento="salida").count(), 3)
+        recalcular_stock()
+        self.assertEqual(self.stock(), {"Cable": 5, "Enchufe": 0})
+
+    def test_sobreventa_no_escribe_nada(self):
+        version = version_inventario()
+        # Cada item cabe por separado, pero juntos superan el stock del producto
+        carritos = [
+            [{"id": self.a.id, "cantidad": 6}, {"id": self.a.id, "cantidad": 5}],
+            [{"id": self.b.id, "cantidad": 1}, {"id": self.a.id, "cantidad": 11}],
+            [{"id": self.a.id, "cantidad": 1}, {"id": 999999, "cantidad": 1}],
+            [{"id": self.a.id, "cantidad": 0}],
+            [{"id": self.a.id}],
+            [],
+        ]
+        for items in carritos:
+            with self.subTest(items=items), self.assertRaises(ErrorFactura):
+                registrar_salida("Ana", "Rojas", self.RUT, items)
+
+        self.assertEqual(self.stock(), {"Cable": 10, "Enchufe": 4})
+        self.assertEqual(version_inventario(), version)
+        self.assertFalse(Factura.objects.exists())
+        self.assertFalse(DetalleFactura.objects.exists())
+        self.assertFalse(MovimientoInventario.objects.filter(tipo_movimiento="salida").exists())
+
+    def test_vista_informa_falta_de_stock(self):
+        self.client.force_login(User.objects.create_user("cajero", password="x"))
+        respuesta = self.client.post(reverse("registrar_factura"), {
+            "cliente_nombre": "Ana", "cliente_apellido": "Rojas", "cliente_rut": self.RUT,
+            "items": [{"id": self.b.id, "cantidad": 5}],
+        }, content_type="application/json")
+        self.assertEqual(respuesta.json()["status"], "error")
+        self.assertIn("Stock insuficiente para 'Enchufe'", respuesta.json()["message"])
+        self.assertEqual(self.stock()["Enchufe"], 4)
+
+
+class EditarProductoTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user("vendedor", password="x"))
+        self.producto = Producto.objects.create(nombre_producto="Martillo", stock_minimo=2)
+        MovimientoInventario.objects.create(producto=self.producto, tipo_movimiento="entrada", cantidad=10)
+
+    def test_editar_no_pisa_stock_concurrente(self):
+        """ Una salida registrada entre la lectura y el guardado del producto se conserva. """
+        def leer_y_vender(*args, **kwargs):
+            producto = get_object_or_404(*args, **kwargs)
+            MovimientoInventario.objects.create(producto=self.producto, tipo_movimiento="salida", cantidad=3)
+            return producto
+
+        with mock.patch("dataeasy.views.get_object_or_404", side_effect=leer_y_vender):
+            self.client.post(reverse("inventario_editar", args=[self.producto.id]), {
+                "nombre_producto": "Martillo grande", "descripcion": "", "stock_minimo": 4,
+            })
+
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.nombre_producto, "Martillo grande")
+        self.assertEqual(self.producto.stock_minimo, 4)
+        self.assertEqual(self.producto.stock_actual, 7)
+        self.assertEqual(self.producto.nombre_normalizado, "martillo grande")
+
+
+class BusquedaProductosTests(TestCase):
+    """ La búsqueda por palabras (TerminoBusqueda) sigue a todas las vías que escriben `busqueda`. """
+
+    def setUp(self):
+        cache.clear()
+        self.cafe = Categoria.objects.create(nombre_categoria="Cafetería")
+        self.marca = Marca.objects.create(nombre_marca="Andes")
+        Producto.objects.create(nombre_producto="Café Orgánico", categoria=self.cafe)
+        Producto.objects.create(nombre_producto="Café", marca=self.marca)
+        Producto.objects.create(nombre_producto="Té verde", categoria=self.cafe)
+        Producto.objects.create(nombre_producto="Descafeinado")
+
+    def nombres(self, query):
+        return list(buscar_productos(Producto.objects.all(), query).values_list("nombre_producto", flat=True))
+
+    def test_prefijo_de_cada_palabra(self):
+        self.assertEqual(self.nombres("CAFE"), ["Café", "Café Orgánico", "Té verde"])
+        self.assertEqual(self.nombres("caf org"), ["Café Orgánico"])
+        self.assertEqual(self.nombres("andes"), ["Café"])
+        # Solo prefijos de palabra: "afe" no está al inicio de ninguna
+        self.assertEqual(self.nombres("afe"), [])
+
+    def test_consulta_por_rango_y_no_por_like(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.nombres("caf org")
+        # El LIKE de la relevancia solo ordena las filas ya encontradas
+        filtro = consultas[0]["sql"].split("ORDER BY")[0]
+        self.assertNotIn("LIKE", filtro)
+        self.assertEqual(filtro.count('"termino" >='), 2)
+
+    def test_edicion_y_renombres(self):
+        producto = Producto.objects.get(nombre_producto="Descafeinado")
+        producto.nombre_producto = "Descafeinado Andino"
+        producto.save()
+        self.assertEqual(self.nombres("andi"), ["Descafeinado Andino"])
+
+        self.cafe.nombre_categoria = "Bebidas"
+        self.cafe.save()
+        self.assertEqual(self.nombres("bebi"), ["Café Orgánico", "Té verde"])
+        self.assertEqual(self.nombres("cafeteria"), [])
+
+        self.marca.delete()
+        self.assertEqual(self.nombres("andes"), [])
+
+    def test_carga_masiva(self):
+        df, _ = limpiar_dataframe(pd.DataFrame({
+            "nombre_producto": ["Café", "Azúcar rubia"],
+            "categoria": ["Granos", "Endulzantes"],
+            "marca": [None, None],
+            "stock_actual": [5, 3],
+        }))
+        importar_dataframe(df)
+        self.assertEqual(self.nombres("gra"), ["Café"])
+        self.assertEqual(self.nombres("azucar endulz"), ["Azúcar rubia"])
+        self.assertEqual(self.nombres("andes"), [])
+        self.assertEqual(
+            set(TerminoBusqueda.objects.filter(producto__nombre_producto="Café").values_list("termino", flat=True)),
+            {"cafe", "granos"},
+        )
+
+
+class PlanConsultasTests(TestCase):
+    """ Guarda de regresión: los filtros por fecha usan los índices del libro y el inventario no hace N+1. """
+
+    def setUp(self):
+        cache.clear()
+        self.rango = filtro_rango_fechas(date(2025, 1, 1), date(2025, 3, 31))
+
+    def assertUsaIndice(self, consulta, indice):
+        plan = consulta.explain()
+        self.assertIn(indice, plan)
+        if connection.vendor == "sqlite":
+            self.assertNotIn("SCAN dataeasy_movimientoinventario", plan)
+
+    def test_rango_de_fechas_usa_los_indices_compuestos(self):
+        self.assertUsaIndice(
+            MovimientoInventario.objects.filter(**self.rango)
+            .values("tipo_movimiento").annotate(total=Sum("cantidad")).order_by(),
+            "mov_fecha_tipo_idx",
+        )
+        self.assertUsaIndice(
+            MovimientoInventario.objects.filter(producto_id__in=[1, 2], **self.rango)
+            .values("producto_id", "tipo_movimiento").annotate(total=Sum("cantidad")).order_by(),
+            "mov_prod_tipo_fecha_idx",
+        )
+
+    def test_fecha_envuelta_en_date_no_usa_el_rango(self):
+        # Lo que reemplazó filtro_rango_fechas: DATE(columna) obliga a recorrer todo el índice
+        if connection.vendor != "sqlite":
+            self.skipTest("plan de SQLite")
+        plan = MovimientoInventario.objects.filter(
+            fecha_movimiento__date__range=(date(2025, 1, 1), date(2025, 3, 31))
+        ).values("tipo_movimiento").annotate(total=Sum("cantidad")).order_by().explain()
+        self.assertIn("SCAN dataeasy_movimientoinventario", plan)
+
+    def consultas_inventario(self):
+        cache.clear()
+        categoria, marca = Categoria.objects.first(), Marca.objects.first()
+        params = {"q": "perno", "f_categoria": categoria.id, "f_marca": marca.id, "solo_alertas": 1}
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(reverse("inventario_lista"), params)
+        self.assertEqual(respuesta.status_code, 200)
+        return len(respuesta.context["page_obj"].items), len(consultas)
+
+    def sembrar(self, desde, hasta):
+        categorias = [Categoria.objects.get_or_create(nombre_categoria=f"Categoría {i}")[0] for i in range(3)]
+        marcas = [Marca.objects.get_or_create(nombre_marca=f"Marca {i}")[0] for i in range(3)]
+        Producto.objects.bulk_create([
+            Producto(nombre_producto=f"Perno {i}", categoria=categorias[i % 3], marca=marcas[i % 3], stock_actual=i % 4)
+            for i in range(desde, hasta)
+        ])
+        actualizar_busqueda(Producto.objects.all())
+
+    def test_inventario_filtrado_en_consultas_fijas(self):
+        self.client.force_login(User.objects.create_user("bodega", password="x"))
+        self.sembrar(0, 12)
+        pocos, consultas = self.consultas_inventario()
+        self.sembrar(12, 120)
+        muchos, mas_consultas = self.consultas_inventario()
+        self.assertLess(pocos, muchos)
+        self.assertEqual(consultas, mas_consultas)
+
+
+class PaginacionInventarioTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user("bodega", password="x"))
+        Producto.objects.bulk_create([Producto(nombre_producto=f"Tornillo {i:02d}") for i in range(25)])
+        actualizar_busqueda(Producto.objects.all())
+
+    def pagina(self, **params):
+        respuesta = self.client.get(reverse("inventario_lista"), params)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.context["page_obj"]
+
+    def test_cursores_validos(self):
+        primera = self.pagina()
+        segunda = self.pagina(despues=primera.siguiente)
+        self.assertEqual(segunda.items[0].nombre_producto, "Tornillo 20")
+        self.assertEqual(len(self.pagina(antes=segunda.anterior)), 20)
+        self.assertEqual(len(self.pagina(q="torn", despues=self.pagina(q="torn").siguiente)), 5)
+
+    def test_cursor_alterado_vuelve_a_la_primera_pagina(self):
+        alterados = [
+            "%%%", "bm8gZXMganNvbg", codificar_cursor({"id": 1}), codificar_cursor(["Tornillo 03"]),
+            codificar_cursor(["Tornillo 03", "x"]), codificar_cursor([["a"], {"b": 1}]),
+            codificar_cursor([None, 3]), codificar_cursor(["Tornillo 03", 2 ** 70]),
+            codificar_cursor(["T" * 200, 3]),
+        ]
+        for cursor in alterados:
+            for parametro in ("despues", "antes"):
+                with self.subTest(cursor=cursor, parametro=parametro):
+                    pagina = self.pagina(**{parametro: cursor})
+                    self.assertEqual(pagina.items[0].nombre_producto, "Tornillo 00")
+        pagina = self.pagina(q="torn", despues=codificar_cursor(["cero", "Tornillo 03", 3]))
+        self.assertEqual(pagina.items[0].nombre_producto, "Tornillo 00")
+
+
+class AutocompletarTests(TestCase):
+    """ Índice de prefijos del autocompletado: orden, acentos y reconstrucción. """
+
+    def setUp(self):
+        cache.clear()
+        bebidas = Categoria.objects.create(nombre_categoria="Bebidas")
+        self.coca = Producto.objects.create(nombre_producto="Coca Cola", categoria=bebidas)
+        self.cafe = Producto.objects.create(nombre_producto="Café Molido")
+        self.cola = Producto.objects.create(nombre_producto="Cola de Mono", categoria=bebidas)
+        Producto.objects.create(nombre_producto="Agua Tónica")
+        self.indice = IndicePrefijos()
+
+    def nombres(self, texto, limite=10):
+        return [nombre for _, nombre, _, _ in self.indice.buscar(texto, limite)]
+
+    def test_inicio_de_nombre_antes_que_inicio_de_palabra(self):
+        self.assertEqual(self.nombres("co"), ["Coca Cola", "Cola de Mono"])
+        self.assertEqual(self.nombres("cola"), ["Cola de Mono", "Coca Cola"])
+        self.assertEqual(self.nombres("mono"), ["Cola de Mono"])
+        self.assertEqual(self.nombres("co", limite=1), ["Coca Cola"])
+        self.assertEqual(self.nombres("ola"), [])
+        self.assertEqual(self.nombres("  "), [])
+        self.assertEqual(self.indice.buscar("coca")[0], (self.coca.id, "Coca Cola", "Bebidas", None))
+
+    def test_sin_acentos_ni_mayusculas(self):
+        for texto in ("cafe", "CAFÉ", "Café m", "molído"):
+            with self.subTest(texto=texto):
+                self.assertEqual(self.nombres(texto), ["Café Molido"])
+        self.assertEqual(self.nombres("tonica"), ["Agua Tónica"])
+
+    def test_se_reconstruye_con_altas_y_bajas(self):
+        self.assertEqual(self.nombres("col"), ["Cola de Mono", "Coca Cola"])
+
+        Producto.objects.create(nombre_producto="Colchón")
+        self.assertEqual(self.nombres("col"), ["Cola de Mono", "Colchón", "Coca Cola"])
+
+        self.cola.delete()
+        self.assertEqual(self.nombres("col"), ["Colchón", "Coca Cola"])
+
+        self.cafe.nombre_producto = "Café en Grano"
+        self.cafe.save()
+        self.assertEqual(self.nombres("grano"), ["Café en Grano"])
+
+    def test_alta_de_otro_proceso(self):
+        self.nombres("col")
+        # Sin signals ni invalidación de caché, como una carga hecha por otro worker
+        with mock.patch("dataeasy.utils.autocompletar.version_catalogo", return_value=1):
+            self.nombres("col")
+            Producto.objects.bulk_create([Producto(nombre_producto="Colador", nombre_normalizado="colador")])
+            self.assertEqual(self.nombres("cola"), ["Cola de Mono", "Colador", "Coca Cola"])
+
+
+class FacetasInventarioTests(TestCase):
+    """ Cada faceta cuenta con la búsqueda y la otra faceta, pero sin su propia selección. """
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user("bodega", password="x"))
+        self.tornillos, self.pinturas = Categoria.objects.bulk_create(
+            [Categoria(nombre_categoria="Tornillos"), Categoria(nombre_categoria="Pinturas")]
+        )
+        self.acme, self.bosch = Marca.objects.bulk_create([Marca(nombre_marca="Acme"), Marca(nombre_marca="Bosch")])
+        Producto.objects.bulk_create([
+            Producto(nombre_producto="Tornillo acero", categoria=self.tornillos, marca=self.acme, stock_actual=0),
+            Producto(nombre_producto="Tornillo bronce", categoria=self.tornillos, marca=self.bosch, stock_actual=10),
+            Producto(nombre_producto="Tornillo zinc", categoria=self.tornillos, marca=self.acme, stock_actual=5),
+            Producto(nombre_producto="Pintura acero", categoria=self.pinturas, marca=self.acme, stock_actual=20),
+            Producto(nombre_producto="Pintura blanca", categoria=self.pinturas, marca=self.bosch, stock_actual=1),
+            Producto(nombre_producto="Lija", stock_actual=0),
+        ])
+        actualizar_busqueda(Producto.objects.all())
+
+    def facetas(self, **params):
+        contexto = self.client.get(reverse("inventario_lista"), params).context
+        return (
+            {c.nombre_categoria: (c.total_faceta, c.alertas_faceta) for c in contexto["categorias"]},
+            {m.nombre_marca: (m.total_faceta, m.alertas_faceta) for m in contexto["marcas"]},
+        )
+
+    def test_sin_filtros(self):
+        self.assertEqual(self.facetas(), (
+            {"Tornillos": (3, 2), "Pinturas": (2, 1)},
+            {"Acme": (3, 2), "Bosch": (2, 1)},
+        ))
+
+    def test_busqueda_y_marca(self):
+        categorias, marcas = self.facetas(q="acero", f_marca=self.acme.id)
+        self.assertEqual(categorias, {"Tornillos": (1, 1), "Pinturas": (1, 0)})
+        # La faceta de marcas ignora su propia selección: Bosch sigue mostrando lo que sumaría
+        self.assertEqual(marcas, {"Acme": (2, 1), "Bosch": (0, 0)})
+
+    def test_las_dos_facetas_y_solo_alertas(self):
+        categorias, marcas = self.facetas(f_categoria=self.tornillos.id, f_marca=self.bosch.id)
+        self.assertEqual(categorias, {"Tornillos": (1, 0), "Pinturas": (1, 1)})
+        self.assertEqual(marcas, {"Acme": (2, 2), "Bosch": (1, 0)})
+
+        categorias, marcas = self.facetas(f_categoria=self.tornillos.id, solo_alertas=1)
+        self.assertEqual(categorias, {"Tornillos": (2, 2), "Pinturas": (1, 1)})
+        self.assertEqual(marcas, {"Acme": (2, 2), "Bosch": (0, 0)})
+
+
+class LecturaPorLotesTests(TestCase):
+    """ CSV y XLSX leídos en lotes: bordes de lote, encabezados y filas vacías o inválidas. """
+
+    ENCABEZADO = ["Nombre Producto", " Categoría ", "MARCA", "Stock Actual", "Stock Mínimo"]
+
+    def setUp(self):
+        cache.clear()
+
+    def archivo(self, formato, filas, separador=","):
+        if formato == "csv":
+            texto = io.StringIO()
+            csv.writer(texto, delimiter=separador, lineterminator="\n").writerows([self.ENCABEZADO] + filas)
+            return io.BytesIO(texto.getvalue().encode("utf-8-sig"))
+        libro = Workbook()
+        for fila in [self.ENCABEZADO] + filas:
+            libro.active.append([None if valor == "" else valor for valor in fila])
+        contenido = io.BytesIO()
+        libro.save(contenido)
+        contenido.seek(0)
+        return contenido
+
+    def filas(self, n):
+        return [[f"Broca {i}", "Herramientas", "", str(i), ""] for i in range(n)]
+
+    def test_bordes_de_lote(self):
+        for formato in ("csv", "xlsx"):
+            for n, tamanos in ((7, [3, 3, 1]), (6, [3, 3]), (2, [2])):
+                with self.subTest(formato=formato, filas=n):
+                    lotes = list(leer_por_lotes(self.archivo(formato, self.filas(n)), f"carga.{formato}", 3))
+                    self.assertEqual([len(lote) for lote in lotes], tamanos)
+                    nombres = pd.concat(lotes)["Nombre Producto"].tolist()
+                    self.assertEqual(nombres, [f"Broca {i}" for i in range(n)])
+
+    def test_encabezados_normalizados_y_separador(self):
+        for formato, separador in (("csv", ","), ("csv", ";"), ("xlsx", ",")):
+            with self.subTest(formato=formato, separador=separador):
+                archivo = self.archivo(formato, self.filas(2), separador)
+                lote = next(iter(leer_por_lotes(archivo, f"CARGA.{formato.upper()}", 10)))
+                limpio, descartados = limpiar_dataframe(lote)
+                self.assertEqual(descartados, 0)
+                self.assertEqual(limpio["categoria"].tolist(), ["Herramientas"] * 2)
+                self.assertEqual(limpio["stock_minimo"].tolist(), [5, 5])
+
+    def test_filas_vacias_e_invalidas(self):
+        filas = [
+            ["Broca 1", "Herramientas", "Bosch", "4", "2"],
+            ["", "", "", "", ""],                               # vacía: se salta
+            ["", "Herramientas", "", "3", ""],                  # sin nombre: descartada
+            ["Broca 2", "Herramientas", "", "muchas", ""],      # stock no numérico: descartada
+            [" Broca 1 ", "Herramientas", "Bosch", "6", "2"],   # repetida en otro lote: gana la última
+            ["Broca 3", "", "", "-2", "x"],                     # mínimo inválido: el por defecto
+        ]
+        for formato in ("csv", "xlsx"):
+            with self.subTest(formato=formato):
+                Producto.objects.all().delete()
+                resultado = importar_archivo(self.archivo(formato, filas), f"carga.{formato}", tam_lote=2)
+                self.assertEqual((resultado.filas, resultado.descartados, resultado.nuevos), (5, 2, 2))
+                self.assertEqual(
+                    sorted(Producto.objects.values_list("nombre_producto", "stock_actual", "stock_minimo")),
+                    [("Broca 1", 6, 2), ("Broca 3", -2, 5)],
+                )
+
+    def test_archivo_sin_filas(self):
+        for formato in ("csv", "xlsx"):
+            with self.subTest(formato=formato):
+                resultado = importar_archivo(self.archivo(formato, []), f"carga.{formato}", tam_lote=2)
+                self.assertEqual((resultado.filas, resultado.nuevos), (0, 0))
+
+
+class PreparacionParalelaTests(TestCase):
+    """ Partir un lote por producto no cambia el resultado: gana la última fila y da lo mismo que en serie. """
+
+    def lote(self, inicio, filas):
+        random.seed(inicio)
+        nombres = [f"Tuerca {i}" for i in range(40)]
+        variantes = [str, lambda n: f" {n} ", str.upper]
+        return pd.DataFrame({
+            # Variantes de espacios y mayúsculas del mismo producto, repartidas por el lote
+            "Nombre Producto": [random.choice(variantes)(random.choice(nombres)) for _ in range(filas)],
+            "Categoría": [random.choice(["Ferretería", "", "Tornillería"]) for _ in range(filas)],
+            "Marca": [random.choice(["Acme", None]) for _ in range(filas)],
+            "Stock Actual": [str(inicio + i) for i in range(filas)],
+        })
+
+    def ordenado(self, df):
+        return df.sort_values("clave").reset_index(drop=True)
+
+    def test_particiones_disjuntas_y_gana_la_ultima_fila(self):
+        lote = self.lote(0, 300)
+        partes = particionar(lote, 4)
+        self.assertEqual(sum(len(p) for p in partes), 300)
+        # Cada producto cae entero en una sola partición y conserva el orden del archivo
+        claves = [set(p["nombre_producto"].str.strip().str.casefold()) for p in partes]
+        for i, a in enumerate(claves):
+            for b in claves[i + 1:]:
+                self.assertFalse(a & b)
+        for parte in partes:
+            self.assertTrue(parte.index.is_monotonic_increasing)
+
+        por_partes = pd.concat([limpiar_dataframe(p)[0] for p in partes])
+        completo, _ = limpiar_dataframe(lote)
+        pd.testing.assert_frame_equal(self.ordenado(por_partes), self.ordenado(completo))
+        # La última fila de cada producto es la de mayor stock (el stock crece con la fila)
+        ultimo = {}
+        for nombre, stock in zip(lote["Nombre Producto"], lote["Stock Actual"]):
+            ultimo[nombre.strip().casefold()] = (nombre.strip(), int(stock))
+        self.assertEqual(
+            {clave: (nombre, stock) for clave, nombre, stock in completo[["clave", "nombre_producto", "stock_actual"]].values},
+            ultimo,
+        )
+
+    def test_en_paralelo_igual_que_en_serie(self):
+        lotes = [self.lote(0, 250), self.lote(1000, 250), self.lote(2000, 7)]
+        paralelo = list(preparar_en_paralelo(iter(lotes), 2))
+        self.assertEqual(len(paralelo), 3)
+        for lote, (filas, limpio, descartados) in zip(lotes, paralelo):
+            esperado, esperados_descartados = preparar_lote(lote, textos=True)
+            self.assertEqual((filas, descartados), (len(lote), esperados_descartados))
+            pd.testing.assert_frame_equal(self.ordenado(limpio), self.ordenado(esperado))
+
+
+@override_settings(DATAEASY_IMPORTACION="comando")
+class RetomarImportacionesTests(TestCase):
+
+    CSV = "nombre_producto,categoria,marca,stock_actual\n" + "".join(
+        f"Perno {i},Ferretería,,{10 + i}\n" for i in range(6)
+    )
+
+    def setUp(self):
+        cache.clear()
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=directorio)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def trabajo(self, minutos_sin_avance):
+        trabajo = TrabajoImportacion(
+            nombre_archivo="pernos.csv", estado=TrabajoImportacion.PROCESANDO,
+            iniciado=datetime.now() - timedelta(hours=3),
+            ultimo_avance=datetime.now() - timedelta(minutes=minutos_sin_avance),
+        )
+        trabajo.archivo.save("pernos.csv", ContentFile(self.CSV.encode()))
+        return trabajo
+
+    def test_retoma_solo_los_interrumpidos(self):
+        colgado, activo = self.trabajo(45), self.trabajo(1)
+        # El worker murió tras confirmar los primeros lotes
+        df, _ = limpiar_dataframe(pd.read_csv(io.StringIO(self.CSV)).head(3))
+        importar_dataframe(df)
+
+        call_command("procesar_importaciones", stdout=io.StringIO())
+
+        colgado.refresh_from_db()
+        activo.refresh_from_db()
+        self.assertEqual(colgado.estado, TrabajoImportacion.COMPLETADO)
+        self.assertEqual(activo.estado, TrabajoImportacion.PROCESANDO)
+        # Lo ya aplicado no se vuelve a sumar
+        self.assertEqual(colgado.sin_cambios, 3)
+        self.assertEqual(
+            dict(Producto.objects.values_list("nombre_producto", "stock_actual")),
+            {f"Perno {i}": 10 + i for i in range(6)},
+        )
+        self.assertEqual(MovimientoInventario.objects.count(), 6)
+
+    def test_trabajos_sin_latido_toman_el_inicio(self):
+        # Reclamado antes de que existiera ultimo_avance: solo tiene `iniciado`
+        viejo = self.trabajo(45)
+        TrabajoImportacion.objects.filter(pk=viejo.pk).update(ultimo_avance=None)
+
+        migracion = import_module("dataeasy.migrations.0014_backfill_ultimo_avance")
+        migracion.copiar_iniciado(django_apps, None)
+
+        viejo.refresh_from_db()
+        self.assertEqual(viejo.ultimo_avance, viejo.iniciado)
+        self.assertEqual(retomar_interrumpidos(30), 1)
+
+
+class ImportacionRepetidaTests(TestCase):
+    """ procesar_trabajo salta un archivo idéntico solo si el inventario no cambió desde entonces. """
+
+    CSV = "nombre_producto,categoria,marca,stock_actual\n" + "".join(
+        f"Arandela {i},Ferretería,,{5 + i}\n" for i in range(4)
+    )
+
+    def setUp(self):
+        cache.clear()
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=directorio)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def procesar(self, contenido=None):
+        trabajo = TrabajoImportacion(nombre_archivo="arandelas.csv")
+        trabajo.archivo.save("arandelas.csv", ContentFile((contenido or self.CSV).encode()))
+        self.assertTrue(procesar_trabajo(trabajo.id))
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, TrabajoImportacion.COMPLETADO)
+        return trabajo
+
+    def test_mismo_archivo_sin_cambios_se_salta(self):
+        primero = self.procesar()
+        self.assertEqual(primero.nuevos, 4)
+
+        with mock.patch("dataeasy.utils.trabajos.importar_archivo") as importar:
+            segundo = self.procesar()
+        importar.assert_not_called()
+        self.assertIn(f"importación #{primero.id}", segundo.mensaje)
+        self.assertEqual((segundo.sin_cambios, segundo.filas_procesadas, segundo.nuevos), (4, 4, 0))
+        self.assertEqual(segundo.hash_archivo, primero.hash_archivo)
+
+    def test_no_se_salta_si_el_stock_cambio(self):
+        self.procesar()
+        arandela = Producto.objects.get(nombre_producto="Arandela 0")
+        MovimientoInventario.objects.create(producto=arandela, tipo_movimiento="salida", cantidad=2)
+
+        segundo = self.procesar()
+        self.assertNotIn("idéntico", segundo.mensaje)
+        self.assertEqual((segundo.actualizados, segundo.sin_cambios, segundo.movimientos), (1, 3, 1))
+        arandela.refresh_from_db()
+        self.assertEqual(arandela.stock_actual, 5)
+
+        # Tras esa carga el inventario vuelve a coincidir con el archivo: la siguiente sí se salta
+        self.assertIn(f"importación #{segundo.id}", self.procesar().mensaje)
+
+    def test_no_se_salta_otro_archivo(self):
+        self.procesar()
+        otro = self.procesar(self.CSV.replace("Arandela 3,Ferretería,,8", "Arandela 3,Ferretería,,9"))
+        self.assertNotIn("idéntico", otro.mensaje)
+        self.assertEqual((otro.actualizados, otro.sin_cambios), (1, 3))
+
+
+class DashboardTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user("admin", password="x", is_superuser=True))
+        Producto.objects.bulk_create(
+            [Producto(nombre_producto=f"Agotado {i}", stock_actual=0, stock_minimo=i % 7 + 1) for i in range(60)]
+            + [Producto(nombre_producto=f"Bajo {i}", stock_actual=2, stock_minimo=5) for i in range(3)]
+            + [Producto(nombre_producto=f"Normal {i}", stock_actual=20, stock_minimo=5) for i in range(5)]
+        )
+
+    def test_listas_acotadas_y_tarjetas_por_conteo(self):
+        for url in ("home", "estadisticas"):
+            contexto = self.client.get(reverse(url)).context
+            self.assertEqual(len(contexto["productos_sin_stock"]), 50)
+            self.assertEqual(contexto["total_sin_stock"], 60)
+            self.assertEqual(contexto["total_bajo_stock"], 3)
+            # Primero los de mayor déficit
+            self.assertEqual(contexto["productos_sin_stock"][0]["stock_minimo"], 7)
+        self.assertEqual(contexto["total_productos"], 68)
+        respuesta = self.client.get(reverse("home"))
+        self.assertEqual(respuesta.context["total_alertas"], 63)
+        self.assertContains(respuesta, "Ver las 63 alertas")
+
+    def test_modal_de_inventario_acotado(self):
+        respuesta = self.client.get(reverse("inventario_lista"))
+        contexto = respuesta.context
+        self.assertEqual(contexto["total_alertas"], 63)
+        self.assertEqual(len(contexto["sin_stock_items"]), 50)
+        self.assertEqual(len(contexto["bajo_stock_items"]), 3)
+        self.assertEqual(contexto["sin_stock_items"][0]["stock_minimo"], 7)
+        self.assertContains(respuesta, 'href="?solo_alertas=1">Ver las 63 alertas')
+
+
+class ComparativoProductosTests(TransactionTestCase):
+    """ TransactionTestCase: la vista async consulta en paralelo desde otros hilos (en_paralelo). """
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user("analista", password="x"))
+        self.a = Producto.objects.create(nombre_producto="Clavo")
+        self.b = Producto.objects.create(nombre_producto="Tuerca")
+        MovimientoInventario.objects.create(producto=self.a, tipo_movimiento="entrada", cantidad=8)
+        self.url = reverse("chart_productos_api")
+
+    def post_json(self, cuerpo):
+        return self.client.post(self.url, cuerpo, content_type="application/json")
+
+    def test_get_y_post(self):
+        respuesta = self.client.get(self.url, {"ids": f"{self.a.id},{self.b.id},x"})
+        self.assertEqual(respuesta.json()["ids"], [self.a.id, self.b.id])
+        self.assertEqual(respuesta.json()["entradas"], [8, 0])
+
+        respuesta = self.post_json({"ids": [self.b.id, self.a.id, self.a.id], "series": True, "rango": "dia"})
+        self.assertEqual(respuesta.json()["ids"], [self.b.id, self.a.id])
+        self.assertIn(str(self.a.id), respuesta.json()["series"])
+
+        respuesta = self.client.post(self.url, {"ids": [self.a.id]})
+        self.assertEqual(respuesta.json()["ids"], [self.a.id])
+
+    def test_cuerpo_json_invalido_es_400(self):
+        for cuerpo in ([self.a.id], {"ids": self.a.id}, {"ids": "1,2"}, {"ids": ["1"]}, {"ids": [True]}, "no es json"):
+            with self.subTest(cuerpo=cuerpo):
+                datos = cuerpo if isinstance(cuerpo, str) else json.dumps(cuerpo)
+                self.assertEqual(self.post_json(datos).status_code, 400)
+
+    def test_parametros_de_tipo_inesperado(self):
+        respuesta = self.post_json({"ids": [self.a.id], "rango": ["mes"], "fecha_inicio": 20250101})
+        self.assertEqual(respuesta.status_code, 200)
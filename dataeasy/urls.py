@@ -18,7 +18,11 @@ urlpatterns = [
     path('inventario/nuevo/', views.crear_producto, name='inventario_nuevo'),
     path('inventario/editar/<int:id_producto>/', views.editar_producto, name='inventario_editar'),
     path('inventario/eliminar/<int:id_producto>/', views.eliminar_producto, name='inventario_eliminar'),
-    path('inventario/exportar/', views.exportar_excel, name='exportar_excel'),
+    path('inventario/exportar/', views.exportar_inventario, name='exportar_inventario'),
+    # Nombre anterior de la misma ruta: los {% url 'exportar_excel' %} existentes siguen funcionando
+    path('inventario/exportar/', views.exportar_inventario, name='exportar_excel'),
+    path('movimientos/exportar/', views.exportar_movimientos, name='exportar_movimientos'),
+    path('api/inventario/', views.inventario_api, name='inventario_api'),
 
 
         
@@ -38,8 +42,12 @@ urlpatterns = [
     # --- Datos y Analíticas ---
     path('estadisticas/', views.estadisticas, name='estadisticas'),
     path('carga_datos/', views.carga_datos, name='carga_datos'),
+    path('api/importaciones/<int:id>/', views.estado_importacion_api, name='estado_importacion_api'),
     path('api/chart-data/', views.chart_data_api, name='chart_data_api'),
     path('api/chart-productos/', views.chart_productos_api, name='chart_productos_api'),
+    path('api/stock-historico/', views.stock_historico_api, name='stock_historico_api'),
+    path('api/dashboard-kpis/', views.dashboard_kpis_api, name='dashboard_kpis_api'),
+    path('api/productos/buscar/', views.buscar_productos_api, name='buscar_productos_api'),
 
     # --- FACTURACIÓN ---
     path('facturacion/', views.facturacion, name='facturacion'),
@@ -0,0 +1,27 @@
+from ..models import Producto
+from .cache import cache_versionada
+
+
+TOP_SIDEBAR = 20
+
+
+def resumen_alertas(limite=TOP_SIDEBAR):
+    """
+    {'total': n, 'top': [dicts]} con los `limite` productos más críticos (mayor déficit).
+
+    Solo se cachea el conteo y el top, no el conjunto de alertas: dos consultas sobre el
+    índice de `deficit` (un COUNT del rango y un recorrido descendente con LIMIT), así lo
+    que cada página deserializa no crece con el catálogo. Se cachea por versión de
+    inventario: cualquier escritura de productos o movimientos lo invalida (ver signals).
+    """
+    def calcular():
+        alertas = Producto.objects.en_alerta()
+        return {
+            "total": alertas.count(),
+            "top": list(
+                alertas.order_by("-deficit", "-id")
+                .values("id", "nombre_producto", "stock_actual", "stock_minimo")[:limite]
+            ),
+        }
+
+    return cache_versionada("alertas_sidebar", calcular, limite)
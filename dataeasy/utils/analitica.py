@@ -0,0 +1,27 @@
+from django.conf import settings
+
+from . import resumen
+
+
+# Fuente de los gráficos de movimientos, según DATAEASY_ANALITICA:
+# - 'orm':      consultas agrupadas sobre el resumen diario (MovimientoDiario)
+# - 'columnar': almacén en memoria con NumPy (utils/columnar.py), mismo JSON
+
+
+def _motor():
+    if getattr(settings, "DATAEASY_ANALITICA", "orm") == "columnar":
+        from .columnar import almacen
+        return almacen
+    return resumen
+
+
+def serie_movimientos(fecha_inicio, fecha_fin, rango="mes"):
+    return _motor().serie_movimientos(fecha_inicio, fecha_fin, rango)
+
+
+def totales_por_producto(producto_ids, fecha_inicio, fecha_fin):
+    return _motor().totales_por_producto(producto_ids, fecha_inicio, fecha_fin)
+
+
+def series_por_producto(producto_ids, fecha_inicio, fecha_fin, rango="mes"):
+    return _motor().series_por_producto(producto_ids, fecha_inicio, fecha_fin, rango)
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from contextlib import suppress
+from pathlib import Path
+
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from .cache import version_inventario, sello_inventario
+from .exportacion import FORMATOS
+
+
+# Límites por defecto del directorio de exportaciones (ver settings)
+MAX_MB = 500
+MAX_HORAS = 24
+
+_PREFIJO_TEMPORAL = ".tmp-"
+
+
+def directorio_artefactos():
+    directorio = Path(getattr(settings, "DATAEASY_EXPORTACIONES_DIR", Path(settings.MEDIA_ROOT) / "exportaciones"))
+    directorio.mkdir(parents=True, exist_ok=True)
+    return directorio
+
+
+def _firma(nombre, formato, filtros):
+    """
+    (archivo, etag) del artefacto: formato + filtros normalizados + versión de inventario
+    + sello de la BD. La versión cambia con cualquier escritura hecha por este proceso o
+    avisada por la caché compartida; el sello cubre las que llegan de otro proceso (cargas
+    por comando, reconciliaciones). Así un artefacto nunca se sirve con datos viejos; los de
+    versiones anteriores los poda la política.
+    """
+    version = f"{version_inventario()}-{sello_inventario()}"
+    firma = hashlib.md5(json.dumps([formato, filtros], sort_keys=True, default=str).encode()).hexdigest()
+    return f"{nombre}-{version}-{firma}.{FORMATOS[formato].extension}", f'"{version}-{firma}"'
+
+
+def podar_artefactos(max_mb=None, max_horas=None):
+    """
+    Borra los artefactos sin uso hace más de max_horas y, si aun así el directorio pasa de
+    max_mb, los de uso más antiguo primero (cada descarga renueva el mtime del archivo).
+    Los temporales abandonados (descargas cortadas) caen por edad. Devuelve cuántos borró.
+    """
+    if max_mb is None:
+        max_mb = getattr(settings, "DATAEASY_EXPORTACIONES_MB", MAX_MB)
+    if max_horas is None:
+        max_horas = getattr(settings, "DATAEASY_EXPORTACIONES_HORAS", MAX_HORAS)
+
+    ahora = time.time()
+    vigentes, borrados = [], 0
+    for ruta in directorio_artefactos().iterdir():
+        try:
+            estado = ruta.stat()
+        except FileNotFoundError:
+            continue
+        if ahora - estado.st_mtime > max_horas * 3600:
+            with suppress(FileNotFoundError):
+                ruta.unlink()
+                borrados += 1
+        elif not ruta.name.startswith(_PREFIJO_TEMPORAL):
+            vigentes.append((estado.st_mtime, estado.st_size, ruta))
+
+    total = sum(tamano for _, tamano, _ in vigentes)
+    for _, tamano, ruta in sorted(vigentes):
+        if total <= max_mb * 2**20:
+            break
+        with suppress(FileNotFoundError):
+            ruta.unlink()
+            borrados += 1
+        total -= tamano
+    return borrados
+
+
+def _generar_y_guardar(trozos, destino):
+    """
+    Entrega los trozos al cliente y a la vez los escribe en un temporal del mismo directorio;
+    al terminar lo renombra (atómico) como artefacto. Si la descarga se corta, el temporal
+    se borra y no queda un artefacto a medias.
+    """
+    fd, temporal = tempfile.mkstemp(dir=destino.parent, prefix=_PREFIJO_TEMPORAL)
+    guardado = False
+    try:
+        with os.fdopen(fd, "wb") as archivo:
+            for trozo in trozos:
+                archivo.write(trozo)
+                yield trozo
+        os.replace(temporal, destino)
+        guardado = True
+        podar_artefactos()
+    finally:
+        if not guardado:
+            with suppress(FileNotFoundError):
+                os.unlink(temporal)
+
+
+def respuesta_artefacto(request, nombre, formato, filtros, columnas, filas):
+    """
+    Descarga de una exportación cacheada en disco por (formato, filtros, versión de inventario).
+
+    - If-None-Match igual al ETag -> 304 sin leer nada
+    - artefacto en disco -> FileResponse con ETag y Content-Length
+    - si no -> se genera en streaming (filas no se recorre hasta aquí) y queda guardado
+
+    La firma incluye un sello de la BD: lo que escribe otro proceso también cambia el ETag.
+    """
+    archivo, etag = _firma(nombre, formato, filtros)
+    exportador = FORMATOS[formato]
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        ruta = directorio_artefactos() / archivo
+        try:
+            os.utime(ruta)  # marca el uso para la poda por antigüedad
+            response = FileResponse(ruta.open("rb"), content_type=exportador.content_type)
+        except FileNotFoundError:
+            response = StreamingHttpResponse(
+                _generar_y_guardar(exportador.generar(columnas, filas), ruta),
+                content_type=exportador.content_type,
+            )
+
+        response["Content-Disposition"] = f'attachment; filename="{nombre}.{exportador.extension}"'
+
+    response["ETag"] = etag
+    # Privado (requiere sesión) y siempre revalidado: el navegador reusa su copia con un 304
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -0,0 +1,29 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+
+def _en_hilo_propio(funcion):
+    def envoltura():
+        try:
+            return funcion()
+        finally:
+            # Cada hilo del pool tiene su propia conexión: se cierra como al terminar un request
+            close_old_connections()
+    return envoltura
+
+
+async def en_paralelo(*funciones):
+    """
+    Ejecuta funciones síncronas (consultas del ORM) al mismo tiempo desde una vista async.
+
+    Cada función corre en un hilo del pool con su propia conexión a la BD
+    (thread_sensitive=False), así las consultas independientes no se esperan
+    entre sí y el worker ASGI queda libre mientras la BD responde.
+    Devuelve los resultados en el mismo orden.
+    """
+    return await asyncio.gather(*(
+        sync_to_async(_en_hilo_propio(f), thread_sensitive=False)()
+        for f in funciones
+    ))
@@ -0,0 +1,119 @@
+import threading
+import time
+from bisect import bisect_left
+
+from django.core.cache import cache
+from django.db.models import Max
+
+from ..models import Producto
+from .busqueda import normalizar_texto
+
+
+# Sube con cada alta, edición o baja de productos, categorías o marcas (no con los
+# movimientos: el stock se lee aparte). Cada worker reconstruye su índice al verla cambiar.
+CLAVE_CATALOGO = "dataeasy:version_catalogo"
+
+LOTE_CARGA = 5000
+
+
+def version_catalogo():
+    """ Versión actual del catálogo (se inicializa con el reloj si la clave no existe). """
+    version = cache.get(CLAVE_CATALOGO)
+    if version is None:
+        cache.add(CLAVE_CATALOGO, time.time_ns(), None)
+        version = cache.get(CLAVE_CATALOGO)
+    return version
+
+
+def invalidar_catalogo():
+    """ Marca como obsoletos los índices de autocompletado de todos los workers. """
+    try:
+        cache.incr(CLAVE_CATALOGO)
+    except ValueError:
+        cache.add(CLAVE_CATALOGO, time.time_ns(), None)
+
+
+def sello_catalogo():
+    """
+    Último producto creado y última edición de productos, leídos de la BD (dos MAX sobre
+    índices). Detecta las altas y ediciones de otro proceso aunque su invalidación no haya
+    llegado a esta caché. Las bajas no hace falta: la API descarta los ids que ya no existen.
+    """
+    sello = Producto.objects.aggregate(id=Max("id"), editado=Max("fecha_actualizacion"))
+    return sello["id"], sello["editado"]
+
+
+class IndicePrefijos:
+    """
+    Índice en memoria para el autocompletado de productos: dos listas ordenadas de claves
+    plegadas (ver normalizar_texto), buscadas por prefijo con bisect.
+
+        nombres   nombre completo              'coca cola 1.5l'
+        palabras  nombre desde cada palabra    'cola 1.5l', '1.5l'
+
+    Primero se toman coincidencias por inicio de nombre (ya salen en orden alfabético),
+    y si faltan, por inicio de palabra. Cada búsqueda cuesta O(log n + límite).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        # (claves_nombres, ids_nombres, claves_palabras, ids_palabras, {id: (nombre, categoría, marca)})
+        self._datos = ([], [], [], [], {})
+
+    def _construir(self):
+        filas = (
+            Producto.objects
+            .values_list("id", "nombre_producto", "nombre_normalizado",
+                         "categoria__nombre_categoria", "marca__nombre_marca")
+            .order_by()
+            .iterator(chunk_size=LOTE_CARGA)
+        )
+
+        nombres, palabras, productos = [], [], {}
+        for producto_id, nombre, normalizado, categoria, marca in filas:
+            productos[producto_id] = (nombre, categoria, marca)
+            nombres.append((normalizado, producto_id))
+            partes = normalizado.split()
+            for i in range(1, len(partes)):
+                palabras.append((" ".join(partes[i:]), producto_id))
+
+        nombres.sort()
+        palabras.sort()
+        return (
+            [c for c, _ in nombres], [i for _, i in nombres],
+            [c for c, _ in palabras], [i for _, i in palabras],
+            productos,
+        )
+
+    def refrescar(self):
+        version = (version_catalogo(), sello_catalogo())
+        if version == self._version:
+            return
+        with self._lock:
+            if version != self._version:
+                self._datos = self._construir()
+                self._version = version
+
+    def buscar(self, texto, limite=10):
+        """ [(id, nombre, categoría, marca)] de los primeros `limite` productos que empiezan con `texto`. """
+        prefijo = normalizar_texto(texto)
+        if not prefijo:
+            return []
+
+        self.refrescar()
+        claves_nombres, ids_nombres, claves_palabras, ids_palabras, productos = self._datos
+
+        encontrados = []
+        for claves, ids in ((claves_nombres, ids_nombres), (claves_palabras, ids_palabras)):
+            i = bisect_left(claves, prefijo)
+            while i < len(claves) and len(encontrados) < limite and claves[i].startswith(prefijo):
+                if ids[i] not in encontrados:
+                    encontrados.append(ids[i])
+                i += 1
+
+        return [(pid, *productos[pid]) for pid in encontrados]
+
+
+# Una instancia por proceso (worker)
+indice_productos = IndicePrefijos()
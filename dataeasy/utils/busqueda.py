@@ -0,0 +1,132 @@
+import unicodedata
+
+from django.db.models import Case, When, Value, IntegerField
+
+
+LOTE = 2000
+
+# Cota superior del rango de prefijo: el último punto de código, mayor que cualquier
+# carácter en la comparación binaria (SQLite) y en las colaciones *_0900_ai_ci de MySQL
+FIN_PREFIJO = "\U0010ffff"
+
+
+def normalizar_texto(texto):
+    """
+    Texto plegado para búsquedas: sin tildes, en minúsculas y con espacios simples.
+    'Café  Orgánico' -> 'cafe organico'
+    """
+    s = unicodedata.normalize("NFKD", str(texto or ""))
+    s = "".join(c for c in s if not unicodedata.combining(c))
+    return " ".join(s.casefold().split())
+
+
+def texto_busqueda(nombre, categoria=None, marca=None):
+    """ Contenido de Producto.busqueda: nombre, categoría y marca plegados en una sola columna. """
+    return " ".join(normalizar_texto(t) for t in (nombre, categoria, marca) if t)
+
+
+def terminos_busqueda(texto):
+    """ Palabras distintas de un texto de búsqueda ya plegado, en el largo de TerminoBusqueda. """
+    return {t[:100] for t in texto.split()}
+
+
+def filtrar_busqueda(productos, query):
+    """
+    Productos cuyas palabras (nombre, categoría o marca) empiezan con cada palabra de `query`:
+    "caf org" encuentra "Café Orgánico". Cada palabra es un rango [t, t + FIN_PREFIJO) sobre el
+    índice (termino, producto) de TerminoBusqueda, no un LIKE '%q%' que recorre todos los
+    productos. Se usa un rango y no termino__startswith porque el LIKE de SQLite no distingue
+    mayúsculas y por eso no puede usar un índice binario.
+    """
+    from ..models import TerminoBusqueda
+
+    for termino in sorted(terminos_busqueda(normalizar_texto(query))):
+        productos = productos.filter(id__in=TerminoBusqueda.objects.filter(
+            termino__gte=termino, termino__lt=termino + FIN_PREFIJO,
+        ).values("producto_id"))
+    return productos
+
+
+def buscar_productos(productos, query):
+    """
+    Filtra `productos` por el texto `query` (ver filtrar_busqueda) y anota `relevancia`:
+
+        0 = nombre exacto, 1 = nombre empieza con, 2 = nombre contiene, 3 = resto
+            (palabras sueltas del nombre, o solo categoría/marca)
+
+    Devuelve el queryset ordenado por relevancia y nombre.
+    """
+    q = normalizar_texto(query)
+    if not q:
+        return productos
+
+    return filtrar_busqueda(productos, q).annotate(
+        relevancia=Case(
+            When(nombre_normalizado=q, then=Value(0)),
+            When(nombre_normalizado__startswith=q, then=Value(1)),
+            When(nombre_normalizado__contains=q, then=Value(2)),
+            default=Value(3),
+            output_field=IntegerField(),
+        )
+    ).order_by("relevancia", "nombre_producto", "id")
+
+
+def preparar_busqueda(producto):
+    """ Rellena los campos de búsqueda de una instancia antes de guardarla. """
+    producto.nombre_normalizado = normalizar_texto(producto.nombre_producto)
+    producto.busqueda = texto_busqueda(
+        producto.nombre_producto,
+        producto.categoria.nombre_categoria if producto.categoria_id else None,
+        producto.marca.nombre_marca if producto.marca_id else None,
+    )
+
+
+def indexar_terminos(filas):
+    """
+    Reescribe los TerminoBusqueda de los productos dados como pares (producto_id, busqueda):
+    un DELETE y un bulk_create por lote. Lo llaman todas las vías que escriben `busqueda`
+    (save(), actualizar_busqueda y la carga masiva).
+    """
+    from ..models import TerminoBusqueda
+
+    filas = list(filas)
+    for i in range(0, len(filas), LOTE):
+        lote = filas[i:i + LOTE]
+        TerminoBusqueda.objects.filter(producto_id__in=[pid for pid, _ in lote]).delete()
+        TerminoBusqueda.objects.bulk_create([
+            TerminoBusqueda(producto_id=pid, termino=termino)
+            for pid, texto in lote
+            for termino in terminos_busqueda(texto)
+        ], batch_size=LOTE)
+
+
+def actualizar_busqueda(productos):
+    """
+    Recalcula `busqueda` (y sus términos) para un queryset de productos (p. ej. al renombrar
+    una categoría) con bulk_update por lotes, sin disparar save() por producto.
+    """
+    from ..models import Producto
+
+    filas = productos.values_list(
+        "id", "nombre_producto", "categoria__nombre_categoria", "marca__nombre_marca"
+    ).order_by("id")
+
+    lote = []
+    for producto_id, nombre, categoria, marca in filas.iterator(chunk_size=LOTE):
+        lote.append(Producto(
+            id=producto_id,
+            nombre_normalizado=normalizar_texto(nombre),
+            busqueda=texto_busqueda(nombre, categoria, marca),
+        ))
+        if len(lote) >= LOTE:
+            _guardar_busqueda(lote)
+            lote = []
+    if lote:
+        _guardar_busqueda(lote)
+
+
+def _guardar_busqueda(lote):
+    from ..models import Producto
+
+    Producto.objects.bulk_update(lote, ["nombre_normalizado", "busqueda"])
+    indexar_terminos((p.id, p.busqueda) for p in lote)
@@ -0,0 +1,67 @@
+import hashlib
+import json
+import time
+
+from django.core.cache import cache
+
+
+CLAVE_VERSION = "dataeasy:version_inventario"
+
+# Los datos cacheados se invalidan por versión; el timeout solo limpia lo que ya nadie pide
+TIMEOUT = 60 * 60 * 24
+
+
+def version_inventario():
+    """
+    Versión actual de los datos de inventario (productos, categorías, marcas y movimientos).
+    Cambia con cualquier escritura, así que sirve como parte de las claves de caché.
+    """
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        # Valor inicial basado en el reloj: si la clave se pierde, nunca reaparece una versión vieja
+        cache.add(CLAVE_VERSION, time.time_ns(), None)
+        version = cache.get(CLAVE_VERSION)
+    return version
+
+
+def invalidar_inventario():
+    """ Sube la versión: todo lo cacheado con la versión anterior deja de usarse. """
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.add(CLAVE_VERSION, time.time_ns(), None)
+
+
+def sello_inventario():
+    """
+    Estado del inventario leído de la BD, para lo que se guarda fuera de la caché (p. ej.
+    artefactos en disco con ETag): último movimiento, último producto y última edición de
+    productos. Tres MAX sobre índices. Detecta las escrituras de otros procesos (cargas,
+    reconciliaciones) aunque su invalidación no haya llegado a esta caché.
+    """
+    from django.db.models import Max
+    from ..models import Producto, MovimientoInventario
+
+    productos = Producto.objects.aggregate(id=Max("id"), editado=Max("fecha_actualizacion"))
+    movimiento = MovimientoInventario.objects.aggregate(id=Max("id"))["id"]
+    editado = productos["editado"].strftime("%Y%m%d%H%M%S%f") if productos["editado"] else 0
+    return f"{movimiento or 0}.{productos['id'] or 0}.{editado}"
+
+
+def clave_versionada(nombre, *partes):
+    """ Clave de caché para `nombre` + parámetros (p. ej. filtros) en la versión actual. """
+    firma = hashlib.md5(json.dumps(partes, sort_keys=True, default=str).encode()).hexdigest() if partes else "-"
+    return f"dataeasy:{nombre}:{version_inventario()}:{firma}"
+
+
+def cache_versionada(nombre, calcular, *partes, timeout=TIMEOUT):
+    """
+    Devuelve el valor cacheado para (nombre, partes) en la versión actual de inventario,
+    o lo calcula con calcular() y lo guarda.
+    """
+    clave = clave_versionada(nombre, *partes)
+    valor = cache.get(clave)
+    if valor is None:
+        valor = calcular()
+        cache.set(clave, valor, timeout)
+    return valor
@@ -0,0 +1,243 @@
+import threading
+import time
+from collections import namedtuple
+from datetime import date
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, When, Value, F, Q, IntegerField
+from django.db.models.functions import TruncDate
+
+from ..models import MovimientoInventario
+from .resumen import agrupar_por_periodo
+
+
+# Sube cada vez que un movimiento existente se edita o se borra: los workers
+# que tengan el almacén cargado lo vuelven a leer completo en la próxima consulta.
+CLAVE_MUTACIONES = "dataeasy:mutaciones_movimientos"
+
+LOTE_CARGA = 100_000
+
+
+def registrar_mutacion(contribuciones):
+    """ Marca el almacén como obsoleto si alguna contribución deshace un movimiento previo. """
+    if any(c.cantidad < 0 for c in contribuciones):
+        try:
+            cache.incr(CLAVE_MUTACIONES)
+        except ValueError:
+            cache.add(CLAVE_MUTACIONES, time.time_ns(), None)
+
+
+# Foto inmutable de las columnas: las consultas leen de UNA foto, así una recarga
+# concurrente (que arma arrays nuevos) nunca les mezcla columnas de largos distintos
+Columnas = namedtuple("Columnas", ["producto", "dias", "entradas", "salidas"])
+
+# Al refrescar se vuelven a buscar los huecos de los últimos VENTANA_IDS ids bajo la marca
+# de agua: una transacción que confirma tarde con un id menor que otro ya cargado entra igual
+VENTANA_IDS = 1000
+
+
+def _solo_lectura(*arrays):
+    for array in arrays:
+        array.flags.writeable = False
+    return arrays
+
+
+def _columnas_vacias():
+    return Columnas(*_solo_lectura(
+        np.empty(0, dtype=np.int64),
+        np.empty(0, dtype=np.int32),
+        np.empty(0, dtype=np.int64),
+        np.empty(0, dtype=np.int64),
+    ))
+
+
+class AlmacenMovimientos:
+    """
+    Copia en memoria del libro de movimientos, por columnas (arrays de NumPy):
+
+        producto  int64  producto_id
+        dias      int32  día del movimiento (ordinal de date)
+        entradas  int64  cantidad si es entrada, si no 0
+        salidas   int64  cantidad si es salida, si no 0
+
+    Las filas se mantienen ordenadas por día para cortar rangos con searchsorted,
+    y los totales se calculan con bincount en vez de GROUP BY.
+
+    Se carga una vez por worker y se refresca por marca de agua de id (solo filas nuevas,
+    más los huecos de los últimos VENTANA_IDS ids, para las que confirman fuera de orden).
+    Una fila que confirma con un id más viejo que esa ventana no aparece hasta la
+    próxima recarga completa: la fuerzan ediciones y borrados (ver registrar_mutacion)
+    o pasar DATAEASY_COLUMNAR_RECARGA segundos.
+
+    Cada refresco publica una foto nueva (Columnas) bajo el lock; las consultas
+    trabajan solo sobre la foto que les devolvió refrescar().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._vaciar()
+
+    def _vaciar(self):
+        self.columnas = _columnas_vacias()
+        self.marca_agua = 0
+        self.ids_recientes = np.empty(0, dtype=np.int64)
+        self.mutaciones = None
+        self.cargado_en = None
+
+    def _leer(self, desde_id, huecos=()):
+        filtro = Q(id__gt=desde_id)
+        if len(huecos):
+            filtro |= Q(id__in=[int(i) for i in huecos])
+        filas = (
+            MovimientoInventario.objects
+            .filter(filtro)
+            .annotate(
+                dia=TruncDate("fecha_movimiento"),
+                e=Case(When(tipo_movimiento="entrada", then=F("cantidad")), default=Value(0), output_field=IntegerField()),
+                s=Case(When(tipo_movimiento="salida", then=F("cantidad")), default=Value(0), output_field=IntegerField()),
+            )
+            .order_by("id")
+            .values_list("id", "producto_id", "dia", "e", "s")
+            .iterator(chunk_size=LOTE_CARGA)
+        )
+
+        partes = []
+        while True:
+            lote = list(islice(filas, LOTE_CARGA))
+            if not lote:
+                break
+            ids, productos, dias, entradas, salidas = zip(*lote)
+            partes.append((
+                np.array(ids, dtype=np.int64),
+                np.array(productos, dtype=np.int64),
+                np.fromiter((d.toordinal() for d in dias), dtype=np.int32, count=len(dias)),
+                np.array(entradas, dtype=np.int64),
+                np.array(salidas, dtype=np.int64),
+            ))
+        return partes
+
+    def _agregar(self, partes):
+        if not partes:
+            return
+        ids, nuevo_producto, nuevos_dias, nuevas_entradas, nuevas_salidas = (
+            np.concatenate([p[i] for p in partes]) for i in range(5)
+        )
+
+        # Una fila ya cargada nunca se suma dos veces
+        nuevas = ~np.isin(ids, self.ids_recientes)
+        if not nuevas.any():
+            return
+        ids = ids[nuevas]
+
+        actual = self.columnas
+        producto = np.concatenate([actual.producto, nuevo_producto[nuevas]])
+        dias = np.concatenate([actual.dias, nuevos_dias[nuevas]])
+        entradas = np.concatenate([actual.entradas, nuevas_entradas[nuevas]])
+        salidas = np.concatenate([actual.salidas, nuevas_salidas[nuevas]])
+
+        # Lo normal es que las filas nuevas sean de hoy: solo se reordena si llegó algo fuera de orden
+        desde = max(len(actual.dias) - 1, 0)
+        if np.any(np.diff(dias[desde:]) < 0):
+            orden = np.argsort(dias, kind="stable")
+            producto, dias, entradas, salidas = producto[orden], dias[orden], entradas[orden], salidas[orden]
+
+        self.columnas = Columnas(*_solo_lectura(producto, dias, entradas, salidas))
+        self.marca_agua = max(self.marca_agua, int(ids.max()))
+        recientes = np.concatenate([self.ids_recientes, ids])
+        self.ids_recientes = recientes[recientes > self.marca_agua - VENTANA_IDS]
+
+    def refrescar(self):
+        """ Trae las filas nuevas y devuelve la foto de columnas vigente (inmutable). """
+        recarga = getattr(settings, "DATAEASY_COLUMNAR_RECARGA", 3600)
+        with self._lock:
+            mutaciones = cache.get(CLAVE_MUTACIONES)
+            vencido = self.cargado_en is None or time.monotonic() - self.cargado_en > recarga
+            if vencido or mutaciones != self.mutaciones:
+                self._vaciar()
+                self.mutaciones = mutaciones
+                self.cargado_en = time.monotonic()
+            self._agregar(self._leer(self.marca_agua, self._huecos()))
+            return self.columnas
+
+    def _huecos(self):
+        """ Ids de la ventana bajo la marca de agua que aún no se vieron (commits tardíos o rollbacks). """
+        ventana = np.arange(max(self.marca_agua - VENTANA_IDS, 0) + 1, self.marca_agua + 1, dtype=np.int64)
+        return np.setdiff1d(ventana, self.ids_recientes, assume_unique=True)
+
+    @staticmethod
+    def _rango(columnas, fecha_inicio, fecha_fin):
+        lo = np.searchsorted(columnas.dias, fecha_inicio.toordinal(), side="left")
+        hi = np.searchsorted(columnas.dias, fecha_fin.toordinal(), side="right")
+        return slice(lo, hi)
+
+    def serie_movimientos(self, fecha_inicio, fecha_fin, rango="mes"):
+        """ Igual que resumen.serie_movimientos, pero con bincount sobre los días del rango. """
+        columnas = self.refrescar()
+        corte = self._rango(columnas, fecha_inicio, fecha_fin)
+        d0 = fecha_inicio.toordinal()
+        n_dias = fecha_fin.toordinal() - d0 + 1
+        if n_dias <= 0:
+            return agrupar_por_periodo([], rango)
+
+        posicion = columnas.dias[corte] - d0
+        entradas = np.bincount(posicion, weights=columnas.entradas[corte], minlength=n_dias).astype(np.int64)
+        salidas = np.bincount(posicion, weights=columnas.salidas[corte], minlength=n_dias).astype(np.int64)
+
+        con_movimiento = np.flatnonzero(entradas + salidas)
+        return agrupar_por_periodo(
+            ((date.fromordinal(d0 + int(i)), int(entradas[i]), int(salidas[i])) for i in con_movimiento),
+            rango,
+        )
+
+    def totales_por_producto(self, producto_ids, fecha_inicio, fecha_fin):
+        """ Igual que resumen.totales_por_producto: {producto_id: (entradas, salidas)}. """
+        columnas = self.refrescar()
+        pedidos = np.unique(np.asarray(list(producto_ids), dtype=np.int64))
+        if not len(pedidos):
+            return {}
+
+        corte = self._rango(columnas, fecha_inicio, fecha_fin)
+        producto = columnas.producto[corte]
+        seleccion = np.isin(producto, pedidos)
+        posicion = np.searchsorted(pedidos, producto[seleccion])
+
+        entradas = np.bincount(posicion, weights=columnas.entradas[corte][seleccion], minlength=len(pedidos)).astype(np.int64)
+        salidas = np.bincount(posicion, weights=columnas.salidas[corte][seleccion], minlength=len(pedidos)).astype(np.int64)
+
+        return {
+            int(pedidos[i]): (int(entradas[i]), int(salidas[i]))
+            for i in np.flatnonzero(entradas + salidas)
+        }
+
+    def series_por_producto(self, producto_ids, fecha_inicio, fecha_fin, rango="mes"):
+        """ Igual que resumen.series_por_producto: bincount sobre la clave (producto, día). """
+        columnas = self.refrescar()
+        pedidos = np.unique(np.asarray(list(producto_ids), dtype=np.int64))
+        n_dias = fecha_fin.toordinal() - fecha_inicio.toordinal() + 1
+        if not len(pedidos) or n_dias <= 0:
+            return {}
+
+        corte = self._rango(columnas, fecha_inicio, fecha_fin)
+        producto = columnas.producto[corte]
+        seleccion = np.isin(producto, pedidos)
+        posicion = np.searchsorted(pedidos, producto[seleccion]).astype(np.int64)
+        dia = (columnas.dias[corte][seleccion] - fecha_inicio.toordinal()).astype(np.int64)
+
+        # Clave única (producto, día), ordenada por producto y luego por día
+        claves, grupo = np.unique(posicion * n_dias + dia, return_inverse=True)
+        entradas = np.bincount(grupo, weights=columnas.entradas[corte][seleccion], minlength=len(claves)).astype(np.int64)
+        salidas = np.bincount(grupo, weights=columnas.salidas[corte][seleccion], minlength=len(claves)).astype(np.int64)
+
+        por_producto = {}
+        for i in np.flatnonzero(entradas + salidas):
+            pid = int(pedidos[claves[i] // n_dias])
+            dia_i = date.fromordinal(fecha_inicio.toordinal() + int(claves[i] % n_dias))
+            por_producto.setdefault(pid, []).append((dia_i, int(entradas[i]), int(salidas[i])))
+
+        return {pid: agrupar_por_periodo(dias, rango) for pid, dias in por_producto.items()}
+
+
+almacen = AlmacenMovimientos()
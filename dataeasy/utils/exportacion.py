@@ -0,0 +1,322 @@
+import csv
+import importlib.util
+import json
+import re
+import zipfile
+from collections import namedtuple
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+
+# Filas que se generan antes de entregar un trozo de la respuesta
+FILAS_POR_TROZO = 2000
+
+# Filas que la BD entrega por vuelta al recorrer el queryset con .iterator()
+LOTE_ITERADOR = 2000
+
+# Filas por row group en Parquet (cada grupo se arma en memoria y se escribe de una vez)
+FILAS_POR_GRUPO = 50_000
+
+# Columna exportada: nombre y tipo ('texto', 'entero' o 'fecha'), para los formatos tipados
+Columna = namedtuple("Columna", ["nombre", "tipo"])
+
+# Mismas columnas que espera carga_datos: el Excel exportado se puede volver a subir
+COLUMNAS_PRODUCTOS = [
+    Columna("nombre_producto", "texto"),
+    Columna("descripcion", "texto"),
+    Columna("categoria", "texto"),
+    Columna("marca", "texto"),
+    Columna("stock_actual", "entero"),
+    Columna("stock_minimo", "entero"),
+]
+
+COLUMNAS_MOVIMIENTOS = [
+    Columna("id", "entero"),
+    Columna("fecha_movimiento", "fecha"),
+    Columna("producto_id", "entero"),
+    Columna("nombre_producto", "texto"),
+    Columna("tipo_movimiento", "texto"),
+    Columna("cantidad", "entero"),
+]
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Caracteres de control que XML 1.0 no admite (openpyxl los rechaza con IllegalCharacterError)
+_ILEGALES_XML = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_EPOCA_EXCEL = datetime(1899, 12, 30)
+
+_PARTES_XLSX = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '<Relationship Id="rId2" Target="styles.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"/>'
+        '</Relationships>'
+    ),
+    # Estilos mínimos: 0 = general, 1 = fecha y hora, 2 = fecha
+    "xl/styles.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border/></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="3">'
+        '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="22" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '</cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+
+_HOJA_INICIO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_HOJA_FIN = '</sheetData></worksheet>'
+
+
+class _Salida:
+    """
+    Destino de solo escritura para zipfile y pyarrow: sin seek(), así zipfile escribe cada
+    entrada con descriptor de datos al final y no necesita volver atrás. Lo escrito se
+    acumula hasta que el generador lo retira y lo entrega al cliente.
+    """
+    closed = False
+
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+
+    def write(self, datos):
+        datos = bytes(datos)
+        self._partes.append(datos)
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def retirar(self):
+        datos = b"".join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+def _columna(indice):
+    """ 0 -> 'A', 25 -> 'Z', 26 -> 'AA' """
+    letras = ""
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+def _celda(ref, valor):
+    if valor is None or valor == "":
+        return ""
+    if isinstance(valor, bool):
+        return f'<c r="{ref}" t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, (int, float, Decimal)):
+        return f'<c r="{ref}"><v>{valor}</v></c>'
+    if isinstance(valor, datetime):
+        if timezone.is_aware(valor):
+            valor = timezone.make_naive(valor)
+        return f'<c r="{ref}" s="1"><v>{(valor - _EPOCA_EXCEL).total_seconds() / 86400:.10f}</v></c>'
+    if isinstance(valor, date):
+        return f'<c r="{ref}" s="2"><v>{(valor - _EPOCA_EXCEL.date()).days}</v></c>'
+    texto = escape(_ILEGALES_XML.sub("", str(valor)))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _fila_xml(numero, valores, columnas):
+    celdas = "".join(_celda(f"{col}{numero}", v) for col, v in zip(columnas, valores))
+    return f'<row r="{numero}">{celdas}</row>'
+
+
+def xlsx_en_streaming(columnas, filas, hoja="Datos"):
+    """
+    Genera un .xlsx en trozos de bytes a medida que se recorren `filas` (tuplas),
+    para StreamingHttpResponse: el zip se arma al vuelo (sin seek, con descriptores de
+    datos) y la hoja usa textos en línea, sin tabla de strings compartidos. La memoria
+    es la de un trozo de FILAS_POR_TROZO filas y el primer byte sale antes de leer la BD.
+    """
+    encabezado = [c.nombre for c in columnas]
+    columnas = [_columna(i) for i in range(len(encabezado))]
+    salida = _Salida()
+
+    with zipfile.ZipFile(salida, "w", zipfile.ZIP_DEFLATED) as libro:
+        for nombre, contenido in _PARTES_XLSX.items():
+            libro.writestr(nombre, contenido)
+        libro.writestr("xl/workbook.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(hoja[:31])}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+        ))
+        yield salida.retirar()
+
+        # force_zip64: el tamaño de la hoja no se conoce de antemano
+        with libro.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as hoja_xml:
+            trozo = [_HOJA_INICIO, _fila_xml(1, encabezado, columnas)]
+            for numero, fila in enumerate(filas, start=2):
+                trozo.append(_fila_xml(numero, fila, columnas))
+                if len(trozo) >= FILAS_POR_TROZO:
+                    hoja_xml.write("".join(trozo).encode("utf-8"))
+                    trozo.clear()
+                    datos = salida.retirar()
+                    if datos:
+                        yield datos
+            trozo.append(_HOJA_FIN)
+            hoja_xml.write("".join(trozo).encode("utf-8"))
+
+    yield salida.retirar()
+
+
+class _Eco:
+    """ csv.writer escribe aquí y recibe la línea de vuelta (sin buffer intermedio). """
+
+    def write(self, linea):
+        return linea
+
+
+def _valor_plano(valor):
+    return valor.isoformat() if isinstance(valor, (date, datetime)) else valor
+
+
+def csv_en_streaming(columnas, filas):
+    """ CSV (coma, UTF-8, fechas ISO 8601) de a FILAS_POR_TROZO filas por trozo. """
+    escritor = csv.writer(_Eco())
+    trozo = [escritor.writerow([c.nombre for c in columnas])]
+    for fila in filas:
+        trozo.append(escritor.writerow([_valor_plano(v) for v in fila]))
+        if len(trozo) >= FILAS_POR_TROZO:
+            yield "".join(trozo).encode("utf-8")
+            trozo.clear()
+    yield "".join(trozo).encode("utf-8")
+
+
+def ndjson_en_streaming(columnas, filas):
+    """ Un objeto JSON por línea (NDJSON), con las claves de `columnas`. """
+    nombres = [c.nombre for c in columnas]
+    codificador = DjangoJSONEncoder(ensure_ascii=False)
+    trozo = []
+    for fila in filas:
+        # Fechas en ISO completo (como en el CSV); DjangoJSONEncoder las recorta a milisegundos
+        trozo.append(codificador.encode(dict(zip(nombres, map(_valor_plano, fila)))))
+        if len(trozo) >= FILAS_POR_TROZO:
+            yield ("\n".join(trozo) + "\n").encode("utf-8")
+            trozo.clear()
+    if trozo:
+        yield ("\n".join(trozo) + "\n").encode("utf-8")
+
+
+def parquet_en_streaming(columnas, filas):
+    """
+    Parquet por row groups de FILAS_POR_GRUPO filas: cada grupo se pasa a columnas, se
+    escribe y se entrega; la memoria es la de un grupo. Requiere pyarrow (opcional).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    tipos = {"texto": pa.string(), "entero": pa.int64(), "fecha": pa.timestamp("us")}
+    esquema = pa.schema([(c.nombre, tipos[c.tipo]) for c in columnas])
+
+    def grupo(filas_grupo):
+        valores = list(zip(*filas_grupo)) if filas_grupo else [[] for _ in columnas]
+        if any(c.tipo == "fecha" for c in columnas):
+            valores = [
+                [timezone.make_naive(v) if v is not None and timezone.is_aware(v) else v for v in col]
+                if c.tipo == "fecha" else col
+                for c, col in zip(columnas, valores)
+            ]
+        return pa.table([pa.array(col, type=tipo) for col, tipo in zip(valores, esquema.types)], schema=esquema)
+
+    salida = _Salida()
+    with pq.ParquetWriter(salida, esquema, compression="snappy") as escritor:
+        filas_grupo = []
+        for fila in filas:
+            filas_grupo.append(fila)
+            if len(filas_grupo) >= FILAS_POR_GRUPO:
+                escritor.write_table(grupo(filas_grupo))
+                filas_grupo.clear()
+                yield salida.retirar()
+        if filas_grupo:
+            escritor.write_table(grupo(filas_grupo))
+    yield salida.retirar()
+
+
+# formato -> (extensión, content type, generador(columnas, filas), módulo opcional que requiere)
+FormatoExportacion = namedtuple("FormatoExportacion", ["extension", "content_type", "generar", "requiere"])
+
+FORMATOS = {
+    "xlsx": FormatoExportacion("xlsx", XLSX_CONTENT_TYPE, xlsx_en_streaming, None),
+    "csv": FormatoExportacion("csv", "text/csv; charset=utf-8", csv_en_streaming, None),
+    "ndjson": FormatoExportacion("ndjson", "application/x-ndjson", ndjson_en_streaming, None),
+    "parquet": FormatoExportacion("parquet", "application/vnd.apache.parquet", parquet_en_streaming, "pyarrow"),
+}
+
+
+def formatos_disponibles():
+    """ Claves de FORMATOS cuyas dependencias opcionales están instaladas. """
+    return [
+        clave for clave, formato in FORMATOS.items()
+        if formato.requiere is None or importlib.util.find_spec(formato.requiere) is not None
+    ]
+
+
+def filas_productos(productos, chunk_size=LOTE_ITERADOR):
+    """
+    Tuplas (nombre, descripción, categoría, marca, stock, mínimo) del queryset, leídas
+    con .iterator(): la BD entrega chunk_size filas por vuelta y no se cachea el queryset.
+    """
+    filas = productos.values_list(
+        "nombre_producto", "descripcion", "categoria__nombre_categoria",
+        "marca__nombre_marca", "stock_actual", "stock_minimo",
+    )
+    for nombre, descripcion, categoria, marca, stock, minimo in filas.iterator(chunk_size=chunk_size):
+        yield nombre, descripcion or "", categoria or "", marca or "", stock, minimo
+
+
+def filas_movimientos(movimientos, chunk_size=LOTE_ITERADOR):
+    """ Tuplas de COLUMNAS_MOVIMIENTOS del queryset del libro, leídas con .iterator(). """
+    return movimientos.values_list(
+        "id", "fecha_movimiento", "producto_id", "producto__nombre_producto", "tipo_movimiento", "cantidad",
+    ).iterator(chunk_size=chunk_size)
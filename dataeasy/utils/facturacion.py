@@ -0,0 +1,85 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Producto, Factura, DetalleFactura, MovimientoInventario
+
+
+class ErrorFactura(Exception):
+    """ La factura no se puede registrar (item inválido o sin stock). El mensaje es para el usuario. """
+
+
+def leer_items(items):
+    """
+    Normaliza los items del carrito a [(producto_id, cantidad)] y valida los tipos
+    antes de abrir la transacción, para no tener filas bloqueadas por un dato mal formado.
+    """
+    normalizados = []
+    for item in items:
+        try:
+            producto_id, cantidad = int(item["id"]), int(item["cantidad"])
+        except (KeyError, TypeError, ValueError):
+            raise ErrorFactura("Item de factura inválido.")
+        if cantidad <= 0:
+            raise ErrorFactura("La cantidad de cada producto debe ser mayor que cero.")
+        normalizados.append((producto_id, cantidad))
+
+    if not normalizados:
+        raise ErrorFactura("La factura no tiene productos.")
+    return normalizados
+
+
+def registrar_salida(cliente_nombre, cliente_apellido, cliente_rut, items):
+    """
+    Crea la factura, sus detalles y los movimientos de salida en UNA transacción.
+
+    - bloquea todos los productos del carrito con un solo SELECT ... FOR UPDATE
+      ordenado por id: dos facturas concurrentes toman los bloqueos en el mismo
+      orden, así que una espera a la otra en vez de producir un deadlock
+    - valida el stock en memoria contra lo bloqueado, sumando los items repetidos
+      del mismo producto (nadie más puede descontarlo hasta el COMMIT)
+    - detalles y movimientos en bulk_create; bulk_record descuenta el stock con un
+      UPDATE agrupado y avisa a los derivados del libro una sola vez
+
+    Si falta stock no se escribe nada (ni la factura). Devuelve la Factura creada.
+    """
+    items = leer_items(items)
+
+    solicitado = defaultdict(int)
+    for producto_id, cantidad in items:
+        solicitado[producto_id] += cantidad
+
+    with transaction.atomic():
+        productos = {
+            p.id: p
+            for p in Producto.objects.select_for_update().filter(id__in=list(solicitado)).order_by("id")
+        }
+
+        for producto_id, cantidad in solicitado.items():
+            producto = productos.get(producto_id)
+            if producto is None:
+                raise ErrorFactura(f"El producto {producto_id} no existe.")
+            if producto.stock_actual < cantidad:
+                raise ErrorFactura(
+                    f"Stock insuficiente para '{producto.nombre_producto}'. "
+                    f"Disponible: {producto.stock_actual}, Solicitado: {cantidad}"
+                )
+
+        factura = Factura.objects.create(
+            cliente_nombre=cliente_nombre,
+            cliente_apellido=cliente_apellido,
+            cliente_rut=cliente_rut,
+        )
+
+        ahora = timezone.now()
+        DetalleFactura.objects.bulk_create([
+            DetalleFactura(factura=factura, producto_id=producto_id, cantidad=cantidad, tipo_movimiento="salida")
+            for producto_id, cantidad in items
+        ])
+        MovimientoInventario.objects.bulk_record(
+            MovimientoInventario(producto_id=producto_id, tipo_movimiento="salida", cantidad=cantidad, fecha_movimiento=ahora)
+            for producto_id, cantidad in items
+        )
+
+    return factura
@@ -0,0 +1,51 @@
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+
+DIAS_POR_DEFECTO = 180
+
+
+def leer_fecha(valor, por_defecto):
+    """ Convierte 'YYYY-MM-DD' en date; si viene vacío o mal formado devuelve por_defecto. """
+    if not valor:
+        return por_defecto
+    try:
+        return datetime.strptime(valor, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        # TypeError: un cuerpo JSON puede traer números u otros tipos
+        return por_defecto
+
+
+def rango_fechas(request, dias=DIAS_POR_DEFECTO, parametros=None):
+    """
+    Lee fecha_inicio / fecha_fin del GET (ambas inclusive), o de `parametros` si se
+    pasan (p. ej. el cuerpo JSON de un POST).
+    Por defecto: los últimos `dias` días hasta hoy.
+    """
+    if parametros is None:
+        parametros = request.GET
+    hoy = timezone.now().date()
+    fecha_inicio = leer_fecha(parametros.get("fecha_inicio"), hoy - timedelta(days=dias))
+    fecha_fin = leer_fecha(parametros.get("fecha_fin"), hoy)
+    return fecha_inicio, fecha_fin
+
+
+def inicio_dia(fecha):
+    """ datetime de las 00:00 de la fecha. """
+    return datetime.combine(fecha, time.min)
+
+
+def filtro_rango_fechas(fecha_inicio, fecha_fin, campo="fecha_movimiento"):
+    """
+    Filtro semiabierto [fecha_inicio 00:00, fecha_fin + 1 día 00:00) sobre un DateTimeField.
+
+    A diferencia de `campo__date__range`, no envuelve la columna en DATE(),
+    así la base de datos puede usar los índices sobre `campo`.
+
+    Uso: MovimientoInventario.objects.filter(**filtro_rango_fechas(inicio, fin))
+    """
+    return {
+        f"{campo}__gte": inicio_dia(fecha_inicio),
+        f"{campo}__lt": inicio_dia(fecha_fin + timedelta(days=1)),
+    }
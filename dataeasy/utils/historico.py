@@ -0,0 +1,245 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Case, When, Value, F, Max, Min, Sum, IntegerField
+from django.db.models.functions import TruncMonth
+
+from ..models import Producto, MovimientoInventario, CierreStock
+from .stock import LOTE_UPDATE, saldo_movimiento, signo_movimiento
+from .fechas import inicio_dia
+
+
+LOTE_CIERRES = 2000
+
+
+def _como_fecha(valor):
+    return valor.date() if isinstance(valor, datetime) else valor
+
+
+def _fin_de_mes(fecha):
+    siguiente = (fecha.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return siguiente - timedelta(days=1)
+
+
+def construir_cierres(hasta=None):
+    """
+    Reconstruye la tabla CierreStock con el saldo de cada producto a fin de cada mes.
+
+    Se lee el libro UNA vez (SUM agrupado por producto y mes) y se acumula en Python.
+    Solo se crean cierres de meses terminados antes de `hasta` (por defecto hoy).
+    Devuelve la cantidad de cierres creados.
+    """
+    hasta = _como_fecha(hasta) or date.today()
+
+    saldos_mes = (
+        MovimientoInventario.objects
+        .annotate(mes=TruncMonth("fecha_movimiento"))
+        .values_list("producto_id", "mes")
+        .annotate(saldo=Sum(saldo_movimiento()))
+        .order_by("producto_id", "mes")
+    )
+
+    primer_movimiento = MovimientoInventario.objects.aggregate(f=Min("fecha_movimiento"))["f"]
+    if primer_movimiento is None:
+        with transaction.atomic():
+            CierreStock.objects.all().delete()
+        return 0
+
+    # Fechas de cierre: último día de cada mes ya terminado
+    fechas_cierre = []
+    cierre = _fin_de_mes(_como_fecha(primer_movimiento))
+    while cierre < hasta:
+        fechas_cierre.append(cierre)
+        cierre = _fin_de_mes(cierre + timedelta(days=1))
+
+    creados = 0
+    lote = []
+
+    def volcar():
+        nonlocal creados, lote
+        CierreStock.objects.bulk_create(lote)
+        creados += len(lote)
+        lote = []
+
+    def cerrar_producto(producto_id, saldos):
+        acumulado, con_historial = 0, False
+        meses = iter(sorted(saldos.items()))
+        pendiente = next(meses, None)
+        for fecha in fechas_cierre:
+            while pendiente and pendiente[0] <= fecha:
+                acumulado += pendiente[1]
+                con_historial = True
+                pendiente = next(meses, None)
+            # Antes de su primer movimiento el producto no necesita cierre (saldo 0)
+            if con_historial:
+                lote.append(CierreStock(producto_id=producto_id, fecha=fecha, saldo=acumulado))
+        if len(lote) >= LOTE_CIERRES:
+            volcar()
+
+    with transaction.atomic():
+        CierreStock.objects.all().delete()
+
+        actual, saldos = None, {}
+        for producto_id, mes, saldo in saldos_mes.iterator(chunk_size=LOTE_CIERRES):
+            if producto_id != actual:
+                if actual is not None:
+                    cerrar_producto(actual, saldos)
+                actual, saldos = producto_id, {}
+            saldos[_como_fecha(mes)] = saldo
+        if actual is not None:
+            cerrar_producto(actual, saldos)
+        if lote:
+            volcar()
+
+    return creados
+
+
+def stock_as_of(fecha, producto_ids=None):
+    """
+    Stock de cada producto al cierre del día `fecha`: {producto_id: stock}.
+
+    Parte del cierre más cercano (<= fecha) y suma solo la cola de movimientos
+    posteriores, en vez de recorrer todo el historial.
+    """
+    fecha = _como_fecha(fecha)
+    if producto_ids is not None:
+        producto_ids = list(producto_ids)
+
+    productos = Producto.objects.all()
+    cierres = CierreStock.objects.all()
+    movimientos = MovimientoInventario.objects.filter(fecha_movimiento__lt=inicio_dia(fecha + timedelta(days=1)))
+    if producto_ids is not None:
+        productos = productos.filter(id__in=producto_ids)
+        cierres = cierres.filter(producto_id__in=producto_ids)
+        movimientos = movimientos.filter(producto_id__in=producto_ids)
+
+    resultado = {pid: 0 for pid in productos.values_list("id", flat=True)}
+
+    ultimo_cierre = CierreStock.objects.filter(fecha__lte=fecha).aggregate(f=Max("fecha"))["f"]
+    if ultimo_cierre:
+        for producto_id, saldo in cierres.filter(fecha=ultimo_cierre).values_list("producto_id", "saldo"):
+            if producto_id in resultado:
+                resultado[producto_id] = saldo
+        movimientos = movimientos.filter(fecha_movimiento__gte=inicio_dia(ultimo_cierre + timedelta(days=1)))
+
+    cola = movimientos.values_list("producto_id").annotate(saldo=Sum(saldo_movimiento())).order_by()
+    for producto_id, saldo in cola:
+        if producto_id in resultado:
+            resultado[producto_id] += saldo
+
+    return resultado
+
+
+def actualizar_cierres(contribuciones):
+    """
+    Mantiene los cierres al día: un movimiento con fecha <= a un cierre existente
+    (alta, edición o borrado retroactivo) corrige el saldo de ese cierre y de los
+    siguientes. Los movimientos posteriores al último cierre no tocan nada.
+
+    construir_cierres solo cierra meses terminados, así que un movimiento del mes en
+    curso (el caso normal) sale sin consultar nada. Si alguno es retroactivo:
+    - los cierres existentes de los productos tocados desde su primer mes
+    - UN bulk_create (ignore_conflicts) con los cierres que faltaban, en 0
+    - UN UPDATE por lote de productos (~LOTE_UPDATE WHEN):
+      saldo + CASE WHEN producto_id = p AND fecha >= cierre THEN delta acumulado ... END
+
+    Los cierres de meses nuevos no se crean aquí: los arma construir_cierres_stock,
+    que debe correr programado al comenzar cada mes. Mientras tanto stock_as_of
+    sigue siendo exacto (parte del cierre anterior y suma una cola más larga).
+    """
+    deltas = defaultdict(int)
+    for c in contribuciones:
+        deltas[(c.producto_id, _como_fecha(c.fecha_movimiento))] += signo_movimiento(c.tipo_movimiento) * c.cantidad
+    deltas = {clave: d for clave, d in deltas.items() if d}
+    if not deltas:
+        return
+
+    primera = _fin_de_mes(min(dia for _, dia in deltas))
+    if primera >= _fin_de_mes(date.today()):
+        return
+
+    existentes = set(
+        CierreStock.objects
+        .filter(producto_id__in=sorted({producto_id for producto_id, _ in deltas}), fecha__gte=primera)
+        .values_list("producto_id", "fecha")
+    )
+    # Los cierres de un producto siguen sin huecos hasta el último (construir_cierres y los
+    # que se crean abajo): el más reciente de los tocados es el último cierre. Solo si
+    # ninguno tiene cierres hay que preguntarlo a la tabla.
+    ultima = max((fecha for _, fecha in existentes), default=None)
+    if ultima is None:
+        ultima = CierreStock.objects.aggregate(f=Max("fecha"))["f"]
+        if ultima is None or ultima < primera:
+            return
+
+    fechas = [primera]
+    while fechas[-1] < ultima:
+        fechas.append(_fin_de_mes(fechas[-1] + timedelta(days=1)))
+
+    # Delta acumulado de cada producto en cada fecha de cierre: {producto_id: {fecha: delta}}
+    por_producto = defaultdict(dict)
+    for producto_id, dias in agrupar_por_producto(deltas).items():
+        acumulado, pendientes = 0, iter(dias)
+        siguiente = next(pendientes, None)
+        for fecha in fechas:
+            while siguiente and siguiente[0] <= fecha:
+                acumulado += siguiente[1]
+                siguiente = next(pendientes, None)
+            por_producto[producto_id][fecha] = acumulado
+
+    # Escalones (desde fecha, delta) donde el acumulado cambia, del más reciente al más antiguo:
+    # el CASE toma el primer WHEN que cumple fecha >= desde
+    escalones = {}
+    for producto_id, por_fecha in por_producto.items():
+        pasos, anterior = [], 0
+        for fecha, delta in por_fecha.items():
+            if delta != anterior:
+                pasos.append((fecha, delta))
+                anterior = delta
+        if pasos:
+            escalones[producto_id] = pasos[::-1]
+
+    with transaction.atomic():
+        # Un producto sin cierre en una fecha tenía saldo 0: se crean en 0 desde su primer
+        # escalón hasta el último cierre y el UPDATE les suma el delta como a los demás
+        CierreStock.objects.bulk_create([
+            CierreStock(producto_id=producto_id, fecha=fecha, saldo=0)
+            for producto_id, pasos in escalones.items()
+            for fecha in fechas
+            if fecha >= pasos[-1][0] and (producto_id, fecha) not in existentes
+        ], batch_size=LOTE_CIERRES, ignore_conflicts=True)
+
+        for lote in lotes_de_escalones(escalones):
+            CierreStock.objects.filter(producto_id__in=lote, fecha__gte=fechas[0]).update(
+                saldo=F("saldo") + Case(
+                    *[
+                        When(producto_id=producto_id, fecha__gte=fecha, then=Value(delta))
+                        for producto_id in lote
+                        for fecha, delta in escalones[producto_id]
+                    ],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                )
+            )
+
+
+def agrupar_por_producto(deltas):
+    """ {(producto_id, dia): delta} -> {producto_id: [(dia, delta), ...]} ordenado por día. """
+    por_producto = defaultdict(list)
+    for (producto_id, dia), delta in sorted(deltas.items()):
+        por_producto[producto_id].append((dia, delta))
+    return por_producto
+
+
+def lotes_de_escalones(escalones):
+    """ Lotes de productos con a lo sumo ~LOTE_UPDATE WHEN en total (un producto no se parte). """
+    lote, whens = [], 0
+    for producto_id in sorted(escalones):
+        if lote and whens + len(escalones[producto_id]) > LOTE_UPDATE:
+            yield lote
+            lote, whens = [], 0
+        lote.append(producto_id)
+        whens += len(escalones[producto_id])
+    if lote:
+        yield lote
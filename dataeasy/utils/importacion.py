@@ -0,0 +1,490 @@
+import csv
+import io
+import multiprocessing
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, fields
+from itertools import islice
+
+import django
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Producto, Categoria, Marca, MovimientoInventario
+from .autocompletar import invalidar_catalogo
+from .busqueda import normalizar_texto, texto_busqueda, indexar_terminos
+from .cache import invalidar_inventario
+
+
+COLUMNAS_REQUERIDAS = ["nombre_producto", "categoria", "marca", "stock_actual"]
+
+STOCK_MINIMO_POR_DEFECTO = 5
+
+# Tamaño de cada IN (...) y de cada INSERT/UPDATE masivo
+LOTE = 2000
+
+# Filas del archivo que se leen y procesan por vez en la carga en streaming
+LOTE_LECTURA = 10_000
+
+EXTENSIONES = (".xlsx", ".xls", ".csv")
+
+# Columnas normalizadas que entran en la huella de cada fila. El stock no: se compara
+# aparte contra el actual, y un cambio de stock ya no obliga a reescribir la huella
+COLUMNAS_HUELLA = ["nombre_producto", "categoria", "marca", "stock_minimo", "descripcion"]
+
+
+class ErrorImportacion(Exception):
+    """ El archivo no se puede importar (p. ej. faltan columnas). El mensaje es para el usuario. """
+
+
+@dataclass
+class ResultadoImportacion:
+    filas: int = 0          # filas leídas del archivo (válidas o no)
+    procesados: int = 0     # productos distintos aplicados
+    nuevos: int = 0
+    actualizados: int = 0
+    sin_cambios: int = 0
+    movimientos: int = 0
+    descartados: int = 0
+
+    def sumar(self, otro):
+        for campo in fields(self):
+            setattr(self, campo.name, getattr(self, campo.name) + getattr(otro, campo.name))
+
+
+def normalizar_columna(texto):
+    """ 'Nombre Producto' -> 'nombre_producto', 'Categoría' -> 'categoria' """
+    s = str(texto).strip().lower()
+    s = unicodedata.normalize('NFKD', s).encode('ascii', 'ignore').decode('utf-8')
+    return s.replace(" ", "_")
+
+
+def _texto(serie):
+    """ Columna de texto limpia: sin espacios en los bordes y con None en vez de NaN/''. """
+    serie = serie.astype("string").str.strip()
+    serie = serie.mask(serie.str.lower().isin(["", "nan"]))
+    return serie.astype(object).where(serie.notna(), None)
+
+
+def limpiar_dataframe(df):
+    """
+    Normaliza y valida las columnas del Excel con operaciones vectorizadas (sin iterrows).
+
+    - descarta filas sin nombre o con stock no numérico
+    - stock_minimo por defecto 5, descripción por defecto ''
+    - si un producto se repite gana la última fila (como la carga fila a fila)
+
+    Devuelve (df_limpio, filas_descartadas).
+    """
+    df = df.rename(columns=normalizar_columna)
+
+    faltan = [c for c in COLUMNAS_REQUERIDAS if c not in df.columns]
+    if faltan:
+        raise ErrorImportacion(f"Faltan columnas: {', '.join(faltan)}")
+
+    total = len(df)
+    limpio = pd.DataFrame({
+        "nombre_producto": _texto(df["nombre_producto"]),
+        "categoria": _texto(df["categoria"]),
+        "marca": _texto(df["marca"]),
+        "stock_actual": pd.to_numeric(df["stock_actual"], errors="coerce"),
+        "stock_minimo": (
+            pd.to_numeric(df["stock_minimo"], errors="coerce").fillna(STOCK_MINIMO_POR_DEFECTO)
+            if "stock_minimo" in df.columns else STOCK_MINIMO_POR_DEFECTO
+        ),
+        "descripcion": _texto(df["descripcion"]).fillna("") if "descripcion" in df.columns else "",
+    })
+
+    limpio = limpio[limpio["nombre_producto"].notna() & limpio["stock_actual"].notna()]
+    limpio = limpio.astype({"stock_actual": "int64", "stock_minimo": "int64"})
+    descartados = total - len(limpio)
+
+    # Clave sin mayúsculas: en MySQL 'Coca' y 'coca' son el mismo producto
+    limpio["clave"] = limpio["nombre_producto"].str.casefold()
+    limpio = limpio.drop_duplicates("clave", keep="last").reset_index(drop=True)
+
+    return limpio, descartados
+
+
+def huellas_filas(df):
+    """
+    Huella (16 hex) de cada fila limpia, vectorizada con hash_pandas_object.
+    Si la fila de un producto trae la misma huella que la última vez que se importó
+    y el mismo stock que tiene ahora, no hay nada que escribir.
+    """
+    valores = pd.util.hash_pandas_object(df[COLUMNAS_HUELLA], index=False)
+    return valores.map("{:016x}".format)
+
+
+def preparar_lote(df, textos=False):
+    """
+    Todo el trabajo de CPU de un lote, sin tocar la BD: limpieza, huellas y, con textos=True,
+    también los textos de búsqueda plegados (sin tildes) de cada fila. Es lo que corre en los
+    procesos de la carga en paralelo; en un solo proceso los textos se calculan después y
+    solo para las filas que se escriben.
+
+    Devuelve (df_limpio, filas_descartadas).
+    """
+    limpio, descartados = limpiar_dataframe(df)
+    limpio["huella"] = huellas_filas(limpio)
+    if textos:
+        limpio["nombre_normalizado"] = limpio["nombre_producto"].map(normalizar_texto)
+        limpio["busqueda"] = [
+            texto_busqueda(nombre, categoria, marca)
+            for nombre, categoria, marca in zip(limpio["nombre_producto"], limpio["categoria"], limpio["marca"])
+        ]
+    return limpio, descartados
+
+
+def _en_lotes(valores, tam=LOTE):
+    valores = list(valores)
+    for i in range(0, len(valores), tam):
+        yield valores[i:i + tam]
+
+
+def _ids_por_nombre(modelo, campo, nombres, extra=()):
+    """
+    {nombre: (id, *extra)} para los `nombres` que existen, con consultas IN por lotes.
+    Si un nombre no aparece tal cual se busca sin distinguir mayúsculas (collation de MySQL).
+    """
+    encontrados = {}
+    for lote in _en_lotes(nombres):
+        for fila in modelo.objects.filter(**{f"{campo}__in": lote}).values_list(campo, "id", *extra):
+            encontrados[fila[0]] = fila[1:]
+
+    por_clave = {nombre.casefold(): valor for nombre, valor in encontrados.items()}
+    return {
+        nombre: encontrados.get(nombre) or por_clave.get(nombre.casefold())
+        for nombre in nombres
+        if nombre in encontrados or nombre.casefold() in por_clave
+    }
+
+
+def _columna_ids(serie):
+    """ Serie de ids (float con NaN tras un map) -> objetos int/None para los modelos. """
+    return serie.astype("Int64").astype(object).where(serie.notna(), None)
+
+
+def _resolver_catalogo(modelo, campo, nombres):
+    """ {nombre: id} creando en bloque los que falten (categorías o marcas). """
+    nombres = sorted(set(nombres))
+    ids = {n: v[0] for n, v in _ids_por_nombre(modelo, campo, nombres).items()}
+
+    faltan = [n for n in nombres if n not in ids]
+    if faltan:
+        modelo.objects.bulk_create([modelo(**{campo: n}) for n in faltan], batch_size=LOTE, ignore_conflicts=True)
+        # MySQL no devuelve los ids del bulk_create: se vuelven a leer
+        ids.update({n: v[0] for n, v in _ids_por_nombre(modelo, campo, faltan).items()})
+    return ids
+
+
+def _distinto(a, b):
+    """ a != b fila a fila, considerando iguales dos vacíos (None/NaN). """
+    return ~((a == b) | (a.isna() & b.isna()))
+
+
+def _productos_existentes(nombres):
+    """ DataFrame con id, stock, huella y campos editables actuales de los productos del archivo. """
+    existentes = _ids_por_nombre(
+        Producto, "nombre_producto", nombres,
+        extra=("stock_actual", "huella_importacion", "descripcion", "categoria_id", "marca_id", "stock_minimo"),
+    )
+    return pd.DataFrame(
+        [(nombre, *valores) for nombre, valores in existentes.items()],
+        columns=["nombre_producto", "id", "stock_anterior", "huella_anterior", "descripcion_anterior",
+                 "categoria_anterior", "marca_anterior", "minimo_anterior"],
+    )
+
+
+def importar_dataframe(df):
+    """
+    Aplica el catálogo del Excel en UNA transacción (todo o nada) y con un número de
+    consultas que depende de los lotes, no de las filas:
+
+    1. productos existentes: IN (id, stock, huella y campos actuales)
+    2. se descartan las filas intactas: misma huella que en la última carga y mismo stock
+    3. categorías y marcas de las filas restantes: IN + bulk_create de las nuevas
+    4. bulk_create de los nuevos (stock 0) y bulk_update solo de los que cambiaron
+    5. un movimiento por la diferencia de stock de cada producto, con bulk_record
+
+    Resincronizar el catálogo completo cuesta en escrituras lo que cambió, no lo que mide.
+    df debe venir de limpiar_dataframe().
+    """
+    resultado = ResultadoImportacion(procesados=len(df))
+    if df.empty:
+        return resultado
+
+    if "huella" not in df.columns:
+        df = df.assign(huella=huellas_filas(df))
+
+    with transaction.atomic():
+        df = df.merge(
+            _productos_existentes(df["nombre_producto"]), on="nombre_producto", how="left"
+        )
+        df["id"] = _columna_ids(df["id"])
+        df["stock_anterior"] = df["stock_anterior"].fillna(0).astype("int64")
+
+        intacto = (df["huella"] == df["huella_anterior"]) & (df["stock_actual"] == df["stock_anterior"])
+        resultado.sin_cambios = int(intacto.sum())
+        df = df[~intacto]
+        if df.empty:
+            return resultado
+
+        categorias = _resolver_catalogo(Categoria, "nombre_categoria", df["categoria"].dropna())
+        marcas = _resolver_catalogo(Marca, "nombre_marca", df["marca"].dropna())
+        df = df.assign(
+            categoria_id=_columna_ids(df["categoria"].map(categorias)),
+            marca_id=_columna_ids(df["marca"].map(marcas)),
+        )
+
+        es_nuevo = df["id"].isna()
+        cambiado = ~es_nuevo & (
+            _distinto(df["descripcion"].fillna(""), df["descripcion_anterior"].fillna(""))
+            | _distinto(df["categoria_id"], df["categoria_anterior"])
+            | _distinto(df["marca_id"], df["marca_anterior"])
+            | _distinto(df["stock_minimo"], df["minimo_anterior"])
+        )
+        # Mismos datos con otra huella (primera carga tras editar a mano o tras migrar):
+        # solo se guarda la huella, sin tocar fecha_actualizacion
+        solo_huella = ~es_nuevo & ~cambiado & (df["huella"] != df["huella_anterior"])
+        ahora = timezone.now()
+
+        def producto_de(fila):
+            return Producto(
+                id=fila.id,
+                nombre_producto=fila.nombre_producto,
+                descripcion=fila.descripcion,
+                categoria_id=fila.categoria_id,
+                marca_id=fila.marca_id,
+                stock_minimo=fila.stock_minimo,
+                # stock_actual no se escribe aquí: lo ajusta el movimiento de diferencia
+                # Calculados de antemano si el lote se preparó en paralelo
+                nombre_normalizado=getattr(fila, "nombre_normalizado", None) or normalizar_texto(fila.nombre_producto),
+                busqueda=getattr(fila, "busqueda", None) or texto_busqueda(fila.nombre_producto, fila.categoria, fila.marca),
+                huella_importacion=fila.huella,
+                fecha_actualizacion=ahora,
+            )
+
+        nuevos, actualizar = df[es_nuevo], df[cambiado]
+
+        if not nuevos.empty:
+            productos = [producto_de(f) for f in nuevos.itertuples(index=False)]
+            Producto.objects.bulk_create(productos, batch_size=LOTE)
+            # MySQL no devuelve los ids del bulk_create: se vuelven a leer
+            creados = _ids_por_nombre(Producto, "nombre_producto", nuevos["nombre_producto"])
+            df.loc[es_nuevo, "id"] = nuevos["nombre_producto"].map(lambda n: creados[n][0])
+            indexar_terminos((creados[p.nombre_producto][0], p.busqueda) for p in productos)
+
+        if not actualizar.empty:
+            productos = [producto_de(f) for f in actualizar.itertuples(index=False)]
+            Producto.objects.bulk_update(
+                productos,
+                ["descripcion", "categoria", "marca", "stock_minimo",
+                 "nombre_normalizado", "busqueda", "huella_importacion", "fecha_actualizacion"],
+                batch_size=LOTE,
+            )
+            indexar_terminos((p.id, p.busqueda) for p in productos)
+
+        if solo_huella.any():
+            Producto.objects.bulk_update(
+                [Producto(id=f.id, huella_importacion=f.huella) for f in df[solo_huella].itertuples(index=False)],
+                ["huella_importacion"],
+                batch_size=LOTE,
+            )
+
+        # Diferencias de stock (vectorizado) -> un movimiento por producto que cambió
+        df["diferencia"] = df["stock_actual"] - df["stock_anterior"]
+        cambios = df[df["diferencia"] != 0]
+        MovimientoInventario.objects.bulk_record([
+            MovimientoInventario(
+                producto_id=int(f.id),
+                tipo_movimiento="entrada" if f.diferencia > 0 else "salida",
+                cantidad=abs(int(f.diferencia)),
+                fecha_movimiento=ahora,
+            )
+            for f in cambios.itertuples(index=False)
+        ], batch_size=LOTE)
+
+        # bulk_create/bulk_update no disparan signals: se invalidan a mano las cachés del catálogo
+        transaction.on_commit(invalidar_inventario)
+        transaction.on_commit(invalidar_catalogo)
+
+    # Actualizado = producto existente con algún dato o su stock distinto al del archivo
+    resultado.nuevos = len(nuevos)
+    resultado.actualizados = len(df) - len(nuevos) - int((solo_huella & (df["diferencia"] == 0)).sum())
+    resultado.sin_cambios += len(df) - resultado.nuevos - resultado.actualizados
+    resultado.movimientos = len(cambios)
+    return resultado
+
+
+def _lotes_xlsx(archivo, tam_lote):
+    """
+    Filas de la primera hoja en DataFrames de tam_lote, con openpyxl en modo read_only.
+    Las filas vacías se saltan, como las líneas en blanco del CSV (no cuentan como descartadas).
+    """
+    from openpyxl import load_workbook
+
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        filas = libro.worksheets[0].iter_rows(values_only=True)
+        encabezado = next(filas, None)
+        if encabezado is None:
+            return
+        filas = (fila for fila in filas if any(valor is not None for valor in fila))
+        columnas = [str(c) if c is not None else "" for c in encabezado]
+        while True:
+            lote = list(islice(filas, tam_lote))
+            if not lote:
+                break
+            yield pd.DataFrame(lote, columns=columnas)
+    finally:
+        libro.close()
+
+
+def _lotes_csv(archivo, tam_lote):
+    """
+    CSV en trozos de tam_lote filas; detecta ';' o ',' y el BOM de Excel. Las filas
+    vacías (líneas en blanco o solo separadores) se saltan, como en _lotes_xlsx.
+    """
+    texto = io.TextIOWrapper(archivo, encoding="utf-8-sig", newline="")
+    muestra = texto.read(4096)
+    texto.seek(0)
+    try:
+        separador = csv.Sniffer().sniff(muestra, delimiters=",;\t").delimiter
+    except csv.Error:
+        separador = ","
+
+    try:
+        # dtype=str: cada trozo se interpreta igual, la conversión la hace limpiar_dataframe
+        for lote in pd.read_csv(texto, sep=separador, dtype=str, chunksize=tam_lote):
+            yield lote.dropna(how="all")
+    finally:
+        texto.detach()
+
+
+def leer_por_lotes(archivo, nombre_archivo, tam_lote=LOTE_LECTURA):
+    """
+    Lee el archivo subido en DataFrames de como máximo `tam_lote` filas, sin cargarlo entero:
+    .xlsx con openpyxl read_only y .csv con read_csv(chunksize). Los .xls (formato antiguo)
+    no se pueden leer en streaming y se cargan completos.
+    """
+    nombre = nombre_archivo.lower()
+    if nombre.endswith(".csv"):
+        return _lotes_csv(archivo, tam_lote)
+    if nombre.endswith(".xlsx"):
+        return _lotes_xlsx(archivo, tam_lote)
+    if nombre.endswith(".xls"):
+        return iter([pd.read_excel(archivo)])
+    raise ErrorImportacion(f"Formato no soportado. Usa {', '.join(EXTENSIONES)}.")
+
+
+def contar_filas(archivo, nombre_archivo):
+    """
+    Total aproximado de filas de datos, sin parsear el archivo (para el ETA de los trabajos):
+    saltos de línea del CSV, o la dimensión declarada de la hoja XLSX. None si no se sabe.
+    """
+    nombre = nombre_archivo.lower()
+    if nombre.endswith(".csv"):
+        lineas = sum(bloque.count(b"\n") for bloque in iter(lambda: archivo.read(1 << 20), b""))
+        archivo.seek(0)
+        return max(lineas - 1, 0)
+    if nombre.endswith(".xlsx"):
+        from openpyxl import load_workbook
+
+        libro = load_workbook(archivo, read_only=True)
+        try:
+            filas = libro.worksheets[0].max_row
+        finally:
+            libro.close()
+            archivo.seek(0)
+        return max(filas - 1, 0) if filas else None
+    return None
+
+
+def procesos_importacion():
+    """ Procesos que preparan los lotes en paralelo (DATAEASY_IMPORTACION_PROCESOS, 1 = sin pool). """
+    return max(1, getattr(settings, "DATAEASY_IMPORTACION_PROCESOS", 1))
+
+
+def particionar(df, partes):
+    """
+    Divide un lote crudo en `partes` por hash del nombre normalizado: todas las filas de un
+    mismo producto caen en la misma partición, así cada una se deduplica por su cuenta
+    (gana la última fila) y ninguna pisa los productos de otra.
+    """
+    df = df.rename(columns=normalizar_columna)
+    if "nombre_producto" not in df.columns:
+        return [df]  # limpiar_dataframe informará las columnas que faltan
+
+    clave = df["nombre_producto"].astype("string").str.strip().str.casefold().fillna("")
+    particion = pd.util.hash_array(clave.to_numpy(dtype=object)) % partes
+    return [df[particion == i] for i in range(partes) if (particion == i).any()] or [df]
+
+
+def _unir_particiones(filas, futuros):
+    preparados = [f.result() for f in futuros]
+    limpio = pd.concat([df for df, _ in preparados], ignore_index=True)
+    return filas, limpio, sum(descartados for _, descartados in preparados)
+
+
+def preparar_en_paralelo(lotes, procesos):
+    """
+    (filas_leídas, df_limpio, descartados) por cada lote, en el orden del archivo. Cada lote
+    se parte con particionar() y las particiones se preparan en un ProcessPoolExecutor; el lote
+    siguiente se prepara mientras el proceso principal escribe el anterior.
+
+    Los procesos se crean con 'spawn' (no heredan las conexiones a la BD ni los hilos del
+    servidor) y solo hacen pandas y texto: la escritura sigue siendo una sola, en orden.
+    """
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(procesos, mp_context=contexto, initializer=django.setup) as pool:
+        anterior = None
+        for lote in lotes:
+            futuros = [pool.submit(preparar_lote, parte, True) for parte in particionar(lote, procesos)]
+            if anterior:
+                yield _unir_particiones(*anterior)
+            anterior = (len(lote), futuros)
+        if anterior:
+            yield _unir_particiones(*anterior)
+
+
+def _lotes_preparados(archivo, nombre_archivo, tam_lote, procesos):
+    if procesos <= 1:
+        for lote in leer_por_lotes(archivo, nombre_archivo, tam_lote):
+            yield (len(lote), *preparar_lote(lote))
+        return
+    # Cada proceso recibe una partición de ~tam_lote filas
+    yield from preparar_en_paralelo(leer_por_lotes(archivo, nombre_archivo, tam_lote * procesos), procesos)
+
+
+def importar_archivo(archivo, nombre_archivo, tam_lote=LOTE_LECTURA, al_avanzar=None, atomico=True, procesos=None):
+    """
+    Carga en streaming: cada lote pasa por limpiar_dataframe + importar_dataframe, así la
+    memoria depende de tam_lote y no del tamaño del archivo.
+
+    procesos > 1 (por defecto DATAEASY_IMPORTACION_PROCESOS): la limpieza, las huellas y los
+    textos de búsqueda de cada lote se reparten en un pool de procesos (ver preparar_en_paralelo).
+
+    atomico=True:  todo el archivo en una transacción; si un lote falla no queda nada a medias.
+    atomico=False: cada lote se confirma por separado (trabajos en segundo plano: el avance
+                   se ve desde otras conexiones). Repetir la carga es seguro: el stock se lleva
+                   al valor del archivo y las filas sin cambios no se reescriben.
+
+    al_avanzar(resultado) se llama tras cada lote con el acumulado.
+    """
+    if procesos is None:
+        procesos = procesos_importacion()
+
+    resultado = ResultadoImportacion()
+    with transaction.atomic() if atomico else nullcontext():
+        for filas, df, descartados in _lotes_preparados(archivo, nombre_archivo, tam_lote, procesos):
+            parcial = importar_dataframe(df)
+            parcial.filas = filas
+            parcial.descartados = descartados
+            resultado.sumar(parcial)
+            if al_avanzar:
+                al_avanzar(resultado)
+    return resultado
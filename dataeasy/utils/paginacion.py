@@ -0,0 +1,117 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+def codificar_cursor(valores):
+    """ Cursor opaco para la URL a partir de los valores de orden de una fila. """
+    return base64.urlsafe_b64encode(json.dumps(valores).encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(texto):
+    """ Valores de orden del cursor, o None si viene vacío o alterado. """
+    if not texto:
+        return None
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(texto + "=" * (-len(texto) % 4)))
+    except ValueError:
+        return None
+    return valores if isinstance(valores, list) else None
+
+
+def _valores(fila, campos):
+    if isinstance(fila, dict):
+        return [fila[c] for c in campos]
+    return [getattr(fila, c) for c in campos]
+
+
+def _valores_cursor(qs, campos, texto):
+    """
+    Valores del cursor convertidos y validados con el campo de cada columna de orden (o el
+    output_field si es una anotación, p. ej. relevancia). Un cursor alterado a mano (otro
+    largo, tipos inesperados, números fuera de rango) da None y se muestra la primera página
+    en vez de fallar la consulta.
+    """
+    valores = decodificar_cursor(texto)
+    if not valores or len(valores) != len(campos):
+        return None
+
+    limpios = []
+    for campo, valor in zip(campos, valores):
+        if valor is None or isinstance(valor, (list, dict)):
+            return None
+        anotacion = qs.query.annotations.get(campo)
+        modelo_campo = anotacion.output_field if anotacion is not None else qs.model._meta.get_field(campo)
+        try:
+            limpios.append(modelo_campo.clean(valor, None))
+        except ValidationError:
+            return None
+    return limpios
+
+
+def _despues_de(campos, valores, operador):
+    """
+    (c1 > v1) OR (c1 = v1 AND c2 > v2) OR ... : condición de "fila siguiente" que
+    la BD resuelve recorriendo el índice desde el cursor, sin OFFSET.
+    """
+    condicion = Q()
+    for i, campo in enumerate(campos):
+        iguales = {c: v for c, v in zip(campos[:i], valores[:i])}
+        condicion |= Q(**iguales, **{f"{campo}__{operador}": valores[i]})
+    return condicion
+
+
+class PaginaKeyset:
+    """ Una página de resultados con los cursores para la siguiente y la anterior. """
+
+    def __init__(self, items, siguiente=None, anterior=None):
+        self.items = items
+        self.siguiente = siguiente
+        self.anterior = anterior
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def paginar_keyset(qs, campos, despues=None, antes=None, por_pagina=20):
+    """
+    Paginación por cursor (seek) sobre `campos` (todos ascendentes y el último único, p. ej. id).
+    El costo de cada página no depende de qué tan profunda sea, a diferencia de OFFSET.
+
+    despues: cursor de la última fila de la página anterior -> página siguiente
+    antes:   cursor de la primera fila de la página actual  -> página anterior
+
+    Un cursor inválido se ignora (primera página), ver _valores_cursor.
+    """
+    valores_antes = _valores_cursor(qs, campos, antes)
+    valores_despues = _valores_cursor(qs, campos, despues)
+
+    if valores_antes:
+        filas = list(
+            qs.filter(_despues_de(campos, valores_antes, "lt"))
+            .order_by(*[f"-{c}" for c in campos])[:por_pagina + 1]
+        )
+        hay_mas = len(filas) > por_pagina
+        filas = filas[:por_pagina][::-1]
+        return PaginaKeyset(
+            filas,
+            siguiente=codificar_cursor(_valores(filas[-1], campos)) if filas else None,
+            anterior=codificar_cursor(_valores(filas[0], campos)) if hay_mas else None,
+        )
+
+    if valores_despues:
+        qs = qs.filter(_despues_de(campos, valores_despues, "gt"))
+
+    filas = list(qs.order_by(*campos)[:por_pagina + 1])
+    hay_mas = len(filas) > por_pagina
+    filas = filas[:por_pagina]
+    return PaginaKeyset(
+        filas,
+        siguiente=codificar_cursor(_valores(filas[-1], campos)) if hay_mas else None,
+        anterior=codificar_cursor(_valores(filas[0], campos)) if valores_despues and filas else None,
+    )
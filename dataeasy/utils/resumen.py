@@ -0,0 +1,178 @@
+from collections import defaultdict
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, When, Value, F, Q, Sum, IntegerField
+from django.db.models.functions import TruncDate
+
+from ..models import MovimientoInventario, MovimientoDiario
+from .stock import LOTE_UPDATE, LOTE_IN, agrupar_por_valor
+
+
+# rango -> (función que lleva un día al inicio de su periodo, formato de la etiqueta)
+# Mismas etiquetas que producían TruncDay / TruncWeek / TruncMonth en chart_data_api
+PERIODOS = {
+    "dia": (lambda d: d, "%d/%m"),
+    "semana": (lambda d: d - timedelta(days=d.weekday()), "%W-%Y"),
+    "mes": (lambda d: d.replace(day=1), "%Y-%m"),
+}
+
+
+def agrupar_por_periodo(totales_por_dia, rango):
+    """
+    Re-agrupa [(dia, entradas, salidas), ...] ordenado por día en semanas o meses.
+    Devuelve el JSON de los gráficos: {"labels", "entradas", "salidas"}.
+    """
+    inicio_periodo, fmt = PERIODOS.get(rango, PERIODOS["mes"])
+
+    data_map = {}
+    for dia, entradas, salidas in totales_por_dia:
+        label = inicio_periodo(dia).strftime(fmt)
+        if label not in data_map:
+            data_map[label] = {'entradas': 0, 'salidas': 0}
+        data_map[label]['entradas'] += entradas
+        data_map[label]['salidas'] += salidas
+
+    labels = list(data_map.keys())
+    return {
+        "labels": labels,
+        "entradas": [data_map[k]['entradas'] for k in labels],
+        "salidas": [data_map[k]['salidas'] for k in labels],
+    }
+
+
+def _con_movimiento(qs):
+    # Tras borrar movimientos un día puede quedar en 0/0: no debe aparecer en los gráficos
+    return qs.filter(Q(entradas__gt=0) | Q(salidas__gt=0))
+
+
+def serie_movimientos(fecha_inicio, fecha_fin, rango="mes"):
+    """ Entradas vs salidas de todo el inventario por día/semana/mes (lee el resumen diario). """
+    filas = (
+        _con_movimiento(MovimientoDiario.objects.filter(dia__range=[fecha_inicio, fecha_fin]))
+        .values("dia")
+        .annotate(total_entradas=Sum("entradas"), total_salidas=Sum("salidas"))
+        .order_by("dia")
+        .values_list("dia", "total_entradas", "total_salidas")
+    )
+    return agrupar_por_periodo(filas, rango)
+
+
+def totales_por_producto(producto_ids, fecha_inicio, fecha_fin):
+    """ {producto_id: (entradas, salidas)} en el rango, leído del resumen diario. """
+    filas = (
+        _con_movimiento(MovimientoDiario.objects.filter(producto_id__in=producto_ids, dia__range=[fecha_inicio, fecha_fin]))
+        .values("producto_id")
+        .annotate(total_entradas=Sum("entradas"), total_salidas=Sum("salidas"))
+        .order_by()
+        .values_list("producto_id", "total_entradas", "total_salidas")
+    )
+    return {pid: (entradas, salidas) for pid, entradas, salidas in filas}
+
+
+def series_por_producto(producto_ids, fecha_inicio, fecha_fin, rango="mes"):
+    """
+    Serie de entradas/salidas de cada producto: {producto_id: {"labels", "entradas", "salidas"}}.
+    Una sola consulta al resumen diario para todos los productos.
+    """
+    filas = (
+        _con_movimiento(MovimientoDiario.objects.filter(producto_id__in=producto_ids, dia__range=[fecha_inicio, fecha_fin]))
+        .order_by("producto_id", "dia")
+        .values_list("producto_id", "dia", "entradas", "salidas")
+    )
+
+    por_producto = defaultdict(list)
+    for producto_id, dia, entradas, salidas in filas:
+        por_producto[producto_id].append((dia, entradas, salidas))
+
+    return {pid: agrupar_por_periodo(dias, rango) for pid, dias in por_producto.items()}
+
+
+def actualizar_resumen_diario(contribuciones):
+    """
+    Aplica las contribuciones al resumen diario con UPDATE ... = col + delta.
+
+    1. Crea (vacías) las filas (producto, día) que falten.
+    2. Suma los deltas de TODOS los días juntos, en lotes de LOTE_UPDATE pares
+       (producto, día): WHERE (dia = d AND producto_id IN (...)) OR ... y un CASE por par.
+       Si muchos pares de un mismo día comparten (entradas, salidas) (cargas masivas),
+       sale más barato un UPDATE ... WHERE dia = d AND producto_id IN (...) por valor.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    for c in contribuciones:
+        clave = (c.producto_id, c.fecha_movimiento.date())
+        deltas[clave][0 if c.tipo_movimiento == "entrada" else 1] += c.cantidad
+    deltas = {k: tuple(v) for k, v in deltas.items() if v != [0, 0]}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        MovimientoDiario.objects.bulk_create(
+            [MovimientoDiario(producto_id=pid, dia=dia) for pid, dia in deltas],
+            ignore_conflicts=True,
+        )
+
+        # El día va en el valor: solo se agrupan pares del mismo día con el mismo delta
+        grupos = agrupar_por_valor({clave: (clave[1], *valores) for clave, valores in deltas.items()})
+        if grupos:
+            for (dia, entradas, salidas), claves in grupos.items():
+                ids = [pid for pid, _ in claves]
+                for i in range(0, len(ids), LOTE_IN):
+                    MovimientoDiario.objects.filter(dia=dia, producto_id__in=ids[i:i + LOTE_IN]).update(
+                        entradas=F("entradas") + entradas,
+                        salidas=F("salidas") + salidas,
+                    )
+            return
+
+        # Ordenado por día: cada lote filtra con (dia = d AND producto_id IN (...)) OR ...
+        claves = sorted(deltas, key=lambda clave: (clave[1], clave[0]))
+        for i in range(0, len(claves), LOTE_UPDATE):
+            lote = claves[i:i + LOTE_UPDATE]
+            productos_por_dia = defaultdict(list)
+            for pid, dia in lote:
+                productos_por_dia[dia].append(pid)
+
+            def delta(posicion):
+                return Case(
+                    *[When(producto_id=pid, dia=dia, then=Value(deltas[pid, dia][posicion])) for pid, dia in lote],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                )
+
+            MovimientoDiario.objects.filter(
+                reduce(or_, (Q(dia=dia, producto_id__in=ids) for dia, ids in productos_por_dia.items()))
+            ).update(
+                entradas=F("entradas") + delta(0),
+                salidas=F("salidas") + delta(1),
+            )
+
+
+def reconstruir_resumen_diario(lote=5000):
+    """ Rehace todo el resumen diario desde el libro con un SUM agrupado por producto y día. """
+    filas = (
+        MovimientoInventario.objects
+        .annotate(dia=TruncDate("fecha_movimiento"))
+        .values_list("producto_id", "dia")
+        .annotate(
+            entradas=Sum(Case(When(tipo_movimiento="entrada", then=F("cantidad")), default=Value(0))),
+            salidas=Sum(Case(When(tipo_movimiento="salida", then=F("cantidad")), default=Value(0))),
+        )
+        .order_by()
+    )
+
+    creados = 0
+    with transaction.atomic():
+        MovimientoDiario.objects.all().delete()
+        pendientes = []
+        for producto_id, dia, entradas, salidas in filas.iterator(chunk_size=lote):
+            pendientes.append(MovimientoDiario(producto_id=producto_id, dia=dia, entradas=entradas, salidas=salidas))
+            if len(pendientes) >= lote:
+                MovimientoDiario.objects.bulk_create(pendientes)
+                creados += len(pendientes)
+                pendientes = []
+        MovimientoDiario.objects.bulk_create(pendientes)
+        creados += len(pendientes)
+
+    return creados
@@ -0,0 +1,158 @@
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+from django.db.models import Case, When, Value, F, Sum, Subquery, OuterRef, IntegerField
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+
+from ..models import Producto, MovimientoInventario
+
+
+# Una contribución es el efecto de UN movimiento sobre el libro de stock.
+# Al crear un movimiento se aplica con su cantidad; al borrarlo (o al editarlo,
+# para deshacer los valores anteriores) se aplica con la cantidad en negativo.
+Contribucion = namedtuple("Contribucion", ["producto_id", "tipo_movimiento", "cantidad", "fecha_movimiento"])
+
+# Se envía después de aplicar contribuciones al stock (movimiento suelto o carga masiva).
+# Los datos derivados del libro (cierres, resúmenes, cachés) se suscriben aquí.
+# kwargs: contribuciones (lista de Contribucion)
+movimientos_aplicados = Signal()
+
+# Tamaño máximo de cada CASE ... WHEN al actualizar varios productos a la vez
+LOTE_UPDATE = 500
+
+# Tamaño máximo de cada id IN (...) en los UPDATE agrupados por valor
+LOTE_IN = 2000
+
+
+def modo_incremental():
+    """ True si el stock se mantiene aplicando deltas en vez de recalcular el historial. """
+    return getattr(settings, "DATAEASY_MODO_STOCK", "incremental") != "recalculo"
+
+
+def signo_movimiento(tipo_movimiento):
+    """ +1 para entradas, -1 para salidas. """
+    return 1 if tipo_movimiento == "entrada" else -1
+
+
+def saldo_movimiento():
+    """
+    Expresión SQL del aporte de cada fila al stock: +cantidad (entrada) o -cantidad (salida).
+    Sirve para sumar el libro completo en un solo SUM(...) agrupado.
+    """
+    return Case(
+        When(tipo_movimiento="entrada", then=F("cantidad")),
+        default=-F("cantidad"),
+        output_field=IntegerField(),
+    )
+
+
+def contribucion_de(movimiento, cantidad=None):
+    """ Construye la contribución de una instancia de MovimientoInventario. """
+    return Contribucion(
+        producto_id=movimiento.producto_id,
+        tipo_movimiento=movimiento.tipo_movimiento,
+        cantidad=movimiento.cantidad if cantidad is None else cantidad,
+        fecha_movimiento=movimiento.fecha_movimiento,
+    )
+
+
+def deltas_por_producto(contribuciones):
+    """ Agrupa las contribuciones en {producto_id: delta_de_stock}. """
+    deltas = defaultdict(int)
+    for c in contribuciones:
+        deltas[c.producto_id] += signo_movimiento(c.tipo_movimiento) * c.cantidad
+    return dict(deltas)
+
+
+def agrupar_por_valor(valores):
+    """
+    {id: valor} -> {valor: [ids]} si conviene actualizar por grupos, o None si no.
+
+    Armar un CASE de cientos de WHEN cuesta más en Python que en la BD; cuando muchos
+    ids comparten el mismo valor (cargas masivas: +7 a todos, stock inicial 0..500)
+    sale más barato un UPDATE ... WHERE id IN (...) por valor distinto.
+    """
+    grupos = defaultdict(list)
+    for clave, valor in valores.items():
+        grupos[valor].append(clave)
+    if len(grupos) * 2 > len(valores):
+        return None
+    return {valor: sorted(ids) for valor, ids in grupos.items()}
+
+
+def aplicar_deltas_stock(deltas):
+    """
+    Suma cada delta a Producto.stock_actual con un UPDATE atómico (F()).
+
+    Un solo producto -> UPDATE ... SET stock_actual = stock_actual + d WHERE id = x
+    Varios productos -> UPDATE ... SET stock_actual = stock_actual + CASE id WHEN ... END
+    (en lotes de LOTE_UPDATE para no generar sentencias gigantes), o un
+    UPDATE ... + d WHERE id IN (...) por delta distinto si se repiten mucho.
+    """
+    deltas = {pid: d for pid, d in deltas.items() if d}
+    if not deltas:
+        return
+
+    if len(deltas) == 1:
+        (producto_id, delta), = deltas.items()
+        Producto.objects.filter(id=producto_id).update(stock_actual=F("stock_actual") + delta)
+        return
+
+    grupos = agrupar_por_valor(deltas)
+    if grupos:
+        for delta, ids in grupos.items():
+            for i in range(0, len(ids), LOTE_IN):
+                Producto.objects.filter(id__in=ids[i:i + LOTE_IN]).update(stock_actual=F("stock_actual") + delta)
+        return
+
+    ids = sorted(deltas)
+    for i in range(0, len(ids), LOTE_UPDATE):
+        lote = ids[i:i + LOTE_UPDATE]
+        Producto.objects.filter(id__in=lote).update(
+            stock_actual=F("stock_actual") + Case(
+                *[When(id=pid, then=Value(deltas[pid])) for pid in lote],
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        )
+
+
+def recalcular_stock(producto_ids=None):
+    """
+    Recalcula stock_actual = entradas - salidas desde el historial completo,
+    en un único UPDATE con subconsulta agrupada (sin recorrer productos en Python).
+    Si producto_ids es None se recalculan todos los productos.
+    """
+    totales = (
+        MovimientoInventario.objects
+        .filter(producto_id=OuterRef("pk"))
+        .values("producto_id")
+        .annotate(saldo=Sum(saldo_movimiento()))
+        .values("saldo")
+    )
+
+    productos = Producto.objects.all()
+    if producto_ids is not None:
+        productos = productos.filter(id__in=list(producto_ids))
+
+    return productos.update(stock_actual=Coalesce(Subquery(totales), Value(0)))
+
+
+def aplicar_contribuciones(contribuciones):
+    """
+    Punto único por el que pasan TODAS las escrituras del libro de movimientos.
+
+    - Modo incremental: cada producto recibe solo su delta (O(1) por movimiento).
+    - Modo recalculo:   se recalcula el historial de los productos tocados.
+    """
+    contribuciones = list(contribuciones)
+    if not contribuciones:
+        return
+
+    if modo_incremental():
+        aplicar_deltas_stock(deltas_por_producto(contribuciones))
+    else:
+        recalcular_stock({c.producto_id for c in contribuciones})
+
+    movimientos_aplicados.send(sender=MovimientoInventario, contribuciones=contribuciones)
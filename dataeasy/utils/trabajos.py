@@ -0,0 +1,191 @@
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+
+from ..models import TrabajoImportacion, Producto, MovimientoInventario
+from .importacion import importar_archivo, contar_filas, ErrorImportacion
+
+
+logger = logging.getLogger(__name__)
+
+_ejecutor = None
+_lock = threading.Lock()
+
+
+def modo_importacion():
+    """ 'hilo' (pool dentro del servidor web) o 'comando' (manage.py procesar_importaciones). """
+    return getattr(settings, "DATAEASY_IMPORTACION", "hilo")
+
+
+def _pool():
+    global _ejecutor
+    with _lock:
+        if _ejecutor is None:
+            _ejecutor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "DATAEASY_IMPORTACION_WORKERS", 1),
+                thread_name_prefix="importacion",
+            )
+        return _ejecutor
+
+
+def encolar_importacion(trabajo):
+    """
+    Deja el trabajo listo para procesarse. En modo 'hilo' se envía al pool al confirmar la
+    transacción que lo creó; en modo 'comando' lo tomará el worker externo.
+
+    El pool vive en memoria: si el servidor se reinicia, los trabajos que tenía en cola
+    quedan PENDIENTE y el que procesaba queda PROCESANDO, y nada los vuelve a tomar por sí
+    solo. En modo 'hilo' hay que correr `manage.py procesar_importaciones` tras cada
+    reinicio o despliegue (o desde cron) para terminarlos.
+    """
+    if modo_importacion() == "hilo":
+        transaction.on_commit(lambda: _pool().submit(_procesar_en_hilo, trabajo.pk))
+
+
+def _procesar_en_hilo(trabajo_id):
+    try:
+        procesar_trabajo(trabajo_id)
+    finally:
+        # Cada hilo tiene su propia conexión: se cierra al terminar para no dejarla colgada
+        connection.close()
+
+
+def _guardar_avance(trabajo_id, resultado):
+    TrabajoImportacion.objects.filter(pk=trabajo_id).update(
+        filas_procesadas=resultado.filas,
+        filas_fallidas=resultado.descartados,
+        nuevos=resultado.nuevos,
+        actualizados=resultado.actualizados,
+        sin_cambios=resultado.sin_cambios,
+        movimientos=resultado.movimientos,
+        ultimo_avance=timezone.now(),
+    )
+
+
+def hash_archivo(archivo):
+    """ SHA-256 del contenido subido, leído por bloques (deja el archivo al principio). """
+    sha = hashlib.sha256()
+    for bloque in iter(lambda: archivo.read(1 << 20), b""):
+        sha.update(bloque)
+    archivo.seek(0)
+    return sha.hexdigest()
+
+
+def estado_inventario():
+    """
+    Resumen barato del estado del inventario: cuántos productos hay, cuántos perdieron la
+    huella de importación (ediciones a mano, categorías/marcas renombradas), su stock total,
+    la última edición y el último movimiento. Si coincide con el de una carga anterior,
+    nada cambió desde entonces.
+    """
+    productos = Producto.objects.aggregate(
+        n=Count("id"),
+        sin_huella=Count("id", filter=Q(huella_importacion="")),
+        stock=Sum("stock_actual"),
+        editado=Max("fecha_actualizacion"),
+    )
+    ultimo = MovimientoInventario.objects.aggregate(id=Max("id"))["id"]
+    return f"{productos['n']}:{productos['sin_huella']}:{productos['stock']}:{productos['editado']}:{ultimo}"
+
+
+def _importacion_repetida(trabajo):
+    """
+    Carga completada antes con el mismo archivo y tras la cual el inventario no cambió,
+    o None. En ese caso repetirla no escribiría nada y se evita leer el archivo.
+    """
+    anterior = (
+        TrabajoImportacion.objects
+        .filter(estado=TrabajoImportacion.COMPLETADO, hash_archivo=trabajo.hash_archivo)
+        .exclude(pk=trabajo.pk)
+        .order_by("-terminado")
+        .first()
+    )
+    if anterior and anterior.estado_inventario == estado_inventario():
+        return anterior
+    return None
+
+
+def retomar_interrumpidos(minutos):
+    """
+    Devuelve a PENDIENTE los trabajos en PROCESANDO sin avance en los últimos `minutos`:
+    el worker murió a mitad (reinicio, despliegue, falta de memoria). Reprocesar el archivo
+    desde el principio es seguro: los lotes ya confirmados tienen la misma huella y stock,
+    y la carga los salta como intactos. Devuelve cuántos se retomaron.
+
+    Solo mira el latido (ultimo_avance): se fija al reclamar el trabajo y tras cada lote.
+    Lo llama únicamente el comando procesar_importaciones (ver encolar_importacion).
+    """
+    limite = timezone.now() - timedelta(minutes=minutos)
+    return TrabajoImportacion.objects.filter(
+        estado=TrabajoImportacion.PROCESANDO, ultimo_avance__lt=limite,
+    ).update(estado=TrabajoImportacion.PENDIENTE, mensaje="Retomado tras quedar interrumpido.")
+
+
+def procesar_trabajo(trabajo_id):
+    """
+    Procesa un trabajo pendiente. Lo reclama con un UPDATE condicionado al estado, así dos
+    workers nunca procesan el mismo. Devuelve False si ya lo había tomado otro.
+    """
+    reclamado = TrabajoImportacion.objects.filter(
+        pk=trabajo_id, estado=TrabajoImportacion.PENDIENTE
+    ).update(estado=TrabajoImportacion.PROCESANDO, iniciado=timezone.now(), ultimo_avance=timezone.now())
+    if not reclamado:
+        return False
+
+    trabajo = TrabajoImportacion.objects.get(pk=trabajo_id)
+    estado, mensaje = TrabajoImportacion.COMPLETADO, ""
+    try:
+        with trabajo.archivo.open("rb") as archivo:
+            trabajo.hash_archivo = hash_archivo(archivo)
+            TrabajoImportacion.objects.filter(pk=trabajo_id).update(hash_archivo=trabajo.hash_archivo)
+
+            anterior = _importacion_repetida(trabajo)
+            if anterior:
+                TrabajoImportacion.objects.filter(pk=trabajo_id).update(
+                    total_filas=anterior.total_filas,
+                    filas_procesadas=anterior.filas_procesadas,
+                    filas_fallidas=anterior.filas_fallidas,
+                    sin_cambios=anterior.nuevos + anterior.actualizados + anterior.sin_cambios,
+                )
+                mensaje = (
+                    f"El archivo es idéntico al de la importación #{anterior.id} y el inventario "
+                    f"no cambió desde entonces: no hay nada que actualizar."
+                )
+            else:
+                TrabajoImportacion.objects.filter(pk=trabajo_id).update(
+                    total_filas=contar_filas(archivo, trabajo.nombre_archivo)
+                )
+                resultado = importar_archivo(
+                    archivo, trabajo.nombre_archivo,
+                    al_avanzar=lambda r: _guardar_avance(trabajo_id, r),
+                    atomico=False,
+                )
+                mensaje = (
+                    f"{resultado.procesados} productos procesados "
+                    f"({resultado.nuevos} nuevos, {resultado.actualizados} actualizados, "
+                    f"{resultado.sin_cambios} sin cambios). "
+                    f"Se generaron {resultado.movimientos} movimientos de ajuste."
+                )
+                if resultado.descartados:
+                    mensaje += f" {resultado.descartados} filas descartadas (sin nombre o con stock inválido)."
+    except ErrorImportacion as e:
+        estado, mensaje = TrabajoImportacion.ERROR, str(e)
+    except Exception as e:
+        logger.exception("Falló la importación #%s", trabajo_id)
+        estado, mensaje = TrabajoImportacion.ERROR, f"Error interno: {e}"
+    finally:
+        # El archivo ya no hace falta (los lotes aplicados quedan registrados en el trabajo)
+        trabajo.archivo.delete(save=False)
+
+    TrabajoImportacion.objects.filter(pk=trabajo_id).update(
+        estado=estado, mensaje=mensaje, terminado=timezone.now(), archivo="",
+        estado_inventario=estado_inventario() if estado == TrabajoImportacion.COMPLETADO else "",
+    )
+    return True
@@ -3,19 +3,20 @@ import json
 import csv
 from datetime import datetime, timedelta
 import pandas as pd
-import unicodedata
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout, update_session_auth_hash
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.core.serializers.json import DjangoJSONEncoder
-from django.core.paginator import Paginator
-from django.db.models import Sum, Count, F, Q
+from django.db.models import Sum, Count, F, Q, Window
+from django.db.models.functions import RowNumber
 from django.db.models.functions import TruncMonth
 from django.utils import timezone
 from django.contrib.auth.models import User
 from django.http import HttpResponse, JsonResponse
+from django.db import transaction
+from django.urls import reverse
 from xhtml2pdf import pisa
 from django.template.loader import render_to_string
 from django.db.models.functions import TruncMonth, TruncWeek, TruncDay
@@ -24,9 +25,24 @@ from django.http import JsonResponse
 
 from io import BytesIO
 
-from .models import Producto, Categoria, Marca, MovimientoInventario, Factura, DetalleFactura
+from .models import Producto, Categoria, Marca, MovimientoInventario, Factura, DetalleFactura, TrabajoImportacion, ALERTA_STOCK
 from .forms import UserCreateForm, UserUpdateForm
 from .utils.auth import validar_rut
+from .utils.historico import stock_as_of
+from .utils.fechas import rango_fechas, filtro_rango_fechas
+from .utils.analitica import serie_movimientos, totales_por_producto, series_por_producto
+from .utils.cache import cache_versionada
+from .utils.asincrono import en_paralelo
+from .utils.busqueda import buscar_productos, filtrar_busqueda
+from .utils.paginacion import paginar_keyset
+from .utils.autocompletar import indice_productos
+from .utils.importacion import EXTENSIONES
+from .utils.exportacion import (
+    COLUMNAS_PRODUCTOS, COLUMNAS_MOVIMIENTOS, formatos_disponibles, filas_productos, filas_movimientos,
+)
+from .utils.artefactos import respuesta_artefacto
+from .utils.trabajos import encolar_importacion
+from .utils.facturacion import registrar_salida, ErrorFactura
 
 
 # ============================================================
@@ -62,10 +78,7 @@ def acceso_denegado(request):
 @login_required(login_url="index")
 def home(request):
     context = _build_estadisticas_context(request)
-    total_alertas = (
-        context["productos_sin_stock"].count() +
-        context["productos_bajo_stock"].count()
-    )
+    total_alertas = context["total_sin_stock"] + context["total_bajo_stock"]
 
     context["total_alertas"] = total_alertas
 
@@ -89,76 +102,215 @@ def recuperacion(request):
 # ============================================================
 # INVENTARIO
 # ============================================================
-@login_required(login_url="index")
-def lista_inventario(request):
-    query = request.GET.get("q", "")
-    categorias_sel = [c for c in request.GET.getlist("f_categoria") if c.isdigit()]
-    marcas_sel = [m for m in request.GET.getlist("f_marca") if m.isdigit()]
-    solo_alertas = request.GET.get("solo_alertas") == "1"
-
-    productos = Producto.objects.select_related("categoria", "marca").all()
+def _filtros_inventario(request):
+    """ Filtros del inventario tomados del querystring (los usan la vista, su API y la exportación). """
+    return {
+        "q": request.GET.get("q", "").strip(),
+        "categorias": sorted(c for c in request.GET.getlist("f_categoria") if c.isdigit()),
+        "marcas": sorted(m for m in request.GET.getlist("f_marca") if m.isdigit()),
+        "solo_alertas": request.GET.get("solo_alertas") == "1",
+    }
 
-    if query:
-        productos = productos.filter(
-            Q(nombre_producto__icontains=query) |
-            Q(categoria__nombre_categoria__icontains=query) |
-            Q(marca__nombre_marca__icontains=query)
-        )
 
- # ============================================
+def _filtrar_productos(productos, filtros, excluir=None):
+    """
+    Aplica los filtros de faceta y de alertas. `excluir` ("categorias" o "marcas") omite
+    esa faceta: sus contadores deben respetar todo lo demás pero no su propia selección.
+    """
+    # ============================================
     # ⛏ FILTRO: MULTISELECT Categoría
     # ============================================
-    if categorias_sel:
-        productos = productos.filter(categoria_id__in=categorias_sel)
+    if filtros["categorias"] and excluir != "categorias":
+        productos = productos.filter(categoria_id__in=filtros["categorias"])
 
     # ============================================
     # 🔧 FILTRO: MULTISELECT Marca
     # ============================================
-    if marcas_sel:
-        productos = productos.filter(marca_id__in=marcas_sel)
+    if filtros["marcas"] and excluir != "marcas":
+        productos = productos.filter(marca_id__in=filtros["marcas"])
 
     # ============================================
     # ⚠ FILTRO: Solo alertas (stock bajo + 0)
     # ============================================
-    if solo_alertas:
-        productos = productos.filter(
-            Q(stock_actual=0) |
-            Q(stock_actual__gt=0, stock_actual__lte=F("stock_minimo"))
+    if filtros["solo_alertas"]:
+        productos = productos.en_alerta()
+
+    return productos
+
+
+def _productos_filtrados(filtros):
+    """ Queryset de productos con los filtros aplicados y los campos de orden para paginar. """
+    productos = Producto.objects.select_related("categoria", "marca").all()
+
+    if filtros["q"]:
+        # Columna de búsqueda plegada (nombre + categoría + marca), ordenada por relevancia
+        productos = buscar_productos(productos, filtros["q"])
+        orden = ("relevancia", "nombre_producto", "id")
+    else:
+        orden = ("nombre_producto", "id")
+
+    return _filtrar_productos(productos, filtros).order_by(*orden), orden
+
+
+def _facetas_inventario(filtros):
+    """
+    Contadores por categoría y por marca ({id: (productos, en_alerta)}) para los filtros.
+
+    Cada faceta es UN solo GROUP BY sobre los productos que cumplen la búsqueda y la
+    selección de la otra faceta. Se cachea por firma de filtros y versión de inventario.
+    """
+    def calcular():
+        base = Producto.objects.all()
+        if filtros["q"]:
+            base = filtrar_busqueda(base, filtros["q"])
+
+        facetas = {}
+        for faceta, campo in (("categorias", "categoria_id"), ("marcas", "marca_id")):
+            filas = (
+                _filtrar_productos(base, filtros, excluir=faceta)
+                .order_by()
+                .values(campo)
+                .annotate(total=Count("id"), alertas=Count("id", filter=ALERTA_STOCK))
+                .values_list(campo, "total", "alertas")
+            )
+            facetas[faceta] = {valor: (total, alertas) for valor, total, alertas in filas}
+        return facetas
+
+    return cache_versionada("facetas_inventario", calcular, filtros)
+
+
+def _con_conteos(opciones, conteos):
+    """ Anota en cada categoría/marca cuántos productos (y alertas) tendría al elegirla. """
+    for opcion in opciones:
+        opcion.total_faceta, opcion.alertas_faceta = conteos.get(opcion.id, (0, 0))
+    return opciones
+
+
+def _resumen_alertas_inventario():
+    """
+    Contadores y listas del modal de alertas. Los totales salen de un COUNT; las listas
+    solo guardan los MAX_ALERTAS_DASHBOARD más críticos (mayor déficit), el resto se ve
+    con ?solo_alertas=1. Se cachean por versión de inventario: cualquier escritura de
+    productos o movimientos los invalida.
+    """
+    def calcular():
+        conteos = Producto.objects.en_alerta().aggregate(
+            sin_stock=Count("id", filter=Q(stock_actual__lte=0)),
+            bajo_stock=Count("id", filter=Q(stock_actual__gt=0)),
         )
+        campos = ("id", "nombre_producto", "stock_actual", "stock_minimo", "categoria__nombre_categoria")
+        return {
+            "total_productos": Producto.objects.count(),
+            "total_alertas": conteos["sin_stock"] + conteos["bajo_stock"],
+            "sin_stock_items": list(
+                Producto.objects.sin_stock().order_by("-deficit", "id").values(*campos)[:MAX_ALERTAS_DASHBOARD]
+            ),
+            "bajo_stock_items": list(
+                Producto.objects.stock_bajo().order_by("-deficit", "id").values(*campos)[:MAX_ALERTAS_DASHBOARD]
+            ),
+        }
+
+    return cache_versionada("alertas_inventario", calcular)
+
+
+def _pagina_inventario(request, filtros, por_pagina=20):
+    """
+    Página de productos por cursor (?despues= / ?antes=) y el total filtrado cacheado.
+    Ya no hay COUNT ni OFFSET por cada página: el total sale de la caché versionada.
+    """
+    productos, orden = _productos_filtrados(filtros)
+    pagina = paginar_keyset(
+        productos, orden,
+        despues=request.GET.get("despues"),
+        antes=request.GET.get("antes"),
+        por_pagina=por_pagina,
+    )
+    total = cache_versionada("conteo_inventario", productos.count, filtros)
+    return pagina, total
 
-    # ============================================
-    # ⚠ Queryset para el modal de alertas global
-    # ============================================
-    alertas_qs = Producto.objects.filter(
-        Q(stock_actual=0) | Q(stock_actual__gt=0, stock_actual__lte=F("stock_minimo"))
+
+@login_required(login_url="index")
+def lista_inventario(request):
+    filtros = _filtros_inventario(request)
+    page_obj, total_filtrado = _pagina_inventario(request, filtros)
+    facetas = _facetas_inventario(filtros)
+
+    # Alertas dentro de la búsqueda y selección actuales, sumando la faceta de categoría
+    alertas_filtro = sum(
+        alertas for categoria_id, (_, alertas) in facetas["categorias"].items()
+        if not filtros["categorias"] or str(categoria_id) in filtros["categorias"]
     )
-    # ============================================
-    # 📄 PAGINACIÓN
-    # ============================================
 
-    paginator = Paginator(productos.order_by("nombre_producto"), 20)
-    page_obj = paginator.get_page(request.GET.get("page"))
-    
+    # Querystring de los filtros, para que los enlaces de paginación no los pierdan
+    params = request.GET.copy()
+    for clave in ("despues", "antes", "page"):
+        params.pop(clave, None)
+
     # ============================================
     # CONTEXTO FINAL
     # ============================================
     context = {
         "page_obj": page_obj,
-        "categorias": Categoria.objects.all(),
-        "marcas": Marca.objects.all(),
-        "search_query": query,
-        "solo_alertas": solo_alertas,
-        "total_alertas": alertas_qs.count(),
-        "total_productos": Producto.objects.count(),
-        "sin_stock_items": alertas_qs.filter(stock_actual=0),
-        "bajo_stock_items": alertas_qs.filter(stock_actual__gt=0),
-        "categorias_sel": categorias_sel,
-        "marcas_sel": marcas_sel,
+        "total_filtrado": total_filtrado,
+        "filtros_qs": params.urlencode(),
+        "categorias": _con_conteos(Categoria.objects.order_by("nombre_categoria"), facetas["categorias"]),
+        "marcas": _con_conteos(Marca.objects.order_by("nombre_marca"), facetas["marcas"]),
+        "alertas_filtro": alertas_filtro,
+        "search_query": filtros["q"],
+        "solo_alertas": filtros["solo_alertas"],
+        "formatos_exportacion": formatos_disponibles(),
+        "categorias_sel": filtros["categorias"],
+        "marcas_sel": filtros["marcas"],
+        **_resumen_alertas_inventario(),
     }
 
     return render(request, "inventario.html", context)
 
 
+@login_required
+def inventario_api(request):
+    """
+    Variante JSON del inventario: mismos filtros y cursores que la vista HTML.
+    GET /api/inventario/?q=&f_categoria=&f_marca=&solo_alertas=1&despues=<cursor>&por_pagina=50
+    (&facetas=1 agrega los contadores por categoría y marca)
+    """
+    filtros = _filtros_inventario(request)
+    try:
+        por_pagina = min(max(int(request.GET.get("por_pagina", 50)), 1), 500)
+    except ValueError:
+        por_pagina = 50
+
+    pagina, total = _pagina_inventario(request, filtros, por_pagina)
+
+    facetas = None
+    if request.GET.get("facetas") == "1":
+        facetas = {
+            faceta: [
+                {"id": valor, "productos": total_valor, "alertas": alertas}
+                for valor, (total_valor, alertas) in conteos.items()
+            ]
+            for faceta, conteos in _facetas_inventario(filtros).items()
+        }
+
+    return JsonResponse({
+        "total": total,
+        "facetas": facetas,
+        "siguiente": pagina.siguiente,
+        "anterior": pagina.anterior,
+        "productos": [
+            {
+                "id": p.id,
+                "nombre": p.nombre_producto,
+                "categoria": p.categoria.nombre_categoria if p.categoria else None,
+                "marca": p.marca.nombre_marca if p.marca else None,
+                "stock_actual": p.stock_actual,
+                "stock_minimo": p.stock_minimo,
+            }
+            for p in pagina
+        ],
+    })
+
+
 # ============================================================
 # CREAR PRODUCTO
 # ============================================================
@@ -180,15 +332,22 @@ def crear_producto(request):
         categoria = Categoria.objects.filter(id=categoria_id).first()
         marca = Marca.objects.filter(id=marca_id).first()
 
-        Producto.objects.create(
+        producto = Producto.objects.create(
             nombre_producto=nombre,
             descripcion=descripcion,
             categoria=categoria,
             marca=marca,
-            stock_actual=stock_actual,
             stock_minimo=stock_minimo,
         )
 
+        # El stock inicial entra como movimiento para que el libro cuadre con stock_actual
+        if stock_actual > 0:
+            MovimientoInventario.objects.create(
+                producto=producto,
+                tipo_movimiento='entrada',
+                cantidad=stock_actual,
+            )
+
         messages.success(request, "Producto creado correctamente.")
         return redirect("inventario_lista")
 
@@ -210,7 +369,13 @@ def editar_producto(request, id_producto):
         
         producto.stock_minimo = int(request.POST.get("stock_minimo", 0))
 
-        producto.save()
+        # stock_actual NO se escribe: lo mueve solo el libro (UPDATE ... + delta) y guardar
+        # el valor leído al inicio pisaría las salidas registradas mientras tanto.
+        # Se incluyen los campos que completan los pre_save (fecha, búsqueda, huella).
+        producto.save(update_fields=[
+            "nombre_producto", "descripcion", "categoria", "marca", "stock_minimo",
+            "fecha_actualizacion", "nombre_normalizado", "busqueda", "huella_importacion",
+        ])
         messages.success(request, "Producto actualizado.")
         return redirect("inventario_lista")
 
@@ -289,244 +454,191 @@ def eliminar_usuario(request, pk):
 # ============================================================
 # 6. ESTADÍSTICAS
 # ============================================================
-def _build_estadisticas_context(request):
-    fecha_inicio = request.GET.get("fecha_inicio")
-    fecha_fin = request.GET.get("fecha_fin")
-    hoy = timezone.now().date()
-
-    if fecha_inicio:
-        fecha_inicio = datetime.strptime(fecha_inicio, "%Y-%m-%d").date()
-    else:
-        fecha_inicio = hoy - timedelta(days=180)
+def _desglose_criticos(campo, sin_grupo, limite=5):
+    """
+    Productos en stock crítico agrupados por `campo` (categoría o marca), resuelto en la BD:
+    - COUNT(*) ... GROUP BY campo para los valores del gráfico
+    - ROW_NUMBER() OVER (PARTITION BY campo) para traer solo los `limite` más críticos de cada grupo
 
-    if fecha_fin:
-        fecha_fin = datetime.strptime(fecha_fin, "%Y-%m-%d").date()
-    else:
-        fecha_fin = hoy
+    Así el tooltip y la memoria no crecen con la cantidad de productos en alerta.
+    Devuelve (labels, values, tooltips).
+    """
+    criticos = Producto.objects.en_alerta()
 
-    movimientos = MovimientoInventario.objects.filter(
-        fecha_movimiento__date__range=[fecha_inicio, fecha_fin]
+    conteos = list(
+        criticos.values_list(campo).annotate(total=Count("id")).order_by("-total", campo)
     )
 
-    productos_criticos_total = Producto.objects.filter(
-        stock_actual__lte=F("stock_minimo")
-    ).select_related('categoria', 'marca')
+    primeros = criticos.annotate(
+        grupo=F(campo),
+        fila=Window(
+            expression=RowNumber(),
+            partition_by=[F(campo)],
+            order_by=[F("stock_actual").asc(), F("nombre_producto").asc()],
+        ),
+    ).filter(fila__lte=limite).values_list("grupo", "nombre_producto", "stock_actual", "stock_minimo")
 
-    productos_sin = productos_criticos_total.filter(stock_actual=0)
-    productos_bajo = productos_criticos_total.filter(stock_actual__gt=0)
+    nombres = {}
+    for grupo, nombre, stock_actual, stock_minimo in primeros:
+        estado = "(0)" if stock_actual == 0 else f"({stock_actual}/{stock_minimo})"
+        nombres.setdefault(grupo, []).append(f"{nombre} {estado}")
 
-    critico_cat_map = {}
-    critico_cat_nombres = {}
+    labels, values, tooltips = [], [], []
+    for grupo, total in conteos:
+        recorte = nombres.get(grupo, [])
+        if total > len(recorte):
+            recorte.append(f"... y {total - len(recorte)} más")
+        labels.append(grupo or sin_grupo)
+        values.append(total)
+        tooltips.append(recorte)
 
-    for p in productos_criticos_total:
-        cat_name = p.categoria.nombre_categoria if p.categoria else "Sin categoría"
-        
-        if cat_name not in critico_cat_map:
-            critico_cat_map[cat_name] = 0
-            critico_cat_nombres[cat_name] = []
-        
-        critico_cat_map[cat_name] += 1
-        estado = "(0)" if p.stock_actual == 0 else f"({p.stock_actual}/{p.stock_minimo})"
-        critico_cat_nombres[cat_name].append(f"{p.nombre_producto} {estado}")
+    return labels, values, tooltips
 
-    critico_marca_map = {}
-    critico_marca_nombres = {}
 
-    for p in productos_criticos_total:
-        marca_name = p.marca.nombre_marca if p.marca else "Sin marca"
-        
-        if marca_name not in critico_marca_map:
-            critico_marca_map[marca_name] = 0
-            critico_marca_nombres[marca_name] = []
-            
-        critico_marca_map[marca_name] += 1
-        estado = "(0)" if p.stock_actual == 0 else f"({p.stock_actual}/{p.stock_minimo})"
-        critico_marca_nombres[marca_name].append(f"{p.nombre_producto} {estado}")
-
-    def preparar_tooltip(lista_nombres):
-        resultado = []
-        for nombres in lista_nombres:
-            recorte = nombres[:5]
-            if len(nombres) > 5:
-                recorte.append(f"... y {len(nombres)-5} más")
-            resultado.append(recorte)
-        return resultado
+MAX_ALERTAS_DASHBOARD = 50
 
-    chart_data = {
-        "stock_por_categoria_labels": [
-            c["categoria__nombre_categoria"] or "Sin categoría"
-            for c in Producto.objects.values("categoria__nombre_categoria").annotate(total=Sum("stock_actual"))
-        ],
-        "stock_por_categoria_values": [
-            c["total"]
-            for c in Producto.objects.values("categoria__nombre_categoria").annotate(total=Sum("stock_actual"))
-        ],
-        "stock_por_marca_labels": [
-            m["marca__nombre_marca"] or "Sin marca"
-            for m in Producto.objects.values("marca__nombre_marca").annotate(total=Sum("stock_actual"))
-        ],
-        "stock_por_marca_values": [
-            m["total"]
-            for m in Producto.objects.values("marca__nombre_marca").annotate(total=Sum("stock_actual"))
-        ],
 
-        "stock_critico_categoria_labels": list(critico_cat_map.keys()),
-        "stock_critico_categoria_values": list(critico_cat_map.values()),
-        "stock_critico_categoria_tooltips": preparar_tooltip(list(critico_cat_nombres.values())),
+def _calcular_dashboard():
+    """
+    Datos del dashboard que no dependen del rango de fechas, en un número fijo de consultas.
+    El resultado se cachea por versión de inventario (ver _build_estadisticas_context).
+    """
+    stock_por_categoria = list(
+        Producto.objects.values("categoria__nombre_categoria").annotate(total=Sum("stock_actual")).order_by()
+    )
+    stock_por_marca = list(
+        Producto.objects.values("marca__nombre_marca").annotate(total=Sum("stock_actual")).order_by()
+    )
+    totales = Producto.objects.aggregate(total_productos=Count("id"), stock_total=Sum("stock_actual"))
+
+    # Las tarjetas usan los conteos; las listas muestran solo los MAX_ALERTAS_DASHBOARD más
+    # críticos (mayor déficit), así el snapshot cacheado no crece con el catálogo
+    alertas = Producto.objects.en_alerta().aggregate(
+        sin_stock=Count("id", filter=Q(stock_actual__lte=0)),
+        bajo_stock=Count("id", filter=Q(stock_actual__gt=0)),
+    )
+    campos_alerta = ("id", "nombre_producto", "stock_actual", "stock_minimo")
+    productos_sin = list(Producto.objects.sin_stock().values(*campos_alerta).order_by("-deficit", "id")[:MAX_ALERTAS_DASHBOARD])
+    productos_bajo = list(Producto.objects.stock_bajo().values(*campos_alerta).order_by("-deficit", "id")[:MAX_ALERTAS_DASHBOARD])
+
+    critico_cat_labels, critico_cat_values, critico_cat_tooltips = _desglose_criticos(
+        "categoria__nombre_categoria", "Sin categoría"
+    )
+    critico_marca_labels, critico_marca_values, critico_marca_tooltips = _desglose_criticos(
+        "marca__nombre_marca", "Sin marca"
+    )
 
-        "stock_critico_marca_labels": list(critico_marca_map.keys()),
-        "stock_critico_marca_values": list(critico_marca_map.values()),
-        "stock_critico_marca_tooltips": preparar_tooltip(list(critico_marca_nombres.values())),
+    chart_data = {
+        "stock_por_categoria_labels": [c["categoria__nombre_categoria"] or "Sin categoría" for c in stock_por_categoria],
+        "stock_por_categoria_values": [c["total"] for c in stock_por_categoria],
+        "stock_por_marca_labels": [m["marca__nombre_marca"] or "Sin marca" for m in stock_por_marca],
+        "stock_por_marca_values": [m["total"] for m in stock_por_marca],
+
+        "stock_critico_categoria_labels": critico_cat_labels,
+        "stock_critico_categoria_values": critico_cat_values,
+        "stock_critico_categoria_tooltips": critico_cat_tooltips,
+
+        "stock_critico_marca_labels": critico_marca_labels,
+        "stock_critico_marca_values": critico_marca_values,
+        "stock_critico_marca_tooltips": critico_marca_tooltips,
     }
 
     return {
-        "fecha_inicio": fecha_inicio,
-        "fecha_fin": fecha_fin,
         "productos_bajo_stock": productos_bajo,
         "productos_sin_stock": productos_sin,
+        "total_bajo_stock": alertas["bajo_stock"],
+        "total_sin_stock": alertas["sin_stock"],
         "total_categorias": Categoria.objects.count(),
         "total_marcas": Marca.objects.count(),
-        "total_productos": Producto.objects.count(),
-        "stock_total": Producto.objects.aggregate(t=Sum("stock_actual"))["t"] or 0,
+        "total_productos": totales["total_productos"],
+        "stock_total": totales["stock_total"] or 0,
         "chart_data_json": json.dumps(chart_data, cls=DjangoJSONEncoder),
         "lista_productos_simple": list(Producto.objects.values('id', 'nombre_producto').order_by('nombre_producto')),
     }
 
+
+def _build_estadisticas_context(request):
+    fecha_inicio, fecha_fin = rango_fechas(request)
+
+    # Snapshot en memoria: se recalcula solo cuando cambian productos o movimientos
+    dashboard = cache_versionada("dashboard", _calcular_dashboard)
+
+    return {
+        "fecha_inicio": fecha_inicio,
+        "fecha_fin": fecha_fin,
+        **dashboard,
+    }
+
+@login_required(login_url="index")
+def estadisticas(request):
+    context = _build_estadisticas_context(request)
+    context["formatos_exportacion"] = formatos_disponibles()
+    return render(request, "estadisticas.html", context)
+
+
+@login_required
+async def chart_data_api(request):
+    rango = request.GET.get('rango', 'mes')
+    fecha_inicio, fecha_fin = rango_fechas(request)
+
+    # Lee el resumen diario y re-agrupa los días en semanas/meses
+    serie, = await en_paralelo(lambda: serie_movimientos(fecha_inicio, fecha_fin, rango))
+    return JsonResponse(serie)
+
+
+@login_required
+async def dashboard_kpis_api(request):
+    """
+    Indicadores del dashboard en tiempo real (sin caché).
+    Los agregados son independientes, así que se ejecutan en paralelo.
+    """
+    totales, alertas, total_categorias, total_marcas = await en_paralelo(
+        lambda: Producto.objects.aggregate(total_productos=Count("id"), stock_total=Sum("stock_actual")),
+        lambda: Producto.objects.en_alerta().aggregate(
+            sin_stock=Count("id", filter=Q(stock_actual__lte=0)),
+            bajo_stock=Count("id", filter=Q(stock_actual__gt=0)),
+        ),
+        Categoria.objects.count,
+        Marca.objects.count,
+    )
+
+    return JsonResponse({
+        "total_productos": totales["total_productos"],
+        "stock_total": totales["stock_total"] or 0,
+        "sin_stock": alertas["sin_stock"],
+        "bajo_stock": alertas["bajo_stock"],
+        "total_categorias": total_categorias,
+        "total_marcas": total_marcas,
+    })
+
 # ============================================================
-# API NUEVA: GRÁFICO COMPARATIVO (EJE X = PRODUCTOS)
+# API: STOCK HISTÓRICO (STOCK A UNA FECHA)
 # ============================================================
 @login_required
-def chart_productos_api(request):
+def stock_historico_api(request):
     """
-    Devuelve el total de Entradas vs Salidas por PRODUCTO (no por tiempo),
-    filtrado por el rango de fechas global.
+    Devuelve el stock que tenía cada producto al cierre de una fecha.
+    Parámetros: fecha (YYYY-MM-DD, por defecto hoy) e ids opcionales (1,2,3).
     """
+    fecha = request.GET.get('fecha')
     ids_str = request.GET.get('ids', '')
-    fecha_inicio = request.GET.get('fecha_inicio')
-    fecha_fin = request.GET.get('fecha_fin')
-
-    if not ids_str:
-        return JsonResponse({"labels": [], "entradas": [], "salidas": []})
 
     try:
-        id_list = [int(x) for x in ids_str.split(',') if x.strip().isdigit()]
+        fecha = datetime.strptime(fecha, "%Y-%m-%d").date() if fecha else timezone.now().date()
     except ValueError:
-        return JsonResponse({"labels": [], "entradas": [], "salidas": []})
-
-    hoy = timezone.now().date()
-    if not fecha_inicio:
-        fecha_inicio = hoy - timedelta(days=180)
-    else:
-        try:
-            fecha_inicio = datetime.strptime(fecha_inicio, "%Y-%m-%d").date()
-        except ValueError:
-            fecha_inicio = hoy - timedelta(days=180)
-        
-    if not fecha_fin:
-        fecha_fin = hoy
-    else:
-        try:
-            fecha_fin = datetime.strptime(fecha_fin, "%Y-%m-%d").date()
-        except ValueError:
-            fecha_fin = hoy
-
-    qs = MovimientoInventario.objects.filter(
-        fecha_movimiento__date__range=[fecha_inicio, fecha_fin],
-        producto_id__in=id_list
-    ).values(
-        'producto__nombre_producto', 'tipo_movimiento'
-    ).annotate(
-        total=Sum('cantidad')
-    ).order_by('producto__nombre_producto')
-
-
-    data_map = {}
-    for prod_id in id_list:
-       try:
-           nombre = Producto.objects.get(id=prod_id).nombre_producto
-           data_map[nombre] = {'entradas': 0, 'salidas': 0}
-       except Producto.DoesNotExist:
-           continue
-
-
-    for row in qs:
-        nombre = row['producto__nombre_producto']
-        if nombre not in data_map:
-            continue
-        
-        if row['tipo_movimiento'] == 'entrada':
-            data_map[nombre]['entradas'] += row['total']
-        elif row['tipo_movimiento'] == 'salida':
-            data_map[nombre]['salidas'] += row['total']
+        return JsonResponse({"status": "error", "message": "Fecha inválida. Usa el formato YYYY-MM-DD."}, status=400)
 
-    labels = list(data_map.keys())
-    return JsonResponse({
-        "labels": labels, 
-        "entradas": [data_map[k]['entradas'] for k in labels],
-        "salidas": [data_map[k]['salidas'] for k in labels]
-    })
-
-@login_required(login_url="index")
-def estadisticas(request):
-    return render(request, "estadisticas.html", _build_estadisticas_context(request))
+    id_list = [int(x) for x in ids_str.split(',') if x.strip().isdigit()] or None
 
+    stock = stock_as_of(fecha, producto_ids=id_list)
+    nombres = dict(Producto.objects.filter(id__in=stock.keys()).values_list('id', 'nombre_producto'))
 
-@login_required
-def chart_data_api(request):
-    rango = request.GET.get('rango', 'mes')
-    fecha_inicio = request.GET.get('fecha_inicio')
-    fecha_fin = request.GET.get('fecha_fin')
-    
-    hoy = timezone.now().date()
-    if not fecha_inicio:
-        fecha_inicio = hoy - timedelta(days=180)
-    else:
-        fecha_inicio = datetime.strptime(fecha_inicio, "%Y-%m-%d").date()
-        
-    if not fecha_fin:
-        fecha_fin = hoy
-    else:
-        fecha_fin = datetime.strptime(fecha_fin, "%Y-%m-%d").date()
-
-    if rango == 'semana':
-        trunc_func = TruncWeek('fecha_movimiento')
-        fmt = '%W-%Y' 
-    elif rango == 'dia':
-        trunc_func = TruncDay('fecha_movimiento')
-        fmt = '%d/%m' 
-    else:
-        trunc_func = TruncMonth('fecha_movimiento')
-        fmt = '%Y-%m'
-
-
-    qs = MovimientoInventario.objects.filter(
-        fecha_movimiento__date__range=[fecha_inicio, fecha_fin]
-    ).annotate(
-        periodo=trunc_func
-    ).values(
-        'periodo', 'tipo_movimiento'
-    ).annotate(
-        total=Sum('cantidad')
-    ).order_by('periodo')
-
-    data_map = {}
-    for row in qs:
-        if not row['periodo']: continue
-        label = row['periodo'].strftime(fmt)
-        
-        if label not in data_map:
-            data_map[label] = {'entradas': 0, 'salidas': 0}
-        
-        if row['tipo_movimiento'] == 'entrada':
-            data_map[label]['entradas'] += row['total']
-        elif row['tipo_movimiento'] == 'salida':
-            data_map[label]['salidas'] += row['total']
-
-    labels = list(data_map.keys())
     return JsonResponse({
-        "labels": labels,
-        "entradas": [data_map[k]['entradas'] for k in labels],
-        "salidas": [data_map[k]['salidas'] for k in labels]
+        "fecha": fecha.isoformat(),
+        "productos": [
+            {"id": pid, "nombre": nombres.get(pid, ""), "stock": stock[pid]}
+            for pid in sorted(stock, key=lambda pid: nombres.get(pid, ""))
+        ]
     })
 
 # ============================================================
@@ -534,126 +646,123 @@ def chart_data_api(request):
 # ============================================================
 @login_required
 def carga_datos(request):
+    """
+    Recibe el archivo y encola un TrabajoImportacion; responde de inmediato con la URL
+    de estado que la interfaz consulta mientras el worker procesa los lotes.
+    """
     if request.method == "POST":
-        if not request.FILES.get("archivo_excel"):
+        archivo = request.FILES.get("archivo_excel")
+        if not archivo:
             return JsonResponse({"status": "error", "message": "No seleccionaste ningún archivo."})
 
-        try:
-            archivo = request.FILES["archivo_excel"]
-            df = pd.read_excel(archivo)
-
-
-            def limpiar(txt):
-                s = str(txt).strip().lower()
-                s = unicodedata.normalize('NFKD', s).encode('ascii', 'ignore').decode('utf-8')
-                return s.replace(" ", "_")
-
-            df.columns = [limpiar(c) for c in df.columns]
-
-            cols_ok = ["nombre_producto", "categoria", "marca", "stock_actual"]
-            faltan = [c for c in cols_ok if c not in df.columns]
-
-            if faltan:
-                return JsonResponse({"status": "error", "message": f"Faltan columnas: {', '.join(faltan)}"})
-
-            count = 0
-            nuevos = 0
-            
-            for _, row in df.iterrows():
-                nombre = row.get("nombre_producto")
-                if pd.isna(nombre): continue
-                
-                cat_nombre = str(row.get("categoria", "")).strip()
-                marca_nombre = str(row.get("marca", "")).strip()
-                
-                cat_obj = None
-                if cat_nombre and cat_nombre.lower() != "nan":
-                    cat_obj, _ = Categoria.objects.get_or_create(nombre_categoria=cat_nombre)
-                
-                marca_obj = None
-                if marca_nombre and marca_nombre.lower() != "nan":
-                    marca_obj, _ = Marca.objects.get_or_create(nombre_marca=marca_nombre)
-
-                stock_nuevo = int(row.get("stock_actual", 0))
-                stock_minimo = int(row.get("stock_minimo", 5))
-                descripcion = row.get("descripcion", "")
-
-                producto_existente = Producto.objects.filter(nombre_producto=nombre).first()
-                stock_anterior = producto_existente.stock_actual if producto_existente else 0
-                
-                diferencia = stock_nuevo - stock_anterior
-
-
-                producto, created = Producto.objects.update_or_create(
-                    nombre_producto=nombre,
-                    defaults={
-                        "categoria": cat_obj,
-                        "marca": marca_obj,
-                        "stock_actual": stock_nuevo,
-                        "stock_minimo": stock_minimo,
-                        "descripcion": descripcion
-                    }
-                )
-
-                if diferencia != 0:
-                    tipo = 'entrada' if diferencia > 0 else 'salida'
-                    
-                    MovimientoInventario.objects.create(
-                        producto=producto,
-                        tipo_movimiento=tipo,
-                        cantidad=abs(diferencia),
-                        fecha_movimiento=timezone.now() 
-                    )
-
-                count += 1
-                if created: nuevos += 1
-            
-            return JsonResponse({
-                "status": "success", 
-                "message": f"¡Listo! {count} productos procesados. Se generó el historial de movimientos."
-            })
-
-        except Exception as e:
-            return JsonResponse({"status": "error", "message": f"Error interno: {str(e)}"})
+        if not archivo.name.lower().endswith(EXTENSIONES):
+            return JsonResponse({"status": "error", "message": f"Formato no soportado. Usa {', '.join(EXTENSIONES)}."})
+
+        with transaction.atomic():
+            trabajo = TrabajoImportacion.objects.create(
+                usuario=request.user,
+                archivo=archivo,
+                nombre_archivo=archivo.name,
+            )
+            encolar_importacion(trabajo)
+
+        return JsonResponse({
+            "status": "en_proceso",
+            "trabajo_id": trabajo.id,
+            "url_estado": reverse("estado_importacion_api", args=[trabajo.id]),
+        }, status=202)
 
     return render(request, "carga_datos.html")
 
+
+@login_required
+def estado_importacion_api(request, id):
+    """ Avance de una carga masiva: filas procesadas/fallidas, velocidad y ETA. """
+    trabajo = get_object_or_404(TrabajoImportacion, id=id)
+    velocidad = trabajo.filas_por_segundo
+    eta = trabajo.eta_segundos
+
+    porcentaje = None
+    if trabajo.estado == TrabajoImportacion.COMPLETADO:
+        porcentaje = 100
+    elif trabajo.total_filas:
+        porcentaje = min(round(100 * trabajo.filas_procesadas / trabajo.total_filas), 99)
+
+    return JsonResponse({
+        "id": trabajo.id,
+        "archivo": trabajo.nombre_archivo,
+        "estado": trabajo.estado,
+        "mensaje": trabajo.mensaje,
+        "total_filas": trabajo.total_filas,
+        "filas_procesadas": trabajo.filas_procesadas,
+        "filas_fallidas": trabajo.filas_fallidas,
+        "nuevos": trabajo.nuevos,
+        "actualizados": trabajo.actualizados,
+        "sin_cambios": trabajo.sin_cambios,
+        "movimientos": trabajo.movimientos,
+        "porcentaje": porcentaje,
+        "filas_por_segundo": round(velocidad, 1) if velocidad else None,
+        "eta_segundos": round(eta) if eta is not None else None,
+    })
+
 # ============================================================
-# 8. EXPORTAR EXCEL
+# 8. EXPORTAR (xlsx / csv / ndjson / parquet)
 # ============================================================
-@login_required(login_url="index")
-def exportar_excel(request):
+def _respuesta_exportacion(request, nombre, filtros, columnas, filas):
+    """
+    Descarga en el formato pedido con ?formato= (por defecto xlsx). Se guarda en disco por
+    formato + filtros + versión de inventario: las descargas repetidas salen del archivo
+    (ver utils/artefactos.py). `filas` solo se recorre si hay que generarla.
+    """
+    formato = request.GET.get("formato", "xlsx")
+    if formato not in formatos_disponibles():
+        return JsonResponse({
+            "status": "error",
+            "message": f"Formato no disponible. Usa: {', '.join(formatos_disponibles())}.",
+        }, status=400)
 
-    productos = Producto.objects.select_related("categoria", "marca")
+    return respuesta_artefacto(request, nombre, formato, filtros, columnas, filas)
 
-    solo_alertas = request.GET.get("solo_alertas") == "1"
-    if solo_alertas:
-        productos = productos.filter(Q(stock_actual=0) | Q(stock_actual__lte=F("stock_minimo")))
 
-    query = request.GET.get("q")
-    if query:
-        productos = productos.filter(
-            Q(nombre_producto__icontains=query) |
-            Q(marca__nombre_marca__icontains=query) |
-            Q(categoria__nombre_categoria__icontains=query)
-        )
+@login_required(login_url="index")
+def exportar_inventario(request):
+    """
+    Descarga del inventario con los mismos filtros que la lista (q, categorías, marcas,
+    solo_alertas) y en el mismo orden. El .xlsx se puede volver a subir en carga_datos.
+    """
+    filtros = _filtros_inventario(request)
+    productos, _ = _productos_filtrados(filtros)
+    return _respuesta_exportacion(request, "inventario", filtros, COLUMNAS_PRODUCTOS, filas_productos(productos))
 
-    data = [{
-        "nombre_producto": p.nombre_producto,
-        "descripcion": p.descripcion or "",
-        "categoria": p.categoria.nombre_categoria if p.categoria else "",
-        "marca": p.marca.nombre_marca if p.marca else "",
-        "stock_actual": p.stock_actual,
-        "stock_minimo": p.stock_minimo,
-    } for p in productos]
 
-    df = pd.DataFrame(data)
+@login_required(login_url="index")
+def exportar_movimientos(request):
+    """
+    Libro de movimientos entre fecha_inicio y fecha_fin (por defecto los últimos 180 días),
+    opcionalmente de un solo producto (?producto=id) o tipo (?tipo=entrada|salida).
+    Ordenado por fecha: recorre el índice de fecha_movimiento sin ordenar en memoria.
+    """
+    fecha_inicio, fecha_fin = rango_fechas(request)
+    producto = request.GET.get("producto", "")
+    tipo = request.GET.get("tipo")
+    filtros = {
+        "fecha_inicio": fecha_inicio,
+        "fecha_fin": fecha_fin,
+        "producto": int(producto) if producto.isdigit() else None,
+        "tipo": tipo if tipo in ("entrada", "salida") else None,
+    }
 
-    response = HttpResponse(content_type="application/vnd.ms-excel")
-    response["Content-Disposition"] = 'attachment; filename="inventario.xlsx"'
-    df.to_excel(response, index=False)
+    movimientos = MovimientoInventario.objects.filter(**filtro_rango_fechas(fecha_inicio, fecha_fin))
+    if filtros["producto"]:
+        movimientos = movimientos.filter(producto_id=filtros["producto"])
+    if filtros["tipo"]:
+        movimientos = movimientos.filter(tipo_movimiento=filtros["tipo"])
 
-    return response
+    nombre = f"movimientos_{fecha_inicio:%Y%m%d}_{fecha_fin:%Y%m%d}"
+    return _respuesta_exportacion(
+        request, nombre, filtros, COLUMNAS_MOVIMIENTOS,
+        filas_movimientos(movimientos.order_by("fecha_movimiento", "id")),
+    )
 
 
 # ============================================================
@@ -663,24 +772,44 @@ def exportar_excel(request):
 def facturacion(request):
     """
     Render de la página de facturación.
-    
-    Pasa:
-    - productos: QuerySet de todos los productos
-    - productos_json: JSON con datos completos de cada producto (id, nombre, categoría, marca)
+
+    Ya no incrusta el catálogo: el selector de productos consulta
+    /api/productos/buscar/ mientras se escribe, así la página pesa lo mismo
+    con 50 que con 50.000 productos.
     """
-    productos = Producto.objects.all().select_related('categoria', 'marca').order_by("nombre_producto")
-    
-    # Crear JSON con datos completos para usar en JavaScript
-    productos_json = json.dumps([{
-        'id': p.id,
-        'nombre': p.nombre_producto,
-        'categoria': p.categoria.nombre_categoria if p.categoria else 'Sin categoría',
-        'marca': p.marca.nombre_marca if p.marca else 'Sin marca'
-    } for p in productos])
-    
-    return render(request, "facturacion.html", {
-        "productos": productos,
-        "productos_json": productos_json
+    return render(request, "facturacion.html")
+
+
+@login_required
+def buscar_productos_api(request):
+    """
+    Autocompletado de productos (índice de prefijos en memoria, ver utils/autocompletar.py).
+    GET /api/productos/buscar/?q=coca&limite=10
+
+    El stock se lee de la BD solo para los resultados, así siempre es el actual.
+    """
+    try:
+        limite = min(max(int(request.GET.get("limite", 10)), 1), 50)
+    except ValueError:
+        limite = 10
+
+    encontrados = indice_productos.buscar(request.GET.get("q", ""), limite)
+    stock = dict(
+        Producto.objects.filter(id__in=[e[0] for e in encontrados]).values_list("id", "stock_actual")
+    )
+
+    return JsonResponse({
+        "resultados": [
+            {
+                "id": producto_id,
+                "nombre": nombre,
+                "categoria": categoria or "Sin categoría",
+                "marca": marca or "Sin marca",
+                "stock_actual": stock[producto_id],
+            }
+            # Un producto borrado después de construir el índice no aparece en `stock`
+            for producto_id, nombre, categoria, marca in encontrados if producto_id in stock
+        ]
     })
 
 
@@ -696,14 +825,13 @@ def registrar_factura(request):
     
     FLUJO:
     1. Valida RUT del cliente (validar_rut)
-    2. Crea registro de Factura
-    3. Valida que hay SUFICIENTE stock para TODOS los items
-    4. Si hay error de stock → Cancela y devuelve error
-    5. Si hay stock → Crea DetalleFactura y MovimientoInventario (salida)
-    6. Signal automático recalcula stock: stock = entradas - salidas
+    2. registrar_salida, en UNA transacción:
+       - bloquea los productos del carrito (SELECT ... FOR UPDATE, ordenado por id)
+       - valida que hay SUFICIENTE stock para TODOS los items
+       - crea Factura, DetalleFactura y MovimientoInventario (salida) en bloque
+    3. Si hay error de stock → no se escribe nada y devuelve error
     
-    NOTA: El descuento de stock ocurre automáticamente por el signal,
-          no se descuenta manualmente.
+    NOTA: El stock nunca se descuenta a mano: siempre sale del libro de movimientos.
     """
     if request.method == "POST":
         datos = json.loads(request.body)
@@ -716,50 +844,11 @@ def registrar_factura(request):
         if not validar_rut(cliente_rut):
             return JsonResponse({"status": "error", "message": "RUT inválido. Verifica el formato y el dígito verificador."})
 
-        # PASO 1: Crear factura
-        factura = Factura.objects.create(
-            cliente_nombre=cliente_nombre,
-            cliente_apellido=cliente_apellido,
-            cliente_rut=cliente_rut
-        )
-
-        items = datos.get("items", [])
-
-        # VALIDACIÓN 2: Verificar stock ANTES de procesar
-        # Recorre todos los items y valida que haya cantidad suficiente
-        for item in items:
-            producto = Producto.objects.get(id=item["id"])
-            cantidad = int(item["cantidad"])
-            
-            if producto.stock_actual < cantidad:
-                # Si no hay stock, elimina la factura y devuelve error
-                factura.delete()
-                return JsonResponse({
-                    "status": "error", 
-                    "message": f"Stock insuficiente para '{producto.nombre_producto}'. Disponible: {producto.stock_actual}, Solicitado: {cantidad}"
-                })
-
-        # PASO 2: Crear detalles y movimientos de inventario
-        for item in items:
-            producto = Producto.objects.get(id=item["id"])
-            cantidad = int(item["cantidad"])
-
-            # Crear registro de detalle de factura
-            DetalleFactura.objects.create(
-                factura=factura,
-                producto=producto,
-                cantidad=cantidad,
-                tipo_movimiento='salida' 
-            )
-
-            # Crear movimiento de SALIDA (esto dispara el signal automáticamente)
-            # El signal recalculará: stock = entradas - salidas
-            MovimientoInventario.objects.create(
-                producto=producto,
-                tipo_movimiento='salida',
-                cantidad=cantidad,
-                fecha_movimiento=timezone.now()
-            )
+        # VALIDACIÓN 2 + registro: stock validado con los productos bloqueados
+        try:
+            factura = registrar_salida(cliente_nombre, cliente_apellido, cliente_rut, datos.get("items", []))
+        except ErrorFactura as e:
+            return JsonResponse({"status": "error", "message": str(e)})
 
         return JsonResponse({"status": "ok", "factura_id": factura.id})
 
@@ -790,76 +879,86 @@ def factura_pdf(request, id):
     return response
 
 # ============================================================
-# API NUEVA: GRÁFICO COMPARATIVO POR PRODUCTOS ESPECÍFICOS
+# API: COMPARATIVO DE PRODUCTOS (EJE X = PRODUCTOS)
 # ============================================================
-@login_required
-def chart_productos_api(request):
-    """
-    Devuelve el total de Entradas vs Salidas por PRODUCTO (no por tiempo),
-    filtrado por el rango de fechas global.
-    """
-    ids_str = request.GET.get('ids', '')
-    fecha_inicio = request.GET.get('fecha_inicio')
-    fecha_fin = request.GET.get('fecha_fin')
+MAX_PRODUCTOS_COMPARACION = 1000
 
-    if not ids_str:
-        return JsonResponse({"labels": [], "entradas": [], "salidas": []})
 
-    try:
-        id_list = [int(x) for x in ids_str.split(',') if x.strip().isdigit()]
-    except ValueError:
-        return JsonResponse({"labels": [], "entradas": [], "salidas": []})
+def _parametros_comparacion(request):
+    """
+    Parámetros del comparativo desde GET (?ids=1,2,3) o POST (JSON o formulario),
+    para poder enviar cientos de ids sin chocar con el largo máximo de la URL.
 
-    hoy = timezone.now().date()
-    if not fecha_inicio:
-        fecha_inicio = hoy - timedelta(days=180)
-    else:
+    Un cuerpo JSON debe ser un objeto con "ids" como lista de enteros; si no,
+    lanza ValueError con el mensaje para el 400.
+    """
+    if request.method == "POST" and request.content_type == "application/json":
         try:
-            fecha_inicio = datetime.strptime(fecha_inicio, "%Y-%m-%d").date()
+            parametros = json.loads(request.body or b"{}")
         except ValueError:
-            fecha_inicio = hoy - timedelta(days=180)
-        
-    if not fecha_fin:
-        fecha_fin = hoy
+            raise ValueError("El cuerpo no es JSON válido.")
+        if not isinstance(parametros, dict):
+            raise ValueError("El cuerpo JSON debe ser un objeto.")
+        ids = parametros.get("ids") or []
+        if not isinstance(ids, list) or not all(type(x) is int for x in ids):
+            raise ValueError('"ids" debe ser una lista de enteros.')
+        id_list = list(dict.fromkeys(x for x in ids if x > 0))
+        return id_list[:MAX_PRODUCTOS_COMPARACION], parametros
+
+    if request.method == "POST":
+        parametros = request.POST.dict()
+        ids = request.POST.getlist("ids")
     else:
-        try:
-            fecha_fin = datetime.strptime(fecha_fin, "%Y-%m-%d").date()
-        except ValueError:
-            fecha_fin = hoy
+        parametros = request.GET.dict()
+        ids = parametros.get("ids", "").split(",")
+    id_list = list(dict.fromkeys(int(x) for x in ids if x.strip().isdigit()))
 
-    qs = MovimientoInventario.objects.filter(
-        fecha_movimiento__date__range=[fecha_inicio, fecha_fin],
-        producto_id__in=id_list
-    ).values(
-        'producto__nombre_producto', 'tipo_movimiento'
-    ).annotate(
-        total=Sum('cantidad')
-    ).order_by('producto__nombre_producto')
+    return id_list[:MAX_PRODUCTOS_COMPARACION], parametros
 
 
-    data_map = {}
-    
+@login_required
+async def chart_productos_api(request):
+    """
+    Devuelve el total de Entradas vs Salidas por PRODUCTO (no por tiempo),
+    filtrado por el rango de fechas global.
 
-    for prod_id in id_list:
-       try:
-           nombre = Producto.objects.get(id=prod_id).nombre_producto
-           data_map[nombre] = {'entradas': 0, 'salidas': 0}
-       except Producto.DoesNotExist:
-           continue
-
-    for row in qs:
-        nombre = row['producto__nombre_producto']
-        if nombre not in data_map:
-            continue
-        
-        if row['tipo_movimiento'] == 'entrada':
-            data_map[nombre]['entradas'] += row['total']
-        elif row['tipo_movimiento'] == 'salida':
-            data_map[nombre]['salidas'] += row['total']
+    - Resultados por id (dos productos con el mismo nombre no se mezclan)
+    - Nombres con un solo in_bulk: número de consultas constante sin importar cuántos ids
+    - Con series=1 agrega la serie de cada producto agrupada por rango (dia/semana/mes)
+    """
+    try:
+        id_list, parametros = _parametros_comparacion(request)
+    except ValueError as e:
+        return JsonResponse({"status": "error", "message": str(e)}, status=400)
+
+    if not id_list:
+        return JsonResponse({"ids": [], "labels": [], "entradas": [], "salidas": []})
+
+    fecha_inicio, fecha_fin = rango_fechas(request, parametros=parametros)
+    rango = parametros.get("rango", "mes")
+    if not isinstance(rango, str):
+        rango = "mes"
+    con_series = str(parametros.get("series", "")) in ("1", "true", "True")
+
+    consultas = [
+        lambda: Producto.objects.only("id", "nombre_producto").in_bulk(id_list),
+        lambda: totales_por_producto(id_list, fecha_inicio, fecha_fin),
+    ]
+    if con_series:
+        consultas.append(lambda: series_por_producto(id_list, fecha_inicio, fecha_fin, rango))
+
+    # Nombres, totales (y series) se consultan al mismo tiempo
+    productos, totales, *series = await en_paralelo(*consultas)
+
+    ids = [pid for pid in id_list if pid in productos]
+    respuesta = {
+        "ids": ids,
+        "labels": [productos[pid].nombre_producto for pid in ids],
+        "entradas": [totales.get(pid, (0, 0))[0] for pid in ids],
+        "salidas": [totales.get(pid, (0, 0))[1] for pid in ids],
+    }
+    if con_series:
+        vacia = {"labels": [], "entradas": [], "salidas": []}
+        respuesta["series"] = {str(pid): series[0].get(pid, vacia) for pid in ids}
 
-    labels = list(data_map.keys())
-    return JsonResponse({
-        "labels": labels, 
-        "entradas": [data_map[k]['entradas'] for k in labels],
-        "salidas": [data_map[k]['salidas'] for k in labels]
-    })
+    return JsonResponse(respuesta)
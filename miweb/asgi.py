@@ -3,6 +3,12 @@ ASGI config for miweb project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Los endpoints de gráficos (/api/chart-data/, /api/chart-productos/,
+/api/dashboard-kpis/) son vistas async: bajo ASGI no bloquean un worker
+mientras esperan a la base de datos. Ejemplo:
+
+    uvicorn miweb.asgi:application --workers 2
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
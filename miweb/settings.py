@@ -110,12 +110,56 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static', # <-- ¡LÍNEA IMPORTANTE!
 ]
 
+# Archivos subidos (cargas masivas pendientes de procesar)
+MEDIA_ROOT = Path(os.getenv('MEDIA_ROOT', BASE_DIR / 'media'))
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+
+# --- 4. OPCIONES DE DATAEASY ---
+# 'incremental': cada movimiento suma/resta su cantidad al stock (O(1)).
+# 'recalculo':   cada movimiento recalcula entradas - salidas de todo el historial.
+DATAEASY_MODO_STOCK = os.getenv('DATAEASY_MODO_STOCK', 'incremental')
+
+# Fuente de los gráficos de movimientos:
+# 'orm':      consultas sobre el resumen diario (MovimientoDiario)
+# 'columnar': copia del libro en memoria (NumPy) por worker; mismo JSON, sin GROUP BY
+DATAEASY_ANALITICA = os.getenv('DATAEASY_ANALITICA', 'orm')
+# Segundos tras los cuales el almacén columnar se recarga completo
+DATAEASY_COLUMNAR_RECARGA = int(os.getenv('DATAEASY_COLUMNAR_RECARGA', '3600'))
+
+# Cargas masivas en segundo plano (TrabajoImportacion):
+# 'hilo':    un pool de hilos dentro del propio servidor web procesa las cargas
+# 'comando': solo se encolan; las procesa `python manage.py procesar_importaciones --continuo`
+# En modo 'hilo' la cola vive en memoria: lo que quede pendiente o a medias tras un reinicio
+# solo se retoma corriendo `python manage.py procesar_importaciones` (al desplegar o desde cron)
+DATAEASY_IMPORTACION = os.getenv('DATAEASY_IMPORTACION', 'hilo')
+DATAEASY_IMPORTACION_WORKERS = int(os.getenv('DATAEASY_IMPORTACION_WORKERS', '1'))
+# Procesos que limpian y preparan cada carga en paralelo (1 = todo en el mismo proceso)
+DATAEASY_IMPORTACION_PROCESOS = int(os.getenv('DATAEASY_IMPORTACION_PROCESOS', '1'))
+
+# Exportaciones guardadas en disco por formato + filtros + versión de inventario
+# (se podan por tamaño total y por horas sin descargarse)
+DATAEASY_EXPORTACIONES_DIR = MEDIA_ROOT / 'exportaciones'
+DATAEASY_EXPORTACIONES_MB = int(os.getenv('DATAEASY_EXPORTACIONES_MB', '500'))
+DATAEASY_EXPORTACIONES_HORAS = int(os.getenv('DATAEASY_EXPORTACIONES_HORAS', '24'))
+
+# Caché de dashboards, contadores y filtros (se invalida por versión al escribir inventario).
+# Debe ser compartida entre procesos (workers, procesar_importaciones, importar_catalogo...)
+# para que todos vean la invalidación. LocMemCache solo sirve en desarrollo: `manage.py check`
+# avisa (dataeasy.W001) y `manage.py check --deploy` lo rechaza (dataeasy.E001). Por ejemplo:
+#   CACHE_BACKEND=django.core.cache.backends.redis.RedisCache CACHE_LOCATION=redis://127.0.0.1:6379
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'dataeasy'),
+    }
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.mysql',
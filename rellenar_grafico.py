@@ -25,6 +25,7 @@ def poblar_datos():
     
     cantidad_movimientos = 200
     
+    movimientos = []
     for i in range(cantidad_movimientos):
         producto = random.choice(productos)
         tipo = random.choice(['entrada', 'salida'])
@@ -34,17 +35,16 @@ def poblar_datos():
         dias_atras = random.randint(0, 180)
         fecha_real = timezone.now() - timedelta(days=dias_atras)
 
-        # PASO A: Crear el movimiento (Django pondrá la fecha de HOY automáticamente)
-        mov = MovimientoInventario.objects.create(
+        # La fecha histórica se asigna directamente (fecha_movimiento usa default, no auto_now_add)
+        movimientos.append(MovimientoInventario(
             producto=producto,
             tipo_movimiento=tipo,
-            cantidad=cantidad
-        )
+            cantidad=cantidad,
+            fecha_movimiento=fecha_real
+        ))
 
-        # PASO B: Sobrescribir la fecha manualmente y guardar de nuevo
-        # Esto es obligatorio porque 'auto_now_add=True' impide poner fechas pasadas al crear
-        mov.fecha_movimiento = fecha_real
-        mov.save()
+    # Un solo INSERT masivo y un UPDATE agrupado del stock
+    MovimientoInventario.objects.bulk_record(movimientos)
 
     print(f"✅ ¡Listo! Se crearon {cantidad_movimientos} movimientos con fechas antiguas.")
 